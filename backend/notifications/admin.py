@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.html import format_html
 
 from .models import EmailNotification
@@ -12,11 +13,23 @@ class EmailNotificationAdmin(admin.ModelAdmin):
         "kind",
         "to_email",
         "status",
+        "attempts",
+        "next_attempt_at",
         "created_at",
         "sent_at",
         "receipt_link",
     )
+    list_filter = ("status", "kind")
     readonly_fields = ("receipt_link",)
+    actions = ["retry_now"]
+
+    @admin.action(description="Retry now")
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status="sent").exclude(to_email="").update(
+            status="pending",
+            next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f"{updated} email(s) queued for retry.")
 
     def receipt_link(self, obj):
         if obj.receipt_pdf:
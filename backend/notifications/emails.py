@@ -1,117 +1,90 @@
+from email.utils import make_msgid
 from typing import Optional
 
 from django.conf import settings
-from django.core.files.base import ContentFile
 from django.core.mail import EmailMultiAlternatives
+from django.core.mail.utils import DNS_NAME
 from django.template.loader import render_to_string
-from django.utils import timezone
 
 from orders.models import Order
 from orders.utils import estimate_delivery_date
 
 from .models import EmailNotification
-from .services import generate_order_receipt_pdf
+from .services import get_order_receipt_pdf
 
 ORDER_RECEIPT_KIND = "order_receipt"
 ORDER_STATUS_UPDATE_KIND = "order_status_update"
 
 
-def send_order_receipt_email(order: Order) -> EmailNotification:
+class PrebuiltEmailMessage(EmailMultiAlternatives):
     """
-    Send an order receipt email with a PDF attachment to order.email.
-    Create an EmailNotification row recording the attempt and result.
-    If order.email is empty, do nothing and return a Notification with status='failed'.
+    An email whose Message-ID is fixed when it is created and whose MIME tree
+    is built at most once.
+
+    ``EmailMessage.message()`` rebuilds (and base64-encodes every attachment)
+    on each call, so reading the Message-ID before sending would cost a
+    whole extra build. Here the id is known up front and the first
+    ``message()`` call, made by the email backend, is cached. Finish
+    attaching content before the message is sent.
     """
-    subject = f"Your Meat Direct order #{order.id} receipt"
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.extra_headers.setdefault("Message-ID", make_msgid(domain=DNS_NAME))
+        self._built = None
+
+    @property
+    def message_id(self) -> str:
+        return self.extra_headers["Message-ID"]
+
+    def message(self):
+        if self._built is None:
+            self._built = super().message()
+        return self._built
+
+
+def _queue(order: Order, kind: str, subject: str, missing_email_error: str, context=None) -> EmailNotification:
     if not order.email:
         return EmailNotification.objects.create(
             order=order,
-            kind=ORDER_RECEIPT_KIND,
+            kind=kind,
             to_email="",
             subject=subject,
             status="failed",
-            error="Order has no email address; receipt not sent.",
+            error=missing_email_error,
         )
-
-    estimated_delivery_date = None
-    if order.order_type == Order.OrderType.DELIVERY:
-        estimated_delivery_date = estimate_delivery_date(order.created_at)
-
-    context = {
-        "order": order,
-        "items": order.items.all(),
-        "estimated_delivery_date": estimated_delivery_date,
-    }
-    text_body = render_to_string(
-        "notifications/order_receipt_plain.txt", context
-    )
-    html_body = render_to_string(
-        "notifications/order_receipt.html", context
+    return EmailNotification.objects.create(
+        order=order,
+        kind=kind,
+        to_email=order.email,
+        subject=subject,
+        status="pending",
+        context=context or {},
     )
 
-    from_email = settings.DEFAULT_FROM_EMAIL
 
-    try:
-        msg = EmailMultiAlternatives(
-            subject,
-            text_body,
-            from_email,
-            [order.email],
-        )
-        msg.attach_alternative(html_body, "text/html")
-
-        pdf_bytes = generate_order_receipt_pdf(order)
-        msg.attach("order_receipt.pdf", pdf_bytes, "application/pdf")
-
-        message_id: Optional[str] = None
-        try:
-            message_id = msg.message().get("Message-ID")
-        except Exception:
-            message_id = None
-
-        sent_count = msg.send()
-        status = "sent" if sent_count else "failed"
-        sent_at = timezone.now() if sent_count else None
-        error = "" if sent_count else "Email backend did not send message"
-
-        notification = EmailNotification.objects.create(
-            order=order,
-            kind=ORDER_RECEIPT_KIND,
-            to_email=order.email,
-            subject=subject,
-            status=status,
-            message_id=message_id or "",
-            error=error,
-            sent_at=sent_at,
-        )
-        if pdf_bytes and status == "sent":
-            filename = f"order_{order.id}_receipt.pdf"
-            notification.receipt_pdf.save(
-                filename,
-                ContentFile(pdf_bytes),
-                save=True,
-            )
-        return notification
-    except Exception as exc:
-        return EmailNotification.objects.create(
-            order=order,
-            kind=ORDER_RECEIPT_KIND,
-            to_email=order.email,
-            subject=subject,
-            status="failed",
-            error=str(exc),
-        )
+def queue_order_receipt_email(order: Order) -> EmailNotification:
+    """
+    Queue an order receipt email (with a PDF attachment) to order.email.
+    If order.email is empty, nothing is queued and the returned
+    EmailNotification has status='failed'.
+    """
+    return _queue(
+        order,
+        ORDER_RECEIPT_KIND,
+        f"Your Meat Direct order #{order.id} receipt",
+        "Order has no email address; receipt not sent.",
+    )
 
 
-def send_order_receipt_email_once(order: Order) -> EmailNotification:
+def queue_order_receipt_email_once(order: Order) -> EmailNotification:
     """
-    Send the order receipt email only if one hasn't been successfully sent before
-    for this order (kind='order_receipt' and status='sent').
+    Queue the order receipt email only if one hasn't already been sent or
+    queued for this order.
     """
     existing = (
         EmailNotification.objects.filter(
-            order=order, kind=ORDER_RECEIPT_KIND, status="sent"
+            order=order, kind=ORDER_RECEIPT_KIND, status__in=["pending", "sent"]
         )
         .order_by("-sent_at", "-created_at")
         .first()
@@ -119,7 +92,7 @@ def send_order_receipt_email_once(order: Order) -> EmailNotification:
     if existing:
         return existing
 
-    return send_order_receipt_email(order)
+    return queue_order_receipt_email(order)
 
 
 def _get_status_label(status_value: str) -> str:
@@ -129,89 +102,84 @@ def _get_status_label(status_value: str) -> str:
         return status_value
 
 
-def send_order_status_update_email(
+def queue_order_status_update_email(
     order: Order,
     *,
     previous_status: str = "",
     new_status: str = "",
 ) -> EmailNotification:
     """
-    Send an email notifying the customer that their order status has changed.
-    Create an EmailNotification row recording the attempt and result.
+    Queue an email notifying the customer that their order status has changed.
     """
     new_status_value = new_status or order.status
-    new_status_label = _get_status_label(new_status_value)
-    previous_status_value = previous_status or ""
-    previous_status_label = (
-        _get_status_label(previous_status_value)
-        if previous_status_value
-        else ""
+    subject = f"Your Meat Direct order #{order.id} is now {_get_status_label(new_status_value)}"
+    return _queue(
+        order,
+        ORDER_STATUS_UPDATE_KIND,
+        subject,
+        "Order has no email address; status update not sent.",
+        context={"previous_status": previous_status or "", "new_status": new_status_value},
     )
 
-    subject = f"Your Meat Direct order #{order.id} is now {new_status_label}"
 
-    if not order.email:
-        return EmailNotification.objects.create(
-            order=order,
-            kind=ORDER_STATUS_UPDATE_KIND,
-            to_email="",
-            subject=subject,
-            status="failed",
-            error="Order has no email address; status update not sent.",
-        )
+def _order_receipt_message(notification: EmailNotification) -> PrebuiltEmailMessage:
+    order = notification.order
+    estimated_delivery_date = None
+    if order.order_type == Order.OrderType.DELIVERY:
+        estimated_delivery_date = estimate_delivery_date(order.created_at)
 
     context = {
         "order": order,
+        "items": order.items.all(),
+        "estimated_delivery_date": estimated_delivery_date,
+    }
+    msg = PrebuiltEmailMessage(
+        notification.subject,
+        render_to_string("notifications/order_receipt_plain.txt", context),
+        settings.DEFAULT_FROM_EMAIL,
+        [notification.to_email],
+    )
+    msg.attach_alternative(
+        render_to_string("notifications/order_receipt.html", context), "text/html"
+    )
+    name, pdf_bytes = get_order_receipt_pdf(order)
+    msg.attach("order_receipt.pdf", pdf_bytes, "application/pdf")
+    # Saved with the notification once the message is sent.
+    notification.receipt_pdf.name = name
+    return msg
+
+
+def _order_status_update_message(notification: EmailNotification) -> PrebuiltEmailMessage:
+    previous_status_value = notification.context.get("previous_status", "")
+    new_status_value = notification.context.get("new_status") or notification.order.status
+    context = {
+        "order": notification.order,
         "previous_status": previous_status_value,
-        "previous_status_display": previous_status_label,
+        "previous_status_display": (
+            _get_status_label(previous_status_value) if previous_status_value else ""
+        ),
         "new_status": new_status_value,
-        "new_status_display": new_status_label,
+        "new_status_display": _get_status_label(new_status_value),
     }
-    text_body = render_to_string(
-        "notifications/order_status_update_plain.txt", context
+    msg = PrebuiltEmailMessage(
+        notification.subject,
+        render_to_string("notifications/order_status_update_plain.txt", context),
+        settings.DEFAULT_FROM_EMAIL,
+        [notification.to_email],
     )
-    html_body = render_to_string(
-        "notifications/order_status_update.html", context
+    msg.attach_alternative(
+        render_to_string("notifications/order_status_update.html", context), "text/html"
     )
+    return msg
 
-    from_email = settings.DEFAULT_FROM_EMAIL
-
-    try:
-        msg = EmailMultiAlternatives(
-            subject,
-            text_body,
-            from_email,
-            [order.email],
-        )
-        msg.attach_alternative(html_body, "text/html")
 
-        message_id: Optional[str] = None
-        try:
-            message_id = msg.message().get("Message-ID")
-        except Exception:
-            message_id = None
+MESSAGE_BUILDERS = {
+    ORDER_RECEIPT_KIND: _order_receipt_message,
+    ORDER_STATUS_UPDATE_KIND: _order_status_update_message,
+}
 
-        sent_count = msg.send()
-        status = "sent" if sent_count else "failed"
-        sent_at = timezone.now() if sent_count else None
-        error = "" if sent_count else "Email backend did not send message"
 
-        return EmailNotification.objects.create(
-            order=order,
-            kind=ORDER_STATUS_UPDATE_KIND,
-            to_email=order.email,
-            subject=subject,
-            status=status,
-            message_id=message_id or "",
-            error=error,
-            sent_at=sent_at,
-        )
-    except Exception as exc:
-        return EmailNotification.objects.create(
-            order=order,
-            kind=ORDER_STATUS_UPDATE_KIND,
-            to_email=order.email,
-            subject=subject,
-            status="failed",
-            error=str(exc),
-        )
+def build_message(notification: EmailNotification) -> Optional[PrebuiltEmailMessage]:
+    """Render the email for a queued notification, or None for an unknown kind."""
+    builder = MESSAGE_BUILDERS.get(notification.kind)
+    return builder(notification) if builder else None
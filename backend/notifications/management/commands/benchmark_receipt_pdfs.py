@@ -0,0 +1,121 @@
+import json
+import os
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from notifications.pdf import preload, render_receipt_pdf_file
+from notifications.services import new_receipt_pdf_pool
+
+
+def _receipt(number, lines):
+    return {
+        "title": f"Order Receipt #{number}",
+        "details": [
+            "Created: 2026-01-01 12:00",
+            "Customer: Benchmark Buyer",
+            "Email: buyer@example.com",
+            "Fulfillment: Delivery",
+            "Address: 1 Smokehouse Way",
+        ],
+        "items": [(f"Brisket cut {n}", n % 5 + 1, 4500 * (n % 5 + 1)) for n in range(lines)],
+        "totals": [("Subtotal", 450000), ("Delivery", 0), ("Tax", 22500), ("Total", 472500)],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure receipt PDF throughput (PDFs per second, and per core) in-process "
+        "and on receipt PDF pools of several sizes. Nothing is stored."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            nargs="+",
+            default=[0, 1, 2, 4],
+            help="Pool sizes to benchmark; 0 renders in this process.",
+        )
+        parser.add_argument(
+            "--receipts",
+            type=int,
+            default=400,
+            help="Receipts to render per measurement.",
+        )
+        parser.add_argument(
+            "--lines",
+            type=int,
+            default=10,
+            help="Line items per receipt (a few hundred for wholesale orders).",
+        )
+        parser.add_argument(
+            "--output",
+            help="Append one JSON line per measurement to this file for regression tracking.",
+        )
+
+    def _measure(self, workers, receipts):
+        if workers <= 0:
+            preload()
+            started = time.perf_counter()
+            paths = [render_receipt_pdf_file(receipt) for receipt in receipts]
+            elapsed = time.perf_counter() - started
+        else:
+            with new_receipt_pdf_pool(workers) as pool:
+                # Start every process (and run its preload) before timing.
+                for path in pool.map(render_receipt_pdf_file, receipts[: workers * 2]):
+                    os.unlink(path)
+                started = time.perf_counter()
+                paths = list(pool.map(render_receipt_pdf_file, receipts, chunksize=4))
+                elapsed = time.perf_counter() - started
+        pdf_kib = sum(os.path.getsize(path) for path in paths) / len(paths) / 1024
+        for path in paths:
+            os.unlink(path)
+
+        per_second = len(receipts) / elapsed
+        # More workers than CPUs share cores, so divide by the cores in use.
+        cores = min(max(workers, 1), os.cpu_count() or 1)
+        return {
+            "workers": workers,
+            "receipts": len(receipts),
+            "seconds": round(elapsed, 4),
+            "pdfs_per_second": round(per_second, 1),
+            "pdfs_per_second_per_core": round(per_second / cores, 1),
+            "pdf_kib": round(pdf_kib, 1),
+        }
+
+    def _peak_memory(self, receipt):
+        tracemalloc.start()
+        os.unlink(render_receipt_pdf_file(receipt))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak / 1024
+
+    def handle(self, *args, **options):
+        receipts = [_receipt(n, options["lines"]) for n in range(options["receipts"])]
+        self.stdout.write(f"{os.cpu_count()} CPU(s) available.")
+        results = []
+        for workers in options["workers"]:
+            self.stdout.write(f"Benchmarking {workers or 'in-process'} worker(s)...")
+            results.append(self._measure(workers, receipts))
+
+        self.stdout.write(
+            f"{'workers':<9}{'receipts':>9}{'seconds':>10}{'PDFs/s':>10}{'PDFs/s/core':>13}{'PDF KiB':>9}"
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['workers'] or 'inline':<9}{row['receipts']:>9}{row['seconds']:>10.3f}"
+                f"{row['pdfs_per_second']:>10.1f}{row['pdfs_per_second_per_core']:>13.1f}{row['pdf_kib']:>9.1f}"
+            )
+        self.stdout.write(
+            f"Peak memory rendering one {options['lines']}-line receipt: "
+            f"{self._peak_memory(receipts[0]):.0f} KiB"
+        )
+
+        if options["output"]:
+            recorded_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            with open(options["output"], "a", encoding="utf-8") as handle:
+                for row in results:
+                    handle.write(json.dumps({"recorded_at": recorded_at, **row}) + "\n")
+        self.stdout.write(self.style.SUCCESS("Receipt PDF benchmark completed."))
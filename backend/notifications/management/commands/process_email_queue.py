@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.queue import process_email_queue
+
+
+class Command(BaseCommand):
+    help = "Send queued customer emails (receipts and order status updates)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=50,
+            help="Maximum number of emails to send per pass (one backend connection each).",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new emails instead of exiting after one pass.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=5.0,
+            help="Seconds to wait between polls when the queue is empty (with --loop).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            handled = process_email_queue(limit=options["limit"])
+            if handled:
+                self.stdout.write(f"Handled {handled} email(s).")
+            if not options["loop"]:
+                break
+            if handled < options["limit"]:
+                time.sleep(options["sleep"])
+        self.stdout.write(self.style.SUCCESS("Email queue processing completed."))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0002_emailnotification_receipt_pdf"),
+        ("orders", "0003_stockreservation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="emailnotification",
+            name="attempts",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="emailnotification",
+            name="context",
+            field=models.JSONField(blank=True, default=dict, help_text="Extra template values, such as the statuses of a status update"),
+        ),
+        migrations.AddField(
+            model_name="emailnotification",
+            name="next_attempt_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name="emailnotification",
+            index=models.Index(fields=["status", "next_attempt_at"], name="notifications_email_due"),
+        ),
+    ]
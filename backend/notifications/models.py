@@ -1,7 +1,14 @@
 from django.db import models
+from django.utils import timezone
 
 
 class EmailNotification(models.Model):
+    """
+    One customer email. Rows are queued as ``pending`` by the request that
+    wants the email and sent later by ``process_email_queue``; failed sends are
+    retried with backoff until they are parked as ``failed``.
+    """
+
     STATUS_CHOICES = [
         ("pending", "Pending"),
         ("sent", "Sent"),
@@ -25,13 +32,23 @@ class EmailNotification(models.Model):
         null=True,
         help_text="Stored order receipt PDF",
     )
+    context = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Extra template values, such as the statuses of a status update",
+    )
     message_id = models.CharField(max_length=255, blank=True)
     error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
     created_at = models.DateTimeField(auto_now_add=True)
     sent_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="notifications_email_due"),
+        ]
 
     def __str__(self) -> str:
         return f"EmailNotification #{self.id} ({self.kind}) -> {self.to_email}"
@@ -0,0 +1,152 @@
+import tempfile
+from io import BytesIO
+from typing import Any, BinaryIO, Dict, Iterator, List, Tuple
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfgen import canvas
+
+# Kept free of Django imports: receipt pool processes import only this module.
+
+RECEIPT_FONT = "Helvetica"
+RECEIPT_BOLD_FONT = "Helvetica-Bold"
+RECEIPT_FONT_SIZE = 12
+FOOTER_FONT_SIZE = 9
+PAGE_WIDTH, PAGE_HEIGHT = letter
+LINE_HEIGHT = 18
+LEFT_MARGIN = 50
+TOP_MARGIN = 50
+BOTTOM_MARGIN = 60
+QUANTITY_RIGHT = 450
+AMOUNT_RIGHT = PAGE_WIDTH - LEFT_MARGIN
+NAME_WIDTH = QUANTITY_RIGHT - LEFT_MARGIN - 50
+LINES_PER_PAGE = int((PAGE_HEIGHT - TOP_MARGIN - BOTTOM_MARGIN) // LINE_HEIGHT)
+
+# (left text, quantity column, amount column, bold)
+Row = Tuple[str, str, str, bool]
+
+_WARMUP_RECEIPT = {
+    "title": "Order Receipt #0",
+    "details": ["Created: 2000-01-01 00:00"],
+    "items": [("Warm-up", 1, 0)],
+    "totals": [("Total", 0)],
+}
+
+
+def preload() -> None:
+    """
+    Pool initializer: load the receipt font metrics and run one throwaway
+    render, so the first real receipt in each process pays no setup cost.
+    """
+    pdfmetrics.getFont(RECEIPT_FONT)
+    pdfmetrics.getFont(RECEIPT_BOLD_FONT)
+    render_receipt_pdf(_WARMUP_RECEIPT)
+
+
+def _money(cents: int) -> str:
+    return f"${cents / 100:.2f}"
+
+
+def _fit(text: str, width: float) -> str:
+    if pdfmetrics.stringWidth(text, RECEIPT_FONT, RECEIPT_FONT_SIZE) <= width:
+        return text
+    while text and pdfmetrics.stringWidth(text + "...", RECEIPT_FONT, RECEIPT_FONT_SIZE) > width:
+        text = text[:-1]
+    return text + "..."
+
+
+def _text(text: str = "", bold: bool = False) -> Row:
+    return (text, "", "", bold)
+
+
+COLUMN_HEADINGS: Row = ("Item", "Qty", "Amount", True)
+
+
+def paginate_receipt(receipt: Dict[str, Any], lines_per_page: int = LINES_PER_PAGE) -> Iterator[List[Row]]:
+    """
+    Lay a receipt out as pages of rows, yielding one page at a time.
+
+    Every page after the first repeats the title and column headings and
+    starts with the running total brought forward; every page but the last
+    ends with the total carried forward. The totals block is never split
+    across pages.
+    """
+    page: List[Row] = [_text(receipt["title"], bold=True)]
+    page += [_text(line) for line in receipt["details"]]
+    page += [_text(), COLUMN_HEADINGS]
+    running = 0
+
+    def next_page() -> List[Row]:
+        return [
+            _text(f"{receipt['title']} (continued)", bold=True),
+            ("Brought forward", "", _money(running), True),
+            COLUMN_HEADINGS,
+        ]
+
+    for name, quantity, total_cents in receipt["items"]:
+        # Keep the last line of the page for the carried-forward total.
+        if len(page) >= lines_per_page - 1:
+            page.append(("Carried forward", "", _money(running), True))
+            yield page
+            page = next_page()
+        page.append((_fit(name, NAME_WIDTH), str(quantity), _money(total_cents), False))
+        running += total_cents
+
+    totals = [_text()] + [
+        (label, "", _money(cents), label == "Total") for label, cents in receipt["totals"]
+    ]
+    if len(page) + len(totals) > lines_per_page:
+        page.append(("Carried forward", "", _money(running), True))
+        yield page
+        page = next_page()
+    yield page + totals
+
+
+def write_receipt_pdf(receipt: Dict[str, Any], output: BinaryIO) -> None:
+    """
+    Render a receipt prepared by ``notifications.services.receipt_data`` (a
+    title, detail lines, (name, quantity, total_cents) items and (label,
+    cents) totals) into the binary file ``output``.
+
+    Rows are laid out a page at a time and each finished page is compressed
+    straight away, so a long wholesale order costs a few KB per page rather
+    than holding its whole layout in memory.
+    """
+    pdf = canvas.Canvas(output, pagesize=letter, pageCompression=1)
+    pdf.setTitle(receipt["title"])
+
+    for page_number, rows in enumerate(paginate_receipt(receipt), start=1):
+        y = PAGE_HEIGHT - TOP_MARGIN
+        font = None
+        for left, quantity, amount, bold in rows:
+            if font != (RECEIPT_BOLD_FONT if bold else RECEIPT_FONT):
+                font = RECEIPT_BOLD_FONT if bold else RECEIPT_FONT
+                pdf.setFont(font, RECEIPT_FONT_SIZE)
+            pdf.drawString(LEFT_MARGIN, y, left)
+            if quantity:
+                pdf.drawRightString(QUANTITY_RIGHT, y, quantity)
+            if amount:
+                pdf.drawRightString(AMOUNT_RIGHT, y, amount)
+            y -= LINE_HEIGHT
+        pdf.setFont(RECEIPT_FONT, FOOTER_FONT_SIZE)
+        pdf.drawCentredString(PAGE_WIDTH / 2, BOTTOM_MARGIN / 2, f"Page {page_number}")
+        pdf.showPage()
+
+    pdf.save()
+
+
+def render_receipt_pdf(receipt: Dict[str, Any]) -> bytes:
+    """``write_receipt_pdf`` into memory; return raw PDF bytes."""
+    buffer = BytesIO()
+    write_receipt_pdf(receipt, buffer)
+    return buffer.getvalue()
+
+
+def render_receipt_pdf_file(receipt: Dict[str, Any]) -> str:
+    """
+    ``write_receipt_pdf`` into a new temporary file and return its path. The
+    caller streams it where it belongs and deletes it.
+    """
+    with tempfile.NamedTemporaryFile(prefix="receipt-", suffix=".pdf", delete=False) as output:
+        write_receipt_pdf(receipt, output)
+    return output.name
@@ -0,0 +1,147 @@
+import logging
+from datetime import timedelta
+from typing import List, Tuple
+
+from django.core.mail import get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .emails import ORDER_RECEIPT_KIND, PrebuiltEmailMessage, build_message
+from .models import EmailNotification
+from .services import store_order_receipt_pdfs
+
+logger = logging.getLogger(__name__)
+
+EMAIL_QUEUE_MAX_ATTEMPTS = 8
+EMAIL_QUEUE_MAX_BACKOFF = timedelta(hours=1)
+# How long claimed rows stay hidden from other workers while they are sent.
+EMAIL_QUEUE_LEASE = timedelta(minutes=10)
+EMAIL_OUTCOME_FIELDS = [
+    "status",
+    "attempts",
+    "next_attempt_at",
+    "error",
+    "message_id",
+    "sent_at",
+]
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return min(timedelta(seconds=30 * 2 ** max(attempts - 1, 0)), EMAIL_QUEUE_MAX_BACKOFF)
+
+
+def _save_outcome(notification: EmailNotification, *extra_fields: str) -> None:
+    notification.save(update_fields=EMAIL_OUTCOME_FIELDS + list(extra_fields))
+
+
+def _mark_failed(notification: EmailNotification, error: str) -> None:
+    notification.attempts += 1
+    notification.error = error
+    if notification.attempts >= EMAIL_QUEUE_MAX_ATTEMPTS:
+        notification.status = "failed"
+    else:
+        notification.next_attempt_at = timezone.now() + _retry_delay(notification.attempts)
+    _save_outcome(notification)
+
+
+def _mark_sent(notification: EmailNotification, msg: PrebuiltEmailMessage) -> None:
+    notification.attempts += 1
+    notification.status = "sent"
+    notification.sent_at = timezone.now()
+    notification.message_id = msg.message_id
+    notification.error = ""
+    # The message builder set receipt_pdf to the stored PDF it attached.
+    _save_outcome(notification, "receipt_pdf")
+
+
+def _claim_due_notifications(limit: int) -> List[EmailNotification]:
+    with transaction.atomic():
+        notifications = list(
+            EmailNotification.objects.select_for_update(skip_locked=True, of=("self",))
+            .select_related("order")
+            .prefetch_related("order__items")
+            .filter(status="pending", next_attempt_at__lte=timezone.now())
+            .order_by("created_at", "id")[:limit]
+        )
+        if notifications:
+            EmailNotification.objects.filter(pk__in=[n.pk for n in notifications]).update(
+                next_attempt_at=timezone.now() + EMAIL_QUEUE_LEASE
+            )
+    return notifications
+
+
+def process_email_queue(limit: int = 50) -> int:
+    """
+    Send due pending EmailNotification rows and return how many were handled.
+
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED in a short
+    transaction that pushes their next_attempt_at out by EMAIL_QUEUE_LEASE,
+    so several workers can drain the queue side by side without holding row
+    locks while PDFs render and SMTP talks. The batch's missing receipt PDFs
+    are rendered together on the PDF process pool, then one email backend
+    connection is opened and every message is sent through it. Each row's
+    outcome is saved as soon as it is known, so a crash part-way through
+    only retries the rows not yet sent. A message that fails to render or
+    send is retried with exponential backoff and parked as failed after
+    EMAIL_QUEUE_MAX_ATTEMPTS.
+    """
+    notifications = _claim_due_notifications(limit)
+    if not notifications:
+        return 0
+
+    receipt_orders = {
+        n.order_id: n.order for n in notifications if n.kind == ORDER_RECEIPT_KIND
+    }
+    try:
+        # Render the batch's missing receipts side by side on the PDF
+        # pool; the message builders below then find them stored.
+        store_order_receipt_pdfs(receipt_orders.values())
+    except Exception:
+        logger.warning("Could not pre-render receipt PDFs", exc_info=True)
+
+    messages: List[Tuple[EmailNotification, PrebuiltEmailMessage]] = []
+    for notification in notifications:
+        try:
+            msg = build_message(notification)
+        except Exception as exc:
+            logger.warning("Could not render email %s", notification.pk, exc_info=True)
+            _mark_failed(notification, str(exc))
+            continue
+        if msg is None:
+            notification.status = "failed"
+            notification.error = f"Unknown email kind {notification.kind!r}"
+            _save_outcome(notification)
+            continue
+        messages.append((notification, msg))
+
+    if messages:
+        _send_over_one_connection(messages)
+    return len(notifications)
+
+
+def _send_over_one_connection(messages: List[Tuple[EmailNotification, PrebuiltEmailMessage]]) -> None:
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        logger.warning("Could not open the email backend connection: %s", exc)
+        for notification, _ in messages:
+            _mark_failed(notification, str(exc))
+        return
+
+    try:
+        for notification, msg in messages:
+            try:
+                # One message per call gives each row its own outcome; the
+                # backend leaves a connection it did not open itself open.
+                sent_count = connection.send_messages([msg])
+            except Exception as exc:
+                logger.warning("Email %s failed: %s", notification.pk, exc)
+                _mark_failed(notification, str(exc))
+                continue
+            if sent_count:
+                _mark_sent(notification, msg)
+            else:
+                _mark_failed(notification, "Email backend did not send message")
+    finally:
+        connection.close()
@@ -1,89 +1,215 @@
-from io import BytesIO
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import storages
 
 from orders.models import Order
 
+from .pdf import preload, render_receipt_pdf, render_receipt_pdf_file
 
-def generate_order_receipt_pdf(order: Order) -> bytes:
+logger = logging.getLogger(__name__)
+
+RECEIPT_PDF_PREFIX = "receipts"
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def receipt_data(order: Order) -> Dict[str, Any]:
     """
-    Generate a simple 1-page PDF receipt for the given order.
-    The PDF must include:
+    The receipt for ``order`` as plain values, ready for ``write_receipt_pdf``
+    in this process or a pool process. It includes:
       - Order id and created date
       - Customer name and email
       - Fulfillment type (pickup / delivery)
       - Shipping / pickup details (if present)
       - Line items: product name, quantity, line total
       - Subtotal, tax, total from Order fields
-    Return raw PDF bytes.
     """
-    buffer = BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=letter)
-    _, height = letter
-
-    y = height - 50
-    line_height = 18
-
-    def write_line(text: str) -> None:
-        nonlocal y
-        pdf.drawString(50, y, text)
-        y -= line_height
-
-    pdf.setTitle(f"Order Receipt #{order.id}")
-
-    write_line(f"Order Receipt #{order.id}")
-    write_line(f"Created: {order.created_at.strftime('%Y-%m-%d %H:%M')}")
-    write_line(f"Customer: {order.full_name}")
-    write_line(f"Email: {order.email}")
-    fulfillment = (
-        order.get_order_type_display()
-        if hasattr(order, "get_order_type_display")
-        else order.order_type
-    )
-    write_line(f"Fulfillment: {fulfillment}")
+    details = [
+        f"Created: {order.created_at.strftime('%Y-%m-%d %H:%M')}",
+        f"Customer: {order.full_name}",
+        f"Email: {order.email}",
+        f"Fulfillment: {order.get_order_type_display()}",
+    ]
 
     if order.order_type == Order.OrderType.DELIVERY:
         if order.address_line1:
-            write_line(f"Address: {order.address_line1}")
+            details.append(f"Address: {order.address_line1}")
         if order.address_line2:
-            write_line(order.address_line2)
+            details.append(order.address_line2)
         city_line = " ".join(
             part
             for part in [order.city, order.postal_code]
             if part
         ).strip()
         if city_line:
-            write_line(city_line)
+            details.append(city_line)
         if order.delivery_notes:
-            write_line(f"Delivery notes: {order.delivery_notes}")
+            details.append(f"Delivery notes: {order.delivery_notes}")
         if order.delivery_service_area:
-            write_line(f"Service area: {order.delivery_service_area}")
+            details.append(f"Service area: {order.delivery_service_area}")
         if order.delivery_eta_text:
-            write_line(f"ETA: {order.delivery_eta_text}")
+            details.append(f"ETA: {order.delivery_eta_text}")
     elif order.order_type == Order.OrderType.PICKUP:
         if order.pickup_location:
-            write_line(f"Pickup location: {order.pickup_location}")
+            details.append(f"Pickup location: {order.pickup_location}")
         if order.pickup_instructions:
-            write_line(f"Pickup instructions: {order.pickup_instructions}")
-
-    write_line("")
-    write_line("Items:")
-    for item in order.items.all():
-        write_line(
-            f"- {item.product_name} x{item.quantity}: ${item.total_cents / 100:.2f}"
-        )
+            details.append(f"Pickup instructions: {order.pickup_instructions}")
 
-    write_line("")
-    write_line(f"Subtotal: ${order.subtotal_cents / 100:.2f}")
+    totals = [("Subtotal", order.subtotal_cents)]
     if order.order_type == Order.OrderType.DELIVERY:
-        write_line(f"Delivery: ${order.delivery_fee_cents / 100:.2f}")
-    write_line(f"Tax: ${order.tax_cents / 100:.2f}")
-    write_line(f"Total: ${order.total_cents / 100:.2f}")
+        totals.append(("Delivery", order.delivery_fee_cents))
+    totals += [("Tax", order.tax_cents), ("Total", order.total_cents)]
+
+    return {
+        "title": f"Order Receipt #{order.id}",
+        "details": details,
+        "items": [
+            (item.product_name, item.quantity, item.total_cents)
+            for item in order.items.all()
+        ],
+        "totals": totals,
+    }
+
+
+def generate_order_receipt_pdf(order: Order) -> bytes:
+    """Render the order's PDF receipt in this process and return raw PDF bytes."""
+    return render_receipt_pdf(receipt_data(order))
+
+
+def new_receipt_pdf_pool(workers: int) -> ProcessPoolExecutor:
+    """A pool of ``workers`` processes with ReportLab loaded and warmed up."""
+    # Spawned, not forked: the children never inherit database connections
+    # or other threads' locks.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=preload,
+    )
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    workers = settings.RECEIPT_PDF_WORKERS
+    if workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = new_receipt_pdf_pool(workers)
+        return _pool
+
+
+def _discard_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _remove_files(paths: Iterable[str]) -> None:
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def _gather_paths(futures: List[Future]) -> List[str]:
+    # Wait for every render, so none is still writing when a failure makes
+    # us delete the files the others produced.
+    wait(futures)
+    paths = [future.result() for future in futures if future.exception() is None]
+    for future in futures:
+        if future.exception() is not None:
+            _remove_files(paths)
+            raise future.exception()
+    return paths
+
+
+def render_receipt_pdf_files(receipts: List[Dict[str, Any]]) -> List[str]:
+    """
+    Render receipts into temporary files on the RECEIPT_PDF_WORKERS process
+    pool and return their paths, in order; the caller deletes them. If any
+    receipt fails, the files already written are deleted before the error is
+    raised. With no pool configured, or if the pool has died, they render in
+    this process.
+    """
+    pool = _get_pool()
+    if pool is not None:
+        try:
+            return _gather_paths([pool.submit(render_receipt_pdf_file, receipt) for receipt in receipts])
+        except BrokenProcessPool:
+            logger.warning("Receipt PDF pool died; rendering in-process", exc_info=True)
+            _discard_pool()
+    paths: List[str] = []
+    try:
+        for receipt in receipts:
+            paths.append(render_receipt_pdf_file(receipt))
+    except BaseException:
+        _remove_files(paths)
+        raise
+    return paths
+
+
+def receipt_pdf_name(order_id: int, receipt: Dict[str, Any]) -> str:
+    """
+    Storage name of a receipt from ``receipt_data``. It is keyed on what the
+    receipt shows, so changes it does not show (a status update, say) reuse
+    the stored PDF, while a changed receipt gets a new name and the copies
+    already sent stay as they were.
+    """
+    encoded = json.dumps(receipt, sort_keys=True, separators=(",", ":")).encode()
+    return f"{RECEIPT_PDF_PREFIX}/order_{order_id}_{hashlib.sha256(encoded).hexdigest()[:16]}.pdf"
+
+
+def store_order_receipt_pdfs(orders: Iterable[Order]) -> Dict[int, str]:
+    """
+    Make sure each order's receipt is in storage and return {order id: name}.
+
+    Receipts are stored under a name derived from their content, so a resend
+    of an unchanged receipt reuses the stored PDF. The others are rendered
+    together on the process pool into temporary files, which are streamed
+    into storage rather than read into memory.
+    """
+    storage = storages["default"]
+    result: Dict[int, str] = {}
+    missing: List[Tuple[Order, Dict[str, Any]]] = []
+    for order in orders:
+        receipt = receipt_data(order)
+        name = receipt_pdf_name(order.id, receipt)
+        result[order.id] = name
+        if not storage.exists(name):
+            missing.append((order, receipt))
+    if not missing:
+        return result
+
+    paths = render_receipt_pdf_files([receipt for _, receipt in missing])
+    try:
+        for (order, _), path in zip(missing, paths):
+            name = result[order.id]
+            if not storage.exists(name):
+                with open(path, "rb") as rendered:
+                    # Another worker may have stored the same name meanwhile;
+                    # the storage then picks a free name, which is the one to keep.
+                    result[order.id] = storage.save(name, File(rendered, name=os.path.basename(name)))
+    finally:
+        _remove_files(paths)
+    return result
 
-    pdf.showPage()
-    pdf.save()
 
-    pdf_bytes = buffer.getvalue()
-    buffer.close()
-    return pdf_bytes
+def get_order_receipt_pdf(order: Order) -> Tuple[str, bytes]:
+    """The order's stored receipt (rendered first if needed): (storage name, PDF bytes)."""
+    name = store_order_receipt_pdfs([order])[order.id]
+    with storages["default"].open(name, "rb") as stored:
+        return name, stored.read()
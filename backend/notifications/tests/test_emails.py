@@ -1,14 +1,17 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from unittest import mock
 
 from django.core import mail
+from django.core.mail import EmailMultiAlternatives
 from django.test import TestCase, override_settings
 from django.utils import timezone
 
 from notifications.emails import (
-    send_order_receipt_email,
-    send_order_receipt_email_once,
+    queue_order_receipt_email,
+    queue_order_receipt_email_once,
 )
 from notifications.models import EmailNotification
+from notifications.queue import process_email_queue
 from orders.models import Order, OrderItem
 from products.models import Product
 
@@ -51,8 +54,14 @@ class SendOrderReceiptEmailTests(TestCase):
         )
 
     def test_send_order_receipt_email_creates_notification_and_pdf(self):
-        notification = send_order_receipt_email(self.order)
+        notification = queue_order_receipt_email(self.order)
 
+        self.assertEqual(notification.status, "pending")
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.assertEqual(process_email_queue(), 1)
+
+        notification.refresh_from_db()
         self.assertEqual(EmailNotification.objects.count(), 1)
         self.assertEqual(notification.status, "sent")
         self.assertEqual(notification.to_email, self.order.email)
@@ -67,22 +76,46 @@ class SendOrderReceiptEmailTests(TestCase):
         self.assertEqual(filename, "order_receipt.pdf")
         self.assertEqual(mimetype, "application/pdf")
         self.assertTrue(content)
+        self.assertTrue(notification.receipt_pdf)
+        self.assertTrue(notification.message_id)
+
+    def test_receipt_mime_is_built_once_and_keeps_its_message_id(self):
+        queue_order_receipt_email(self.order)
+        build = EmailMultiAlternatives.message
+
+        with mock.patch.object(
+            EmailMultiAlternatives, "message", autospec=True, side_effect=build
+        ) as message:
+            process_email_queue()
+
+        self.assertEqual(message.call_count, 1)
+        notification = EmailNotification.objects.get()
+        self.assertEqual(mail.outbox[0].message()["Message-ID"], notification.message_id)
 
     def test_send_order_receipt_email_once_is_idempotent(self):
-        first = send_order_receipt_email_once(self.order)
-        second = send_order_receipt_email_once(self.order)
+        first = queue_order_receipt_email_once(self.order)
+        process_email_queue()
+        second = queue_order_receipt_email_once(self.order)
 
         self.assertEqual(first.id, second.id)
         self.assertEqual(EmailNotification.objects.count(), 1)
         self.assertEqual(len(mail.outbox), 1)
-        self.assertEqual(first.status, "sent")
+        self.assertEqual(second.status, "sent")
+
+    def test_receipt_is_queued_once_while_pending(self):
+        first = queue_order_receipt_email_once(self.order)
+        second = queue_order_receipt_email_once(self.order)
+
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(second.status, "pending")
 
     def test_receipt_includes_delivery_fee_and_estimated_delivery_date(self):
         created_at = timezone.make_aware(datetime(2025, 1, 1, 10, 0, 0))
         Order.objects.filter(pk=self.order.pk).update(created_at=created_at)
         self.order.refresh_from_db()
 
-        send_order_receipt_email(self.order)
+        queue_order_receipt_email(self.order)
+        process_email_queue()
 
         self.assertEqual(len(mail.outbox), 1)
         message = mail.outbox[0]
@@ -123,11 +156,16 @@ class OrderStatusUpdateEmailTests(TestCase):
         )
 
     def test_status_change_sends_email_and_creates_notification(self):
-        with self.captureOnCommitCallbacks(execute=True):
-            self.order.status = Order.Status.PROCESSING
-            self.order.save(update_fields=["status"])
+        self.order.status = Order.Status.PROCESSING
+        self.order.save(update_fields=["status"])
 
         notification = EmailNotification.objects.get(kind="order_status_update")
+        self.assertEqual(notification.status, "pending")
+        self.assertEqual(len(mail.outbox), 0)
+
+        process_email_queue()
+
+        notification.refresh_from_db()
         self.assertEqual(notification.status, "sent")
 
         self.assertEqual(len(mail.outbox), 1)
@@ -143,3 +181,110 @@ class OrderStatusUpdateEmailTests(TestCase):
 
         self.assertEqual(EmailNotification.objects.filter(kind="order_status_update").count(), 0)
         self.assertEqual(len(mail.outbox), 0)
+
+
+@override_settings(
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    DEFAULT_FROM_EMAIL="no-reply@example.com",
+)
+class EmailQueueTests(TestCase):
+    def setUp(self):
+        self.orders = [
+            Order.objects.create(
+                full_name=f"Buyer {n}",
+                email=f"buyer{n}@example.com",
+                phone="1234567890",
+                order_type=Order.OrderType.PICKUP,
+            )
+            for n in range(3)
+        ]
+
+    def _queue_status_emails(self):
+        for order in self.orders:
+            order.status = Order.Status.PROCESSING
+            order.save(update_fields=["status"])
+
+    def test_one_connection_is_reused_for_the_whole_batch(self):
+        self._queue_status_emails()
+
+        with mock.patch(
+            "notifications.queue.get_connection", wraps=mail.get_connection
+        ) as get_connection:
+            self.assertEqual(process_email_queue(), 3)
+
+        get_connection.assert_called_once()
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(EmailNotification.objects.filter(status="sent").count(), 3)
+        self.assertEqual(process_email_queue(), 0)
+
+    def test_rows_are_claimed_before_sending_and_saved_one_by_one(self):
+        self._queue_status_emails()
+        locmem_send = mail.get_connection().__class__.send_messages
+        claimed_while_sending = []
+
+        def send_messages(backend, messages):
+            # The claim is committed, so a second worker finds nothing due.
+            claimed_while_sending.append(process_email_queue())
+            return locmem_send(backend, messages)
+
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages", send_messages
+        ), mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.close",
+            side_effect=RuntimeError("worker killed"),
+        ):
+            with self.assertRaises(RuntimeError):
+                process_email_queue()
+
+        self.assertEqual(claimed_while_sending, [0, 0, 0])
+        # Every send was saved as it happened, so none is sent again.
+        self.assertEqual(EmailNotification.objects.filter(status="sent").count(), 3)
+        EmailNotification.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(process_email_queue(), 0)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_failed_send_is_retried_with_backoff(self):
+        self._queue_status_emails()
+        failing = mock.Mock(side_effect=OSError("smtp down"))
+
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages", failing):
+            self.assertEqual(process_email_queue(), 3)
+            # Not due yet, so a second pass leaves them alone.
+            self.assertEqual(process_email_queue(), 0)
+
+        notification = EmailNotification.objects.first()
+        self.assertEqual(notification.status, "pending")
+        self.assertEqual(notification.attempts, 1)
+        self.assertEqual(notification.error, "smtp down")
+        self.assertGreater(notification.next_attempt_at, timezone.now())
+
+        EmailNotification.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(process_email_queue(), 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(EmailNotification.objects.get(pk=notification.pk).attempts, 2)
+
+    @mock.patch("notifications.queue.EMAIL_QUEUE_MAX_ATTEMPTS", new=2)
+    def test_email_is_parked_after_max_attempts(self):
+        queue_order_receipt_email(self.orders[0])
+        failing = mock.Mock(side_effect=OSError("smtp down"))
+
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages", failing):
+            for _ in range(3):
+                process_email_queue()
+                EmailNotification.objects.update(
+                    next_attempt_at=timezone.now() - timedelta(seconds=1)
+                )
+
+        notification = EmailNotification.objects.get()
+        self.assertEqual(notification.status, "failed")
+        self.assertEqual(notification.attempts, 2)
+        self.assertEqual(failing.call_count, 2)
+
+    def test_order_without_email_is_not_queued(self):
+        Order.objects.filter(pk=self.orders[0].pk).update(email="")
+        self.orders[0].refresh_from_db()
+
+        notification = queue_order_receipt_email(self.orders[0])
+
+        self.assertEqual(notification.status, "failed")
+        self.assertEqual(process_email_queue(), 0)
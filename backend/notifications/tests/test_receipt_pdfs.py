@@ -0,0 +1,188 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from notifications.pdf import LINES_PER_PAGE, paginate_receipt, render_receipt_pdf
+from notifications.services import (
+    get_order_receipt_pdf,
+    receipt_data,
+    render_receipt_pdf_files,
+    store_order_receipt_pdfs,
+)
+from orders.models import Order, OrderItem
+from products.models import Product
+
+LOCAL_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+class ReceiptPdfTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(STORAGES=LOCAL_STORAGES, MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.order = Order.objects.create(
+            full_name="Jane Doe",
+            email="jane@example.com",
+            phone="1234567890",
+            order_type=Order.OrderType.PICKUP,
+            subtotal_cents=2000,
+            tax_cents=100,
+            total_cents=2100,
+        )
+        product = Product.objects.create(name="Ribeye Steak", slug="ribeye-steak", price_cents=2000)
+        OrderItem.objects.create(
+            order=self.order,
+            product=product,
+            product_name="Ribeye Steak",
+            quantity=1,
+            unit_price_cents=2000,
+            total_cents=2000,
+        )
+
+    def test_unchanged_order_reuses_the_stored_pdf(self):
+        name, pdf_bytes = get_order_receipt_pdf(self.order)
+
+        with mock.patch("notifications.services.render_receipt_pdf_files") as render:
+            self.assertEqual(get_order_receipt_pdf(self.order), (name, pdf_bytes))
+
+        render.assert_not_called()
+        self.assertTrue(pdf_bytes.startswith(b"%PDF"))
+        self.assertTrue(name.startswith(f"receipts/order_{self.order.id}_"))
+
+    def test_changed_order_gets_a_new_pdf(self):
+        first, _ = get_order_receipt_pdf(self.order)
+
+        self.order.full_name = "Jane Smith"
+        self.order.save(update_fields=["full_name", "updated_at"])
+        second, _ = get_order_receipt_pdf(self.order)
+
+        self.assertNotEqual(first, second)
+
+    def test_status_change_reuses_the_stored_pdf(self):
+        first, _ = get_order_receipt_pdf(self.order)
+
+        self.order.status = Order.Status.PROCESSING
+        self.order.save(update_fields=["status", "updated_at"])
+
+        self.assertEqual(get_order_receipt_pdf(self.order)[0], first)
+        self.assertEqual(default_storage.listdir("receipts")[1], [os.path.basename(first)])
+
+    def test_name_chosen_by_the_storage_is_returned(self):
+        first, _ = get_order_receipt_pdf(self.order)
+
+        exists = FileSystemStorage.exists
+        missed = []
+
+        def racing_exists(storage, name):
+            # Another worker stores the same name just after both of our checks.
+            if name == first and len(missed) < 2:
+                missed.append(name)
+                return False
+            return exists(storage, name)
+
+        with mock.patch.object(FileSystemStorage, "exists", autospec=True, side_effect=racing_exists):
+            second = store_order_receipt_pdfs([self.order])[self.order.id]
+
+        self.assertNotEqual(second, first)
+        self.assertTrue(default_storage.exists(second))
+
+    @override_settings(RECEIPT_PDF_WORKERS=0)
+    def test_every_temporary_file_is_deleted_when_storing_fails(self):
+        other = Order.objects.create(
+            full_name="John Doe", email="john@example.com", phone="1", order_type=Order.OrderType.PICKUP
+        )
+        rendered = []
+
+        def render(receipts):
+            rendered.extend(render_receipt_pdf_files(receipts))
+            return rendered
+
+        with mock.patch("notifications.services.render_receipt_pdf_files", side_effect=render), \
+                mock.patch.object(FileSystemStorage, "save", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                store_order_receipt_pdfs([self.order, other])
+
+        self.assertEqual(len(rendered), 2)
+        self.assertFalse(any(os.path.exists(path) for path in rendered))
+
+    @override_settings(RECEIPT_PDF_WORKERS=1)
+    def test_pool_renders_the_same_receipts_as_in_process(self):
+        receipt = receipt_data(self.order)
+
+        pooled = render_receipt_pdf_files([receipt, receipt])
+        with override_settings(RECEIPT_PDF_WORKERS=0):
+            inline = render_receipt_pdf_files([receipt])
+
+        self.assertEqual(len(pooled), 2)
+        sizes = []
+        for path in pooled + inline:
+            self.addCleanup(os.unlink, path)
+            with open(path, "rb") as rendered:
+                self.assertEqual(rendered.read(4), b"%PDF")
+            sizes.append(os.path.getsize(path))
+        # ReportLab stamps a creation time, so compare sizes rather than bytes.
+        self.assertAlmostEqual(sizes[0], sizes[-1], delta=64)
+
+
+class ReceiptPaginationTests(SimpleTestCase):
+    def _wholesale_receipt(self, lines):
+        return {
+            "title": "Order Receipt #7",
+            "details": ["Created: 2026-01-01 12:00", "Customer: Wholesale Buyer"],
+            "items": [(f"Brisket cut {n}", 2, 1000) for n in range(lines)],
+            "totals": [("Subtotal", lines * 1000), ("Tax", 0), ("Total", lines * 1000)],
+        }
+
+    def test_long_order_is_split_into_pages_with_running_totals(self):
+        pages = list(paginate_receipt(self._wholesale_receipt(300)))
+
+        self.assertGreater(len(pages), 1)
+        for page in pages:
+            self.assertLessEqual(len(page), LINES_PER_PAGE)
+        items = [row for page in pages for row in page if row[0].startswith("Brisket cut")]
+        self.assertEqual(len(items), 300)
+
+        carried = 0
+        for number, page in enumerate(pages):
+            if number:
+                self.assertEqual(page[0][0], "Order Receipt #7 (continued)")
+                self.assertEqual(page[1], ("Brought forward", "", f"${carried / 100:.2f}", True))
+                self.assertEqual(page[2][:3], ("Item", "Qty", "Amount"))
+            carried += 1000 * sum(1 for row in page if row[0].startswith("Brisket cut"))
+            if number < len(pages) - 1:
+                self.assertEqual(page[-1], ("Carried forward", "", f"${carried / 100:.2f}", True))
+        self.assertEqual(pages[-1][-1], ("Total", "", "$3000.00", True))
+
+    def test_totals_block_is_never_split(self):
+        # Fill the first page so exactly the totals no longer fit.
+        header_rows = 5
+        receipt = self._wholesale_receipt(LINES_PER_PAGE - 1 - header_rows)
+
+        pages = list(paginate_receipt(receipt))
+
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(pages[0][-1][0], "Carried forward")
+        self.assertEqual([row[0] for row in pages[1][-3:]], ["Subtotal", "Tax", "Total"])
+
+    def test_short_order_fits_on_one_page(self):
+        pages = list(paginate_receipt(self._wholesale_receipt(3)))
+
+        self.assertEqual(len(pages), 1)
+        self.assertNotIn("Carried forward", [row[0] for row in pages[0]])
+
+    def test_wholesale_pdf_has_one_page_per_layout_page(self):
+        receipt = self._wholesale_receipt(300)
+
+        pdf_bytes = render_receipt_pdf(receipt)
+
+        self.assertEqual(pdf_bytes.count(b"/Type /Page\n"), len(list(paginate_receipt(receipt))))
@@ -10,7 +10,8 @@ from django.utils.html import format_html_join
 
 from notifications.models import EmailNotification
 
-from .models import Order, OrderItem
+from .models import Order, OrderItem, StockReservation
+from .reservations import release_reservations
 from .utils import calculate_tax_cents
 
 STATUS_COLORS = {
@@ -353,6 +354,36 @@ class OrderAdmin(admin.ModelAdmin):
     latest_receipt_link.short_description = "Latest Receipt"
 
 
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ("order", "product", "quantity", "status", "expires_at", "created_at")
+    list_filter = ("status", "created_at")
+    search_fields = ("order__id", "product__name")
+    list_select_related = ("order", "product")
+    readonly_fields = (
+        "order",
+        "product",
+        "quantity",
+        "status",
+        "expires_at",
+        "created_at",
+        "resolved_at",
+    )
+    actions = ["release_now"]
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Release held stock now")
+    def release_now(self, request, queryset):
+        released = 0
+        for order in Order.objects.filter(
+            reservations__in=queryset.filter(status=StockReservation.Status.HELD)
+        ).distinct():
+            released += release_reservations(order)
+        self.message_user(request, f"{released} reservation(s) released.")
+
+
 def orders_dashboard(request):
     today = timezone.now().date()
     todays_orders = Order.objects.filter(created_at__date=today)
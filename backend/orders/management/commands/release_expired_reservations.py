@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.reservations import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = "Release checkout stock holds whose payment never arrived"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=500,
+            help="Maximum number of reservations to release per batch.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep sweeping instead of exiting after one batch.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=30.0,
+            help="Seconds to wait between sweeps when nothing is due (with --loop).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired_reservations(limit=options["limit"])
+            if released:
+                self.stdout.write(f"Released {released} expired reservation(s).")
+            if not options["loop"]:
+                break
+            if released < options["limit"]:
+                time.sleep(options["sleep"])
+        self.stdout.write(self.style.SUCCESS("Reservation sweep completed."))
@@ -1,5 +1,4 @@
 from django.db import models
-from django.db import transaction
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 
@@ -73,6 +72,43 @@ class OrderItem(models.Model):
         return f"{self.product_name} x {self.quantity}"
 
 
+class StockReservation(models.Model):
+    """
+    A hold on ``quantity`` units of a product for an unpaid order. While held,
+    the units are counted in ``Product.reserved_quantity`` so other checkouts
+    cannot claim them; the hold is converted when the order is paid or released
+    when the payment fails or ``expires_at`` passes.
+    """
+
+    class Status(models.TextChoices):
+        HELD = "held", "Held"
+        CONVERTED = "converted", "Converted"
+        RELEASED = "released", "Released"
+
+    order = models.ForeignKey(
+        Order, related_name="reservations", on_delete=models.CASCADE
+    )
+    product = models.ForeignKey(
+        Product, related_name="reservations", on_delete=models.CASCADE
+    )
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.HELD
+    )
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "expires_at"], name="orders_reservation_due"),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x product {self.product_id} for order #{self.order_id} ({self.status})"
+
+
 @receiver(pre_save, sender=Order)
 def _orders_store_previous_status(sender, instance: Order, raw=False, **kwargs):
     if raw or not instance.pk:
@@ -88,7 +124,7 @@ def _orders_store_previous_status(sender, instance: Order, raw=False, **kwargs):
 
 
 @receiver(post_save, sender=Order)
-def _orders_send_status_update_email(
+def _orders_queue_status_update_email(
     sender,
     instance: Order,
     created: bool,
@@ -105,20 +141,11 @@ def _orders_send_status_update_email(
     if not previous_status or previous_status == instance.status:
         return
 
-    order_id = instance.pk
-    new_status = instance.status
-
-    def _send_email():
-        from notifications.emails import send_order_status_update_email
+    from notifications.emails import queue_order_status_update_email
 
-        try:
-            order = Order.objects.get(pk=order_id)
-        except Order.DoesNotExist:
-            return
-        send_order_status_update_email(
-            order,
-            previous_status=previous_status,
-            new_status=new_status,
-        )
-
-    transaction.on_commit(_send_email)
+    # Queued in the same transaction as the status change; process_email_queue sends it.
+    queue_order_status_update_email(
+        instance,
+        previous_status=previous_status,
+        new_status=instance.status,
+    )
@@ -0,0 +1,147 @@
+import os
+from collections import Counter
+from datetime import timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from products.models import Product
+
+from .models import Order, StockReservation
+
+STOCK_RESERVATION_TTL = timedelta(
+    minutes=int(os.environ.get("STOCK_RESERVATION_MINUTES", "15"))
+)
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_ids: List[int]):
+        self.product_ids = product_ids
+        super().__init__(f"Not enough stock for products: {', '.join(map(str, product_ids))}")
+
+
+def hold_stock(order: Order, lines: Iterable[Tuple[Product, int]]) -> List[StockReservation]:
+    """
+    Reserve stock for each (product, quantity) line of ``order``.
+
+    Each product is claimed with one conditional UPDATE:
+
+        UPDATE ... SET reserved_quantity = reserved_quantity + n
+        WHERE id = %s AND square_quantity >= reserved_quantity + n
+
+    so the check and the claim are a single statement that only locks that
+    product's row, and checkouts for different products never wait on each
+    other. Rows are claimed in id order to avoid deadlocks between baskets.
+    Only products whose stock Square tracks (``square_stock_tracked``) are
+    held; other Square variations have no count to hold against.
+
+    On a shortfall every line is still checked, then InsufficientStock is
+    raised with the product ids that could not be held and the lines already
+    claimed are rolled back. Run it in the transaction that creates the order
+    and keep that transaction short: the product rows stay locked until commit.
+    """
+    wanted: Counter = Counter()
+    for product, quantity in lines:
+        if product.square_variation_id and product.square_stock_tracked and quantity > 0:
+            wanted[product.pk] += quantity
+
+    expires_at = timezone.now() + STOCK_RESERVATION_TTL
+    with transaction.atomic():
+        short = []
+        for product_id in sorted(wanted):
+            quantity = wanted[product_id]
+            claimed = Product.objects.filter(
+                pk=product_id,
+                square_quantity__gte=F("reserved_quantity") + quantity,
+            ).update(reserved_quantity=F("reserved_quantity") + quantity)
+            if not claimed:
+                short.append(product_id)
+        if short:
+            raise InsufficientStock(short)
+
+        return StockReservation.objects.bulk_create(
+            [
+                StockReservation(
+                    order=order,
+                    product_id=product_id,
+                    quantity=quantity,
+                    expires_at=expires_at,
+                )
+                for product_id, quantity in sorted(wanted.items())
+            ]
+        )
+
+
+def _unreserve(quantities: Dict[int, int]) -> int:
+    quantities = {pk: qty for pk, qty in quantities.items() if qty > 0}
+    if not quantities:
+        return 0
+    held = Case(
+        *(When(pk=pk, then=Value(qty)) for pk, qty in sorted(quantities.items())),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    return Product.objects.filter(pk__in=quantities.keys()).update(
+        reserved_quantity=Greatest(F("reserved_quantity") - held, Value(0))
+    )
+
+
+def _resolve(reservations: List[StockReservation], status: str) -> int:
+    if not reservations:
+        return 0
+    quantities: Counter = Counter()
+    for reservation in reservations:
+        quantities[reservation.product_id] += reservation.quantity
+    StockReservation.objects.filter(pk__in=[r.pk for r in reservations]).update(
+        status=status, resolved_at=timezone.now()
+    )
+    _unreserve(quantities)
+    return len(reservations)
+
+
+def _held_for_order(order: Order) -> List[StockReservation]:
+    return list(
+        StockReservation.objects.select_for_update()
+        .filter(order=order, status=StockReservation.Status.HELD)
+        .order_by("product_id")
+    )
+
+
+def convert_reservations(order: Order) -> int:
+    """
+    Mark the order's held reservations converted once it is paid. The stock
+    itself is taken off ``square_quantity`` by the usual sale decrement, so the
+    hold is simply dropped from ``reserved_quantity``. Safe to call twice.
+    """
+    with transaction.atomic():
+        return _resolve(_held_for_order(order), StockReservation.Status.CONVERTED)
+
+
+def release_reservations(order: Order) -> int:
+    """Give the order's held stock back, e.g. when its payment fails."""
+    with transaction.atomic():
+        return _resolve(_held_for_order(order), StockReservation.Status.RELEASED)
+
+
+def release_expired_reservations(limit: int = 500) -> int:
+    """
+    Release up to ``limit`` holds past their ``expires_at``, oldest first.
+
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several
+    sweepers (or a sweeper racing a payment webhook) never release the same
+    hold twice. A payment that lands after its hold expired still goes through;
+    it is then decremented like an unreserved sale.
+    """
+    with transaction.atomic():
+        expired = list(
+            StockReservation.objects.select_for_update(skip_locked=True)
+            .filter(
+                status=StockReservation.Status.HELD,
+                expires_at__lte=timezone.now(),
+            )
+            .order_by("expires_at", "id")[:limit]
+        )
+        return _resolve(expired, StockReservation.Status.RELEASED)
@@ -0,0 +1,165 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import OperationalError, connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from orders.models import Order, StockReservation
+from orders.reservations import (
+    InsufficientStock,
+    convert_reservations,
+    hold_stock,
+    release_expired_reservations,
+    release_reservations,
+)
+from products.models import Product
+
+CHECKOUTS = 120
+WORKERS = 8
+TURKEYS = 40
+
+
+def _order(index=0):
+    return Order.objects.create(
+        full_name=f"Buyer {index}",
+        email=f"buyer{index}@example.com",
+        phone="5550000000",
+        order_type=Order.OrderType.PICKUP,
+    )
+
+
+class HoldStockTests(TestCase):
+    def setUp(self):
+        tracked = {"square_stock_tracked": True}
+        self.turkey = Product.objects.create(
+            name="Turkey", slug="turkey", price_cents=1, square_variation_id="VAR_T", square_quantity=3, **tracked
+        )
+        self.brisket = Product.objects.create(
+            name="Brisket", slug="brisket", price_cents=1, square_variation_id="VAR_B", square_quantity=5, **tracked
+        )
+        self.sauce = Product.objects.create(name="Sauce", slug="sauce", price_cents=1)
+
+    def test_holds_each_tracked_line_and_merges_duplicates(self):
+        order = _order()
+        held = hold_stock(order, [(self.turkey, 1), (self.brisket, 2), (self.turkey, 1), (self.sauce, 9)])
+
+        self.assertEqual(sorted((r.product_id, r.quantity) for r in held), [(self.turkey.pk, 2), (self.brisket.pk, 2)])
+        self.turkey.refresh_from_db()
+        self.brisket.refresh_from_db()
+        self.sauce.refresh_from_db()
+        self.assertEqual((self.turkey.reserved_quantity, self.brisket.reserved_quantity), (2, 2))
+        self.assertEqual(self.sauce.reserved_quantity, 0)
+        self.assertTrue(all(r.expires_at > timezone.now() for r in held))
+
+    def test_square_variation_without_tracked_stock_is_not_held(self):
+        gift_card = Product.objects.create(
+            name="Gift card", slug="gift-card", price_cents=1, square_variation_id="VAR_G", square_quantity=0
+        )
+
+        held = hold_stock(_order(), [(gift_card, 2), (self.turkey, 1)])
+
+        self.assertEqual([r.product_id for r in held], [self.turkey.pk])
+        gift_card.refresh_from_db()
+        self.assertEqual(gift_card.reserved_quantity, 0)
+
+    def test_shortfall_rolls_back_every_line(self):
+        hold_stock(_order(1), [(self.turkey, 2)])
+
+        with self.assertRaises(InsufficientStock) as ctx:
+            hold_stock(_order(2), [(self.brisket, 1), (self.turkey, 2)])
+
+        self.assertEqual(ctx.exception.product_ids, [self.turkey.pk])
+        self.brisket.refresh_from_db()
+        self.assertEqual(self.brisket.reserved_quantity, 0)
+        self.assertEqual(StockReservation.objects.count(), 1)
+
+    def test_convert_and_release_drop_the_hold_once(self):
+        paid, failed = _order(1), _order(2)
+        hold_stock(paid, [(self.turkey, 1)])
+        hold_stock(failed, [(self.turkey, 2)])
+
+        self.assertEqual(convert_reservations(paid), 1)
+        self.assertEqual(convert_reservations(paid), 0)
+        self.assertEqual(release_reservations(failed), 1)
+        self.assertEqual(release_reservations(failed), 0)
+
+        self.turkey.refresh_from_db()
+        self.assertEqual(self.turkey.reserved_quantity, 0)
+        self.assertEqual(
+            dict(StockReservation.objects.values_list("order_id", "status")),
+            {paid.pk: StockReservation.Status.CONVERTED, failed.pk: StockReservation.Status.RELEASED},
+        )
+
+    def test_sweeper_releases_only_expired_holds(self):
+        stale, fresh = _order(1), _order(2)
+        hold_stock(stale, [(self.turkey, 1), (self.brisket, 4)])
+        hold_stock(fresh, [(self.brisket, 1)])
+        StockReservation.objects.filter(order=stale).update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        out = StringIO()
+        call_command("release_expired_reservations", stdout=out)
+
+        self.assertIn("Released 2 expired reservation(s).", out.getvalue())
+        self.turkey.refresh_from_db()
+        self.brisket.refresh_from_db()
+        self.assertEqual((self.turkey.reserved_quantity, self.brisket.reserved_quantity), (0, 1))
+        self.assertEqual(release_expired_reservations(), 0)
+        # The freed units can be held again.
+        hold_stock(_order(3), [(self.brisket, 4)])
+
+
+class ConcurrentHoldTests(TransactionTestCase):
+    """
+    Many checkouts race for a hot SKU. Exactly the units in stock are held and
+    the rest are refused, while a second product is checked out concurrently.
+    SQLite reports lock contention as an error, so those attempts are retried.
+    """
+
+    def setUp(self):
+        tracked = {"square_stock_tracked": True}
+        self.turkey = Product.objects.create(
+            name="Turkey", slug="turkey", price_cents=1, square_variation_id="VAR_T", square_quantity=TURKEYS, **tracked
+        )
+        self.ribs = Product.objects.create(
+            name="Ribs", slug="ribs", price_cents=1, square_variation_id="VAR_R", square_quantity=CHECKOUTS, **tracked
+        )
+        self.orders = [_order(index) for index in range(CHECKOUTS)]
+
+    def _checkout(self, order, start):
+        product = self.turkey if order.pk % 2 else self.ribs
+        start.wait()
+        try:
+            for attempt in range(1000):
+                try:
+                    with transaction.atomic():
+                        hold_stock(order, [(product, 1)])
+                    return True
+                except InsufficientStock:
+                    return False
+                except OperationalError as exc:
+                    if "locked" not in str(exc):
+                        raise
+                    time.sleep(random.uniform(0, min(0.001 * 2 ** attempt, 0.05)))
+        finally:
+            connections.close_all()
+        raise AssertionError(f"order {order.id} never got the lock")
+
+    def test_hot_sku_is_never_overheld(self):
+        start = threading.Event()
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            futures = [pool.submit(self._checkout, order, start) for order in self.orders]
+            start.set()
+            results = [future.result() for future in futures]
+
+        self.turkey.refresh_from_db()
+        self.ribs.refresh_from_db()
+        self.assertEqual(self.turkey.reserved_quantity, TURKEYS)
+        self.assertEqual(self.ribs.reserved_quantity, CHECKOUTS // 2)
+        self.assertEqual(results.count(True), TURKEYS + CHECKOUTS // 2)
+        self.assertEqual(StockReservation.objects.filter(product=self.turkey).count(), TURKEYS)
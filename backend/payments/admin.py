@@ -1,6 +1,10 @@
+import json
+
 from django.contrib import admin
+from django.utils import timezone
+from django.utils.html import format_html
 
-from .models import Payment
+from .models import Payment, PaymentPayload, StripeEvent
 
 
 @admin.register(Payment)
@@ -16,9 +20,54 @@ class PaymentAdmin(admin.ModelAdmin):
     )
     list_filter = ("provider", "kind", "status", "created_at")
     search_fields = ("id", "order__id", "stripe_payment_intent_id", "stripe_charge_id")
-    readonly_fields = ("created_at", "updated_at")
+    readonly_fields = ("created_at", "updated_at", "raw_payload_display")
 
     def amount_display(self, obj):
         return "$" + f"{obj.amount_cents/100:.2f}"
 
     amount_display.short_description = "Amount"
+
+    def raw_payload_display(self, obj):
+        # Only rendered on the change form, so the blob is never loaded for lists.
+        record = PaymentPayload.objects.filter(payment=obj).first() if obj.pk else None
+        if not record:
+            return "—"
+        return format_html(
+            '<pre style="max-height:400px;overflow:auto;">{}</pre>',
+            json.dumps(record.load(), indent=2, sort_keys=True),
+        )
+
+    raw_payload_display.short_description = "Raw Stripe payload"
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = (
+        "event_id",
+        "event_type",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "received_at",
+        "processed_at",
+    )
+    list_filter = ("status", "event_type", "received_at")
+    search_fields = ("event_id",)
+    readonly_fields = (
+        "event_id",
+        "event_type",
+        "payload",
+        "attempts",
+        "last_error",
+        "received_at",
+        "processed_at",
+    )
+    actions = ["retry_now"]
+
+    @admin.action(description="Retry now")
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status=StripeEvent.Status.PROCESSED).update(
+            status=StripeEvent.Status.PENDING,
+            next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f"{updated} event(s) queued for retry.")
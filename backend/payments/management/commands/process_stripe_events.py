@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.webhooks import process_pending_stripe_events
+
+
+class Command(BaseCommand):
+    help = "Apply pending Stripe webhook events from the StripeEvent inbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=50,
+            help="Maximum number of events to handle per batch.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new events instead of exiting after one batch.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=2.0,
+            help="Seconds to wait between polls when the inbox is empty (with --loop).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            handled = process_pending_stripe_events(limit=options["limit"])
+            if handled:
+                self.stdout.write(f"Handled {handled} Stripe event(s).")
+            if not options["loop"]:
+                break
+            if handled < options["limit"]:
+                time.sleep(options["sleep"])
+        self.stdout.write(self.style.SUCCESS("Stripe event processing completed."))
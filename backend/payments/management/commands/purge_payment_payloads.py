@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from payments.services import purge_raw_payloads
+
+
+class Command(BaseCommand):
+    help = "Delete stored Stripe payloads older than the configured retention period"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.PAYMENT_RAW_PAYLOAD_RETENTION_DAYS,
+            help="Retention in days (defaults to PAYMENT_RAW_PAYLOAD_RETENTION_DAYS).",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        self.stdout.write(f"Purging Stripe payloads stored before {cutoff:%Y-%m-%d}...")
+        deleted = purge_raw_payloads(cutoff, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} payload(s)."))
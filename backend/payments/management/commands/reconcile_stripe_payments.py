@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from payments.reconciliation import reconcile_payment_intents
+
+
+def _parse_moment(value: str) -> datetime:
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Invalid date or datetime: {value}")
+        moment = datetime.combine(day, datetime.min.time())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = "Reconcile succeeded Stripe PaymentIntents against local Payment and Order rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            help="Start of the created-time window (ISO date or datetime). Defaults to --days ago.",
+        )
+        parser.add_argument(
+            "--until",
+            help="End of the created-time window (exclusive). Defaults to now.",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=7,
+            help="Window length in days when --since is not given.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the gaps without writing anything.",
+        )
+
+    def handle(self, *args, **options):
+        end = _parse_moment(options["until"]) if options["until"] else timezone.now()
+        if options["since"]:
+            start = _parse_moment(options["since"])
+        else:
+            start = end - timedelta(days=options["days"])
+        if start >= end:
+            raise CommandError("--since must be before --until.")
+
+        self.stdout.write(f"Reconciling Stripe PaymentIntents created {start:%Y-%m-%d %H:%M} – {end:%Y-%m-%d %H:%M}...")
+        report = reconcile_payment_intents(
+            start,
+            end,
+            batch_size=options["batch_size"],
+            dry_run=options["dry_run"],
+        )
+
+        verb = "Would repair" if options["dry_run"] else "Repaired"
+        self.stdout.write(
+            f"Scanned {report.scanned} intent(s), {report.succeeded} succeeded. "
+            f"{verb}: {report.payments_created} missing payment(s), "
+            f"{report.payments_updated} stale payment(s), "
+            f"{report.orders_advanced} order(s) advanced to processing."
+        )
+        if report.unmatched:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{report.unmatched} succeeded intent(s) have no matching order: "
+                    + ", ".join(report.unmatched_sample)
+                )
+            )
+        self.stdout.write(self.style.SUCCESS("Stripe reconciliation completed."))
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:38
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0002_rename_payments_pay_order_i_7f2e26_idx_payments_pa_order_i_4d9364_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StripeEvent",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("event_id", models.CharField(max_length=255, unique=True)),
+                ("event_type", models.CharField(blank=True, max_length=100)),
+                ("payload", models.JSONField()),
+                ("status", models.CharField(choices=[("pending", "Pending"), ("processed", "Processed"), ("failed", "Failed")], default="pending", max_length=20)),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("next_attempt_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("last_error", models.TextField(blank=True)),
+                ("received_at", models.DateTimeField(auto_now_add=True)),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ["received_at"],
+                "indexes": [models.Index(fields=["status", "next_attempt_at"], name="payments_st_status_8d04fd_idx")],
+            },
+        ),
+    ]
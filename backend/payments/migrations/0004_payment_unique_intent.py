@@ -0,0 +1,54 @@
+from django.db import migrations, models
+
+
+def blank_intent_ids_to_null(apps, _schema_editor):
+    Payment = apps.get_model("payments", "Payment")
+    Payment.objects.filter(stripe_payment_intent_id="").update(stripe_payment_intent_id=None)
+
+    # Concurrent webhook deliveries could insert the same intent twice; keep the
+    # most recently updated row for each intent so the constraint can be added.
+    duplicate_ids = (
+        Payment.objects.exclude(stripe_payment_intent_id__isnull=True)
+        .values("stripe_payment_intent_id")
+        .annotate(rows=models.Count("id"))
+        .filter(rows__gt=1)
+        .values_list("stripe_payment_intent_id", flat=True)
+    )
+    for intent_id in list(duplicate_ids):
+        rows = Payment.objects.filter(stripe_payment_intent_id=intent_id).order_by(
+            "-updated_at", "-id"
+        )
+        keep = rows.first()
+        rows.exclude(pk=keep.pk).delete()
+
+
+def null_intent_ids_to_blank(apps, _schema_editor):
+    Payment = apps.get_model("payments", "Payment")
+    Payment.objects.filter(stripe_payment_intent_id__isnull=True).update(stripe_payment_intent_id="")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0003_stripeevent"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="payment",
+            name="payments_pa_stripe__6fe52c_idx",
+        ),
+        migrations.AlterField(
+            model_name="payment",
+            name="stripe_payment_intent_id",
+            field=models.CharField(blank=True, default=None, max_length=255, null=True),
+        ),
+        migrations.RunPython(blank_intent_ids_to_null, null_intent_ids_to_blank),
+        migrations.AddConstraint(
+            model_name="payment",
+            constraint=models.UniqueConstraint(
+                fields=("stripe_payment_intent_id",),
+                name="payments_payment_unique_intent",
+            ),
+        ),
+    ]
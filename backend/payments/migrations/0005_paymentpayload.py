@@ -0,0 +1,80 @@
+import json
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def _store_batch(PaymentPayload, batch, stored_at):
+    PaymentPayload.objects.bulk_create(batch)
+    # auto_now stamps bulk_create with the migration time; keep each payload
+    # on its payment's own timestamp so the retention window is not restarted.
+    PaymentPayload.objects.filter(pk__in=stored_at.keys()).update(
+        stored_at=models.Case(
+            *[models.When(pk=pk, then=models.Value(at)) for pk, at in stored_at.items()],
+            output_field=models.DateTimeField(),
+        )
+    )
+
+
+def move_raw_payloads(apps, _schema_editor):
+    Payment = apps.get_model("payments", "Payment")
+    PaymentPayload = apps.get_model("payments", "PaymentPayload")
+
+    batch = []
+    stored_at = {}
+    for payment_id, payload, updated_at in (
+        Payment.objects.exclude(raw_payload__isnull=True)
+        .values_list("id", "raw_payload", "updated_at")
+        .iterator(chunk_size=500)
+    ):
+        raw = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode()
+        batch.append(PaymentPayload(payment_id=payment_id, codec="zlib", data=zlib.compress(raw)))
+        stored_at[payment_id] = updated_at
+        if len(batch) >= 500:
+            _store_batch(PaymentPayload, batch, stored_at)
+            batch, stored_at = [], {}
+    if batch:
+        _store_batch(PaymentPayload, batch, stored_at)
+
+
+def restore_raw_payloads(apps, _schema_editor):
+    Payment = apps.get_model("payments", "Payment")
+    PaymentPayload = apps.get_model("payments", "PaymentPayload")
+
+    for record in PaymentPayload.objects.iterator(chunk_size=500):
+        payload = json.loads(zlib.decompress(bytes(record.data)))
+        Payment.objects.filter(pk=record.payment_id).update(raw_payload=payload)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0004_payment_unique_intent"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PaymentPayload",
+            fields=[
+                (
+                    "payment",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="raw_payload_record",
+                        serialize=False,
+                        to="payments.payment",
+                    ),
+                ),
+                ("codec", models.CharField(choices=[("zlib", "zlib")], default="zlib", max_length=10)),
+                ("data", models.BinaryField()),
+                ("stored_at", models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+        migrations.RunPython(move_raw_payloads, restore_raw_payloads),
+        migrations.RemoveField(
+            model_name="payment",
+            name="raw_payload",
+        ),
+    ]
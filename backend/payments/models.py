@@ -1,4 +1,8 @@
+import json
+import zlib
+
 from django.db import models
+from django.utils import timezone
 
 from orders.models import Order
 
@@ -36,9 +40,12 @@ class Payment(models.Model):
     status = models.CharField(
         max_length=50, choices=Status.choices, default=Status.REQUIRES_PAYMENT_METHOD
     )
-    stripe_payment_intent_id = models.CharField(max_length=255, blank=True)
+    # NULL (not "") when there is no intent, so the unique constraint only
+    # applies to real intent ids.
+    stripe_payment_intent_id = models.CharField(
+        max_length=255, blank=True, null=True, default=None
+    )
     stripe_charge_id = models.CharField(max_length=255, blank=True)
-    raw_payload = models.JSONField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -46,7 +53,12 @@ class Payment(models.Model):
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["order", "created_at"]),
-            models.Index(fields=["stripe_payment_intent_id"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["stripe_payment_intent_id"],
+                name="payments_payment_unique_intent",
+            ),
         ]
 
     def __str__(self):
@@ -54,3 +66,74 @@ class Payment(models.Model):
             f"Payment #{self.id} - order #{self.order_id} - "
             f"{self.amount_cents/100:.2f} {self.currency.upper()} ({self.status})"
         )
+
+
+class PaymentPayload(models.Model):
+    """
+    Compressed copy of the Stripe object behind a Payment.
+
+    Kept out of the payments table so list and admin queries never drag the
+    blob along; it is only read on the admin detail page and is purged after
+    PAYMENT_RAW_PAYLOAD_RETENTION_DAYS by ``manage.py purge_payment_payloads``.
+    """
+
+    class Codec(models.TextChoices):
+        ZLIB = "zlib", "zlib"
+
+    payment = models.OneToOneField(
+        Payment,
+        primary_key=True,
+        related_name="raw_payload_record",
+        on_delete=models.CASCADE,
+    )
+    codec = models.CharField(
+        max_length=10, choices=Codec.choices, default=Codec.ZLIB
+    )
+    data = models.BinaryField()
+    stored_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"Payload for payment #{self.payment_id}"
+
+    @classmethod
+    def pack(cls, payment_id: int, payload) -> "PaymentPayload":
+        raw = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode()
+        return cls(payment_id=payment_id, codec=cls.Codec.ZLIB, data=zlib.compress(raw))
+
+    def load(self):
+        return json.loads(zlib.decompress(bytes(self.data)))
+
+
+class StripeEvent(models.Model):
+    """
+    Inbox row for a verified Stripe webhook event.
+
+    The webhook only stores the event and acknowledges it; a worker
+    (``manage.py process_stripe_events``) applies it later with retries.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        PROCESSED = "processed", "Processed"
+        FAILED = "failed", "Failed"
+
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100, blank=True)
+    payload = models.JSONField()
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["received_at"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"StripeEvent {self.event_id} ({self.event_type or 'unknown'}, {self.status})"
@@ -0,0 +1,193 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+import stripe
+from django.db import transaction
+
+from orders.models import Order
+
+from .models import Payment
+from .services import UPSERT_FIELDS, store_raw_payloads
+
+SUCCEEDED = "succeeded"
+SAMPLE_LIMIT = 20
+
+
+class StripePaymentIntentClient:
+    """Thin wrapper around stripe.PaymentIntent.list so tests can swap in a stand-in."""
+
+    def list_payment_intents(
+        self,
+        *,
+        created_gte: int,
+        created_lt: int,
+        limit: int,
+        starting_after: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        params: Dict[str, Any] = {
+            "created": {"gte": created_gte, "lt": created_lt},
+            "limit": limit,
+        }
+        if starting_after:
+            params["starting_after"] = starting_after
+        page = stripe.PaymentIntent.list(**params)
+        return {
+            "data": [intent.to_dict() for intent in page.data],
+            "has_more": bool(page.has_more),
+        }
+
+
+@dataclass
+class ReconciliationReport:
+    scanned: int = 0
+    succeeded: int = 0
+    payments_created: int = 0
+    payments_updated: int = 0
+    orders_advanced: int = 0
+    unmatched: int = 0
+    unmatched_sample: List[str] = field(default_factory=list)
+
+    def note_unmatched(self, intent_id: str) -> None:
+        self.unmatched += 1
+        if len(self.unmatched_sample) < SAMPLE_LIMIT:
+            self.unmatched_sample.append(intent_id)
+
+
+def iter_payment_intent_pages(
+    client,
+    start: datetime,
+    end: datetime,
+    page_size: int = 100,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yield PaymentIntents created in [start, end) one Stripe page at a time."""
+    starting_after: Optional[str] = None
+    while True:
+        page = client.list_payment_intents(
+            created_gte=int(start.timestamp()),
+            created_lt=int(end.timestamp()),
+            limit=page_size,
+            starting_after=starting_after,
+        )
+        data = page.get("data") or []
+        if data:
+            yield data
+        if not page.get("has_more") or not data:
+            break
+        starting_after = data[-1]["id"]
+
+
+def _order_id_for(intent: Dict[str, Any]) -> Optional[int]:
+    raw = (intent.get("metadata") or {}).get("order_id")
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+def _reconcile_batch(
+    intents: List[Dict[str, Any]], report: ReconciliationReport, dry_run: bool
+) -> None:
+    by_id = {intent["id"]: intent for intent in intents}
+    order_ids = {oid for oid in map(_order_id_for, intents) if oid is not None}
+
+    known_orders = dict(
+        Order.objects.filter(id__in=order_ids).values_list("id", "status")
+    )
+    existing_payments = dict(
+        Payment.objects.filter(stripe_payment_intent_id__in=by_id.keys()).values_list(
+            "stripe_payment_intent_id", "status"
+        )
+    )
+
+    matched_ids = {
+        intent_id
+        for intent_id, intent in by_id.items()
+        if _order_id_for(intent) in known_orders
+    }
+    for intent_id in by_id.keys() - matched_ids:
+        report.note_unmatched(intent_id)
+
+    missing_ids = matched_ids - existing_payments.keys()
+    stale_ids = {
+        intent_id
+        for intent_id in matched_ids & existing_payments.keys()
+        if existing_payments[intent_id] != SUCCEEDED
+    }
+    placed_order_ids = {
+        order_id
+        for order_id, status in known_orders.items()
+        if status == Order.Status.PLACED
+    }
+
+    report.payments_created += len(missing_ids)
+    report.payments_updated += len(stale_ids)
+    report.orders_advanced += len(placed_order_ids)
+    if dry_run:
+        return
+
+    with transaction.atomic():
+        repaired = Payment.objects.bulk_create(
+            [
+                Payment(
+                    order_id=_order_id_for(by_id[intent_id]),
+                    provider=Payment.Provider.STRIPE,
+                    kind=Payment.Kind.CHARGE,
+                    amount_cents=by_id[intent_id]["amount"],
+                    currency=by_id[intent_id].get("currency", "cad"),
+                    status=SUCCEEDED,
+                    stripe_payment_intent_id=intent_id,
+                )
+                for intent_id in missing_ids | stale_ids
+            ],
+            update_conflicts=True,
+            unique_fields=["stripe_payment_intent_id"],
+            update_fields=UPSERT_FIELDS,
+        )
+        store_raw_payloads(
+            (payment.pk, by_id[payment.stripe_payment_intent_id]) for payment in repaired
+        )
+        # Only PLACED orders move forward; anything shipped or cancelled is left alone.
+        Order.objects.filter(
+            id__in=placed_order_ids, status=Order.Status.PLACED
+        ).update(status=Order.Status.PROCESSING)
+
+
+def reconcile_payment_intents(
+    start: datetime,
+    end: datetime,
+    *,
+    client=None,
+    page_size: int = 100,
+    batch_size: int = 500,
+    dry_run: bool = False,
+) -> ReconciliationReport:
+    """
+    Compare succeeded Stripe PaymentIntents created in [start, end) with local
+    Payment and Order rows and repair the gaps.
+
+    Intents are streamed page by page and diffed in batches of ``batch_size``
+    with a fixed number of queries per batch, so memory stays bounded no matter
+    how many intents the window holds. Repairs are record-level only: missing
+    Payment rows are inserted, non-succeeded ones updated and PLACED orders
+    advanced to PROCESSING. No emails or inventory changes are triggered.
+    """
+    client = client or StripePaymentIntentClient()
+    report = ReconciliationReport()
+    batch: List[Dict[str, Any]] = []
+
+    for page in iter_payment_intent_pages(client, start, end, page_size=page_size):
+        report.scanned += len(page)
+        for intent in page:
+            if intent.get("status") != SUCCEEDED:
+                continue
+            report.succeeded += 1
+            batch.append(intent)
+        if len(batch) >= batch_size:
+            _reconcile_batch(batch, report, dry_run)
+            batch = []
+
+    if batch:
+        _reconcile_batch(batch, report, dry_run)
+
+    return report
@@ -1,8 +1,42 @@
-from typing import Any, Dict
+from datetime import datetime
+from typing import Any, Dict, Iterable, Tuple
 
 from orders.models import Order
 
-from .models import Payment
+from .models import Payment, PaymentPayload
+
+UPSERT_FIELDS = [
+    "order",
+    "amount_cents",
+    "currency",
+    "status",
+    "updated_at",
+]
+
+
+def store_raw_payloads(payloads: Iterable[Tuple[int, Dict[str, Any]]]) -> None:
+    """Upsert compressed raw payloads for (payment_id, payload) pairs in one statement."""
+    rows = [PaymentPayload.pack(payment_id, payload) for payment_id, payload in payloads]
+    PaymentPayload.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["payment"],
+        update_fields=["codec", "data", "stored_at"],
+    )
+
+
+def purge_raw_payloads(older_than: datetime, batch_size: int = 1000) -> int:
+    """Delete payloads stored before ``older_than`` in batches; returns rows deleted."""
+    deleted = 0
+    while True:
+        batch = list(
+            PaymentPayload.objects.filter(stored_at__lt=older_than)
+            .order_by("stored_at")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not batch:
+            return deleted
+        deleted += PaymentPayload.objects.filter(pk__in=batch).delete()[0]
 
 
 def record_stripe_payment_from_intent(
@@ -17,47 +51,25 @@ def record_stripe_payment_from_intent(
       - currency=intent_data.get('currency', 'cad')
       - status=intent_data.get('status', 'succeeded')
       - stripe_payment_intent_id=intent_data['id']
-      - raw_payload=intent_data
-    If a Payment with this stripe_payment_intent_id already exists, update its status,
-    raw_payload and amount fields instead of creating a new row.
+    Written as a single INSERT ... ON CONFLICT DO UPDATE on stripe_payment_intent_id,
+    so concurrent deliveries for one intent settle on one row without a prior SELECT.
+    The intent payload itself is upserted, compressed, into PaymentPayload.
     Return the Payment instance.
     """
-    amount_cents = intent_data["amount"]
-    currency = intent_data.get("currency", "cad")
-    status = intent_data.get("status", "succeeded")
-    stripe_payment_intent_id = intent_data["id"]
-
-    existing = Payment.objects.filter(
-        stripe_payment_intent_id=stripe_payment_intent_id
-    ).first()
-    if existing:
-        existing.order = order
-        existing.amount_cents = amount_cents
-        existing.currency = currency
-        existing.status = status
-        existing.raw_payload = intent_data
-        if not existing.stripe_payment_intent_id:
-            existing.stripe_payment_intent_id = stripe_payment_intent_id
-        existing.save(
-            update_fields=[
-                "order",
-                "amount_cents",
-                "currency",
-                "status",
-                "raw_payload",
-                "stripe_payment_intent_id",
-                "updated_at",
-            ]
-        )
-        return existing
-
-    return Payment.objects.create(
+    payment = Payment(
         order=order,
         provider=Payment.Provider.STRIPE,
         kind=Payment.Kind.CHARGE,
-        amount_cents=amount_cents,
-        currency=currency,
-        status=status,
-        stripe_payment_intent_id=stripe_payment_intent_id,
-        raw_payload=intent_data,
+        amount_cents=intent_data["amount"],
+        currency=intent_data.get("currency", "cad"),
+        status=intent_data.get("status", "succeeded"),
+        stripe_payment_intent_id=intent_data["id"],
+    )
+    Payment.objects.bulk_create(
+        [payment],
+        update_conflicts=True,
+        unique_fields=["stripe_payment_intent_id"],
+        update_fields=UPSERT_FIELDS,
     )
+    store_raw_payloads([(payment.pk, intent_data)])
+    return payment
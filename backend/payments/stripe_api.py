@@ -1,11 +1,13 @@
 import os
 
 import stripe
+from django.db import transaction
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
 from orders.models import Order, OrderItem
+from orders.reservations import InsufficientStock, hold_stock, release_reservations
 from orders.utils import DeliveryZoneError, calculate_tax_cents, get_delivery_quote
 from products.models import Product
 
@@ -152,40 +154,57 @@ def create_checkout(request):
     tax_cents = calculate_tax_cents(subtotal_cents, delivery_fee_cents)
     total_cents = subtotal_cents + delivery_fee_cents + tax_cents
 
-    order = Order.objects.create(
-        full_name=data.get("full_name", ""),
-        email=data.get("email", ""),
-        phone=data.get("phone", ""),
-        order_type=order_type,
-        address_line1=address.get("line1", ""),
-        address_line2=address.get("line2", ""),
-        city=address.get("city", ""),
-        postal_code=address.get("postal_code", ""),
-        delivery_notes=delivery_notes,
-        delivery_service_area=delivery_service_area,
-        delivery_fee_cents=delivery_fee_cents,
-        delivery_eta_text=delivery_eta_text,
-        notes=data.get("notes", ""),
-        pickup_location=data.get("pickup_location", ""),
-        pickup_instructions=data.get("pickup_instructions", ""),
-        subtotal_cents=subtotal_cents,
-        tax_cents=tax_cents,
-        total_cents=total_cents,
-        status=Order.Status.PLACED,
-    )
+    # Order, items and stock holds commit together, and before Stripe is called,
+    # so a hot product's row is only locked for the few statements of this block.
+    try:
+        with transaction.atomic():
+            order = Order.objects.create(
+                full_name=data.get("full_name", ""),
+                email=data.get("email", ""),
+                phone=data.get("phone", ""),
+                order_type=order_type,
+                address_line1=address.get("line1", ""),
+                address_line2=address.get("line2", ""),
+                city=address.get("city", ""),
+                postal_code=address.get("postal_code", ""),
+                delivery_notes=delivery_notes,
+                delivery_service_area=delivery_service_area,
+                delivery_fee_cents=delivery_fee_cents,
+                delivery_eta_text=delivery_eta_text,
+                notes=data.get("notes", ""),
+                pickup_location=data.get("pickup_location", ""),
+                pickup_instructions=data.get("pickup_instructions", ""),
+                subtotal_cents=subtotal_cents,
+                tax_cents=tax_cents,
+                total_cents=total_cents,
+                status=Order.Status.PLACED,
+            )
 
-    order_items = [
-        OrderItem(
-            order=order,
-            product=item_data["product"],
-            product_name=item_data["product_name"],
-            quantity=item_data["quantity"],
-            unit_price_cents=item_data["unit_price_cents"],
-            total_cents=item_data["total_cents"],
+            order_items = [
+                OrderItem(
+                    order=order,
+                    product=item_data["product"],
+                    product_name=item_data["product_name"],
+                    quantity=item_data["quantity"],
+                    unit_price_cents=item_data["unit_price_cents"],
+                    total_cents=item_data["total_cents"],
+                )
+                for item_data in order_items_data
+            ]
+            OrderItem.objects.bulk_create(order_items)
+            hold_stock(
+                order,
+                ((item_data["product"], item_data["quantity"]) for item_data in order_items_data),
+            )
+    except InsufficientStock as exc:
+        names = sorted(products[pid].name for pid in exc.product_ids)
+        return Response(
+            {
+                "detail": f"Not enough stock for: {', '.join(names)}.",
+                "product_ids": exc.product_ids,
+            },
+            status=status.HTTP_409_CONFLICT,
         )
-        for item_data in order_items_data
-    ]
-    OrderItem.objects.bulk_create(order_items)
 
     try:
         intent = stripe.PaymentIntent.create(
@@ -196,6 +215,7 @@ def create_checkout(request):
             metadata={"order_id": str(order.id)},
         )
     except Exception as exc:
+        release_reservations(order)
         return Response(
             {"detail": "Unable to create payment intent.", "error": str(exc)},
             status=status.HTTP_502_BAD_GATEWAY,
@@ -0,0 +1,55 @@
+from typing import Any, Dict, List, Optional
+
+
+class FakeStripeClient:
+    """
+    In-memory stand-in for StripePaymentIntentClient.
+
+    Mirrors the Stripe list API: newest first, created-time filtering and
+    cursor pagination through ``starting_after``.
+    """
+
+    def __init__(self, intents: List[Dict[str, Any]]):
+        self.intents = sorted(intents, key=lambda i: (-i["created"], i["id"]))
+        self.calls = 0
+
+    def list_payment_intents(
+        self,
+        *,
+        created_gte: int,
+        created_lt: int,
+        limit: int,
+        starting_after: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        self.calls += 1
+        window = [
+            intent
+            for intent in self.intents
+            if created_gte <= intent["created"] < created_lt
+        ]
+        start = 0
+        if starting_after:
+            ids = [intent["id"] for intent in window]
+            start = ids.index(starting_after) + 1
+        data = window[start : start + limit]
+        return {"data": data, "has_more": start + limit < len(window)}
+
+
+def make_intent(
+    intent_id: str,
+    *,
+    created: int,
+    order_id=None,
+    amount: int = 1000,
+    status: str = "succeeded",
+) -> Dict[str, Any]:
+    metadata = {"order_id": str(order_id)} if order_id is not None else {}
+    return {
+        "id": intent_id,
+        "object": "payment_intent",
+        "amount": amount,
+        "currency": "cad",
+        "created": created,
+        "status": status,
+        "metadata": metadata,
+    }
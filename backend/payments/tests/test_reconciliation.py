@@ -0,0 +1,153 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from orders.models import Order
+from payments.models import Payment
+from payments.reconciliation import reconcile_payment_intents
+
+from .fakes import FakeStripeClient, make_intent
+
+WINDOW_START = datetime(2026, 3, 1, tzinfo=dt_timezone.utc)
+WINDOW_END = WINDOW_START + timedelta(days=1)
+
+
+def _ts(minutes: int) -> int:
+    return int((WINDOW_START + timedelta(minutes=minutes)).timestamp())
+
+
+class ReconcilePaymentIntentsTests(TestCase):
+    def _order(self, status=Order.Status.PLACED):
+        return Order.objects.create(
+            full_name="Recon Test",
+            email="recon@example.com",
+            phone="5550000000",
+            order_type=Order.OrderType.PICKUP,
+            total_cents=1000,
+            status=status,
+        )
+
+    def test_repairs_missing_and_stale_payments_and_advances_orders(self):
+        missing_order = self._order()
+        stale_order = self._order()
+        healthy_order = self._order(status=Order.Status.PROCESSING)
+        shipped_order = self._order(status=Order.Status.SHIPPED)
+        Payment.objects.create(
+            order=stale_order,
+            amount_cents=1000,
+            status="processing",
+            stripe_payment_intent_id="pi_stale",
+        )
+        Payment.objects.create(
+            order=healthy_order,
+            amount_cents=1000,
+            status="succeeded",
+            stripe_payment_intent_id="pi_healthy",
+        )
+        client = FakeStripeClient(
+            [
+                make_intent("pi_missing", created=_ts(1), order_id=missing_order.id),
+                make_intent("pi_stale", created=_ts(2), order_id=stale_order.id),
+                make_intent("pi_healthy", created=_ts(3), order_id=healthy_order.id),
+                make_intent("pi_shipped", created=_ts(4), order_id=shipped_order.id),
+                make_intent("pi_orphan", created=_ts(5), order_id=999999),
+                make_intent("pi_abandoned", created=_ts(6), order_id=missing_order.id, status="canceled"),
+                make_intent("pi_outside", created=_ts(60 * 25), order_id=missing_order.id),
+            ]
+        )
+
+        report = reconcile_payment_intents(WINDOW_START, WINDOW_END, client=client)
+
+        self.assertEqual(report.scanned, 6)
+        self.assertEqual(report.succeeded, 5)
+        self.assertEqual(report.payments_created, 2)
+        self.assertEqual(report.payments_updated, 1)
+        self.assertEqual(report.orders_advanced, 2)
+        self.assertEqual(report.unmatched_sample, ["pi_orphan"])
+
+        self.assertEqual(
+            Payment.objects.get(stripe_payment_intent_id="pi_missing").order_id,
+            missing_order.id,
+        )
+        self.assertEqual(
+            Payment.objects.get(stripe_payment_intent_id="pi_stale").status, "succeeded"
+        )
+        self.assertTrue(Payment.objects.filter(stripe_payment_intent_id="pi_shipped").exists())
+        self.assertFalse(Payment.objects.filter(stripe_payment_intent_id="pi_orphan").exists())
+
+        missing_order.refresh_from_db()
+        stale_order.refresh_from_db()
+        shipped_order.refresh_from_db()
+        self.assertEqual(missing_order.status, Order.Status.PROCESSING)
+        self.assertEqual(stale_order.status, Order.Status.PROCESSING)
+        self.assertEqual(shipped_order.status, Order.Status.SHIPPED)
+
+    def test_second_run_finds_nothing_to_repair(self):
+        order = self._order()
+        client = FakeStripeClient([make_intent("pi_once", created=_ts(1), order_id=order.id)])
+
+        reconcile_payment_intents(WINDOW_START, WINDOW_END, client=client)
+        report = reconcile_payment_intents(WINDOW_START, WINDOW_END, client=client)
+
+        self.assertEqual(report.payments_created, 0)
+        self.assertEqual(report.orders_advanced, 0)
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_dry_run_writes_nothing(self):
+        order = self._order()
+        client = FakeStripeClient([make_intent("pi_dry", created=_ts(1), order_id=order.id)])
+
+        report = reconcile_payment_intents(WINDOW_START, WINDOW_END, client=client, dry_run=True)
+
+        self.assertEqual(report.payments_created, 1)
+        self.assertEqual(Payment.objects.count(), 0)
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.PLACED)
+
+    def test_query_count_is_fixed_per_batch(self):
+        orders = [self._order() for _ in range(30)]
+        client = FakeStripeClient(
+            [
+                make_intent(f"pi_bulk_{i}", created=_ts(i), order_id=order.id)
+                for i, order in enumerate(orders)
+            ]
+        )
+
+        # Three batches of ten, each: orders lookup, payments lookup, savepoint,
+        # payment upsert, payload upsert, order update, release.
+        with self.assertNumQueries(3 * 7):
+            report = reconcile_payment_intents(
+                WINDOW_START, WINDOW_END, client=client, page_size=10, batch_size=10
+            )
+
+        self.assertEqual(client.calls, 3)
+        self.assertEqual(report.payments_created, 30)
+        self.assertEqual(Payment.objects.count(), 30)
+
+
+class ReconcileStripePaymentsCommandTests(TestCase):
+    def test_command_reports_repairs(self):
+        order = Order.objects.create(
+            full_name="Command Test",
+            email="command@example.com",
+            phone="5550000000",
+            order_type=Order.OrderType.PICKUP,
+        )
+        client = FakeStripeClient([make_intent("pi_cmd", created=_ts(1), order_id=order.id)])
+        out = StringIO()
+
+        with mock.patch(
+            "payments.reconciliation.StripePaymentIntentClient", return_value=client
+        ):
+            call_command(
+                "reconcile_stripe_payments",
+                since="2026-03-01",
+                until="2026-03-02",
+                stdout=out,
+            )
+
+        self.assertIn("1 missing payment(s)", out.getvalue())
+        self.assertEqual(Payment.objects.get().stripe_payment_intent_id, "pi_cmd")
@@ -1,8 +1,11 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
 
 from orders.models import Order
-from payments.models import Payment
-from payments.services import record_stripe_payment_from_intent
+from payments.models import Payment, PaymentPayload
+from payments.services import purge_raw_payloads, record_stripe_payment_from_intent
 
 
 class RecordStripePaymentFromIntentTests(TestCase):
@@ -59,3 +62,78 @@ class RecordStripePaymentFromIntentTests(TestCase):
         self.assertEqual(updated.amount_cents, 2150)
         self.assertEqual(updated.currency, "cad")
         self.assertEqual(updated.status, "succeeded")
+
+    def test_upsert_is_one_statement_per_table(self):
+        with self.assertNumQueries(2):
+            record_stripe_payment_from_intent(
+                self.order,
+                {"id": "pi_service_3", "amount": 1050, "status": "succeeded"},
+            )
+        with self.assertNumQueries(2):
+            payment = record_stripe_payment_from_intent(
+                self.order,
+                {"id": "pi_service_3", "amount": 1100, "status": "succeeded"},
+            )
+
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(Payment.objects.get(pk=payment.pk).amount_cents, 1100)
+
+    def test_payments_without_intent_do_not_collide(self):
+        Payment.objects.create(order=self.order, amount_cents=100)
+        Payment.objects.create(order=self.order, amount_cents=200)
+
+        self.assertEqual(
+            Payment.objects.filter(stripe_payment_intent_id__isnull=True).count(), 2
+        )
+
+
+class PaymentPayloadStorageTests(TestCase):
+    def setUp(self):
+        self.order = Order.objects.create(
+            full_name="Payload Test",
+            email="payload@example.com",
+            phone="5550000000",
+            order_type=Order.OrderType.PICKUP,
+        )
+
+    def test_payload_is_stored_compressed_in_side_table(self):
+        intent = {
+            "id": "pi_payload_1",
+            "amount": 1050,
+            "status": "succeeded",
+            "charges": {"data": [{"description": "x" * 2000}]},
+        }
+        payment = record_stripe_payment_from_intent(self.order, intent)
+
+        record = PaymentPayload.objects.get(payment=payment)
+        self.assertEqual(record.load(), intent)
+        self.assertLess(len(bytes(record.data)), 500)
+
+    def test_resend_replaces_payload(self):
+        record_stripe_payment_from_intent(
+            self.order, {"id": "pi_payload_2", "amount": 100, "status": "processing"}
+        )
+        payment = record_stripe_payment_from_intent(
+            self.order, {"id": "pi_payload_2", "amount": 100, "status": "succeeded"}
+        )
+
+        self.assertEqual(PaymentPayload.objects.count(), 1)
+        self.assertEqual(
+            PaymentPayload.objects.get(payment=payment).load()["status"], "succeeded"
+        )
+
+    def test_purge_deletes_only_expired_payloads_in_batches(self):
+        for index in range(5):
+            record_stripe_payment_from_intent(
+                self.order,
+                {"id": f"pi_purge_{index}", "amount": 100, "status": "succeeded"},
+            )
+        PaymentPayload.objects.filter(
+            payment__stripe_payment_intent_id__in=["pi_purge_0", "pi_purge_1", "pi_purge_2"]
+        ).update(stored_at=timezone.now() - timedelta(days=400))
+
+        deleted = purge_raw_payloads(timezone.now() - timedelta(days=180), batch_size=2)
+
+        self.assertEqual(deleted, 3)
+        self.assertEqual(PaymentPayload.objects.count(), 2)
+        self.assertEqual(Payment.objects.count(), 5)
@@ -5,8 +5,10 @@ from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APIClient
 
-from orders.models import Order
+from orders.models import Order, StockReservation
 from orders.utils import DeliveryZoneError
+from payments.models import StripeEvent
+from payments.webhooks import process_stripe_event
 from products.models import Product
 
 
@@ -298,3 +300,94 @@ class CreateCheckoutTests(TestCase):
         body = response.json()
         self.assertEqual(body["detail"], "Unable to create payment intent.")
         self.assertIn("stripe unavailable", body["error"])
+
+
+@mock.patch("payments.webhooks.queue_order_receipt_email_once")
+@mock.patch("payments.stripe_api.stripe.PaymentIntent.create")
+class CheckoutStockReservationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.turkey = Product.objects.create(
+            name="Holiday Turkey",
+            slug="holiday-turkey",
+            price_cents=6000,
+            square_variation_id="VAR_TURKEY",
+            square_quantity=2,
+            square_stock_tracked=True,
+        )
+
+    def _checkout(self, quantity=1):
+        return self.client.post(
+            reverse("checkout"),
+            {
+                "items": [{"product_id": self.turkey.id, "quantity": quantity}],
+                "email": "buyer@example.com",
+                "order_type": "pickup",
+            },
+            format="json",
+        )
+
+    def _intent_event(self, event_type, order_id):
+        event = StripeEvent(
+            event_id=f"evt_{event_type}_{order_id}",
+            event_type=event_type,
+            payload={
+                "data": {
+                    "object": {
+                        "id": f"pi_{order_id}",
+                        "amount": 6780,
+                        "currency": "cad",
+                        "status": "succeeded",
+                        "metadata": {"order_id": str(order_id)},
+                    }
+                }
+            },
+        )
+        process_stripe_event(event)
+
+    def test_checkout_holds_stock_and_refuses_oversell(self, mock_intent_create, _receipt):
+        mock_intent_create.return_value = {"id": "pi_hold", "client_secret": "secret"}
+
+        self.assertEqual(self._checkout(2).status_code, 201)
+        response = self._checkout(1)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["product_ids"], [self.turkey.id])
+        self.assertIn("Holiday Turkey", response.json()["detail"])
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(mock_intent_create.call_count, 1)
+        self.turkey.refresh_from_db()
+        self.assertEqual(self.turkey.reserved_quantity, 2)
+
+    def test_untracked_square_product_is_sold_without_a_hold(self, mock_intent_create, _receipt):
+        mock_intent_create.return_value = {"id": "pi_hold", "client_secret": "secret"}
+        Product.objects.filter(pk=self.turkey.pk).update(square_quantity=0, square_stock_tracked=False)
+
+        self.assertEqual(self._checkout(3).status_code, 201)
+
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_stripe_failure_releases_the_hold(self, mock_intent_create, _receipt):
+        mock_intent_create.side_effect = RuntimeError("stripe unavailable")
+
+        self.assertEqual(self._checkout(2).status_code, 502)
+
+        self.turkey.refresh_from_db()
+        self.assertEqual(self.turkey.reserved_quantity, 0)
+        self.assertEqual(StockReservation.objects.get().status, StockReservation.Status.RELEASED)
+
+    def test_payment_success_converts_and_failure_releases(self, mock_intent_create, _receipt):
+        mock_intent_create.return_value = {"id": "pi_hold", "client_secret": "secret"}
+        paid = self._checkout(1).json()["order_id"]
+        failed = self._checkout(1).json()["order_id"]
+
+        self._intent_event("payment_intent.succeeded", paid)
+        self._intent_event("payment_intent.payment_failed", failed)
+
+        self.turkey.refresh_from_db()
+        self.assertEqual(self.turkey.reserved_quantity, 0)
+        self.assertEqual(self.turkey.square_quantity, 1)
+        self.assertEqual(
+            dict(StockReservation.objects.values_list("order_id", "status")),
+            {paid: StockReservation.Status.CONVERTED, failed: StockReservation.Status.RELEASED},
+        )
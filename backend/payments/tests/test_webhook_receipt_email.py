@@ -1,13 +1,17 @@
+from datetime import timedelta
 from unittest import mock
 
 from django.core import mail
 from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APIClient
 
 from notifications.models import EmailNotification
+from notifications.queue import process_email_queue
 from orders.models import Order, OrderItem
-from payments.models import Payment
+from payments.models import Payment, StripeEvent
+from payments.webhooks import process_pending_stripe_events
 from products.models import Product
 
 
@@ -49,12 +53,8 @@ class StripeWebhookReceiptEmailTests(TestCase):
             total_cents=self.product.price_cents,
         )
 
-    @mock.patch("payments.webhooks.sync_products_from_square")
-    @mock.patch("payments.webhooks.decrement_square_inventory_for_order")
     @mock.patch("payments.webhooks.STRIPE_WEBHOOK_SECRET", new="")
-    def test_payment_intent_succeeded_records_payment_and_sends_receipt(
-        self, mock_decrement, mock_sync
-    ):
+    def test_payment_intent_succeeded_records_payment_and_sends_receipt(self):
         payload = {
             "type": "payment_intent.succeeded",
             "data": {
@@ -68,12 +68,20 @@ class StripeWebhookReceiptEmailTests(TestCase):
             },
         }
 
-        with self.captureOnCommitCallbacks(execute=True):
-            response = self.client.post(
-                reverse("stripe-webhook"), payload, format="json"
-            )
+        response = self.client.post(
+            reverse("stripe-webhook"), payload, format="json"
+        )
 
         self.assertEqual(response.status_code, 200)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.PLACED)
+        self.assertEqual(StripeEvent.objects.count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(process_pending_stripe_events(), 1)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(process_email_queue(), 2)
+
         self.order.refresh_from_db()
         self.assertEqual(self.order.status, Order.Status.PROCESSING)
         self.assertEqual(
@@ -102,7 +110,9 @@ class StripeWebhookReceiptEmailTests(TestCase):
 
         self.assertEqual(len(mail.outbox), 2)
 
-        receipt_message = mail.outbox[0]
+        # The status update is queued first, by the order save.
+        receipt_message = mail.outbox[1]
+        self.assertIn("receipt", receipt_message.subject)
         self.assertEqual(receipt_message.to, [self.order.email])
         self.assertTrue(receipt_message.attachments)
         filename, content, mimetype = receipt_message.attachments[0]
@@ -126,9 +136,12 @@ class StripeWebhookReceiptEmailTests(TestCase):
         }
 
         response = self.client.post(reverse("stripe-webhook"), payload, format="json")
+        process_pending_stripe_events()
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.json()["detail"], "No order_id in metadata")
+        self.assertEqual(
+            StripeEvent.objects.get().status, StripeEvent.Status.PROCESSED
+        )
         self.order.refresh_from_db()
         self.assertEqual(self.order.status, Order.Status.PLACED)
         self.assertEqual(self.order.stripe_payment_intent_id, "")
@@ -150,6 +163,7 @@ class StripeWebhookReceiptEmailTests(TestCase):
         }
 
         response = self.client.post(reverse("stripe-webhook"), payload, format="json")
+        process_pending_stripe_events()
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json()["received"], True)
@@ -185,8 +199,93 @@ class StripeWebhookReceiptEmailTests(TestCase):
         }
 
         response = self.client.post(reverse("stripe-webhook"), payload, format="json")
+        process_pending_stripe_events()
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json()["received"], True)
         self.order.refresh_from_db()
         self.assertEqual(self.order.status, Order.Status.PLACED)
+
+
+
+@mock.patch("payments.webhooks.STRIPE_WEBHOOK_SECRET", new="")
+class StripeEventInboxTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.payload = {
+            "id": "evt_inbox_1",
+            "type": "payment_intent.succeeded",
+            "data": {
+                "object": {
+                    "id": "pi_inbox_1",
+                    "amount": 1000,
+                    "currency": "cad",
+                    "status": "succeeded",
+                    "metadata": {"order_id": "123"},
+                }
+            },
+        }
+
+    def test_redelivered_event_is_stored_once(self):
+        first = self.client.post(reverse("stripe-webhook"), self.payload, format="json")
+        second = self.client.post(reverse("stripe-webhook"), self.payload, format="json")
+
+        self.assertEqual(first.status_code, 200)
+        self.assertFalse(first.json()["duplicate"])
+        self.assertTrue(second.json()["duplicate"])
+        self.assertEqual(StripeEvent.objects.count(), 1)
+
+    def test_processed_event_is_not_applied_again(self):
+        mock_handler = mock.Mock()
+        self.client.post(reverse("stripe-webhook"), self.payload, format="json")
+
+        with mock.patch.dict(
+            "payments.webhooks.EVENT_HANDLERS",
+            {"payment_intent.succeeded": mock_handler},
+        ):
+            self.assertEqual(process_pending_stripe_events(), 1)
+            self.client.post(reverse("stripe-webhook"), self.payload, format="json")
+            self.assertEqual(process_pending_stripe_events(), 0)
+
+        mock_handler.assert_called_once()
+        event = StripeEvent.objects.get()
+        self.assertEqual(event.status, StripeEvent.Status.PROCESSED)
+        self.assertIsNotNone(event.processed_at)
+
+    def test_failed_event_is_retried_with_backoff(self):
+        failing = mock.Mock(side_effect=RuntimeError("square down"))
+        self.client.post(reverse("stripe-webhook"), self.payload, format="json")
+
+        with mock.patch.dict(
+            "payments.webhooks.EVENT_HANDLERS",
+            {"payment_intent.succeeded": failing},
+        ):
+            process_pending_stripe_events()
+            # Not due yet, so a second pass leaves it alone.
+            self.assertEqual(process_pending_stripe_events(), 0)
+
+        event = StripeEvent.objects.get()
+        self.assertEqual(event.status, StripeEvent.Status.PENDING)
+        self.assertEqual(event.attempts, 1)
+        self.assertEqual(event.last_error, "square down")
+        self.assertGreater(event.next_attempt_at, timezone.now())
+
+    @mock.patch("payments.webhooks.STRIPE_EVENT_MAX_ATTEMPTS", new=2)
+    def test_event_is_parked_after_max_attempts(self):
+        failing = mock.Mock(side_effect=RuntimeError("still down"))
+        self.client.post(reverse("stripe-webhook"), self.payload, format="json")
+
+        with mock.patch.dict(
+            "payments.webhooks.EVENT_HANDLERS",
+            {"payment_intent.succeeded": failing},
+        ):
+            for _ in range(3):
+                process_pending_stripe_events()
+                StripeEvent.objects.update(
+                    next_attempt_at=timezone.now() - timedelta(seconds=1)
+                )
+
+        event = StripeEvent.objects.get()
+        self.assertEqual(event.status, StripeEvent.Status.FAILED)
+        self.assertEqual(event.attempts, 2)
+        self.assertEqual(failing.call_count, 2)
@@ -1,80 +1,179 @@
+import hashlib
+import json
+import logging
 import os
-from typing import Any, Dict
+from datetime import timedelta
+from typing import Any, Dict, Optional
 
 import stripe
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from notifications.emails import send_order_receipt_email_once
+from notifications.emails import queue_order_receipt_email_once
 from orders.models import Order
-from square_sync.services import (
-    decrement_square_inventory_for_order,
-    sync_products_from_square,
-)
+from orders.reservations import convert_reservations, release_reservations
+from square_sync.services import decrement_square_inventory_for_order
+from .models import StripeEvent
 from .services import record_stripe_payment_from_intent
 
+logger = logging.getLogger(__name__)
+
 stripe.api_key = os.environ.get("STRIPE_SECRET_KEY", "sk_test_placeholder")
 STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET", "")
+STRIPE_EVENT_MAX_ATTEMPTS = int(os.environ.get("STRIPE_EVENT_MAX_ATTEMPTS", "8"))
+STRIPE_EVENT_MAX_BACKOFF = timedelta(hours=1)
 
 
 class StripeWebhookView(APIView):
+    """
+    Verify the Stripe signature, store the event in the StripeEvent inbox and
+    acknowledge it straight away. The event is applied by the
+    ``process_stripe_events`` worker, so Stripe never waits on our side effects.
+    """
+
     def post(self, request, *args, **kwargs):
         payload = request.body
         sig_header = request.META.get("HTTP_STRIPE_SIGNATURE")
 
         if STRIPE_WEBHOOK_SECRET:
             try:
-                event = stripe.Webhook.construct_event(
+                stripe.Webhook.construct_event(
                     payload, sig_header, STRIPE_WEBHOOK_SECRET
                 )
             except (ValueError, stripe.error.SignatureVerificationError):
                 return Response(status=status.HTTP_400_BAD_REQUEST)
-        else:
-            event = request.data
-
-        event_type = event.get("type") if isinstance(event, dict) else getattr(event, "type", None)
-        data_object = (
-            event.get("data", {}).get("object")
-            if isinstance(event, dict)
-            else getattr(getattr(event, "data", None), "object", None)
+
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(event, dict):
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        # Unsigned local payloads may omit the id; fall back to a content hash so
+        # redeliveries of the same body still collapse into one inbox row.
+        event_id = event.get("id") or f"local_{hashlib.sha256(payload).hexdigest()}"
+        _, created = StripeEvent.objects.get_or_create(
+            event_id=event_id,
+            defaults={
+                "event_type": event.get("type") or "",
+                "payload": event,
+            },
         )
 
-        if event_type == "payment_intent.succeeded" and data_object:
-            payment_intent_id = (
-                data_object.get("id")
-                if isinstance(data_object, dict)
-                else getattr(data_object, "id", None)
+        return Response(
+            {"received": True, "duplicate": not created}, status=status.HTTP_200_OK
+        )
+
+
+def _order_for_intent(intent: Dict[str, Any]) -> Optional[Order]:
+    metadata = intent.get("metadata") or {}
+    order_id = metadata.get("order_id")
+    if not order_id:
+        logger.info("Stripe intent %s has no order_id in metadata", intent.get("id"))
+        return None
+
+    order = Order.objects.filter(id=order_id).first()
+    if not order:
+        logger.info("Stripe intent %s references unknown order %s", intent.get("id"), order_id)
+    return order
+
+
+def handle_payment_intent_succeeded(intent: Dict[str, Any]) -> None:
+    order = _order_for_intent(intent)
+    if not order:
+        return
+
+    order.status = Order.Status.PROCESSING
+    order.stripe_payment_intent_id = intent.get("id") or ""
+    order.save(update_fields=["status", "stripe_payment_intent_id", "updated_at"])
+
+    record_stripe_payment_from_intent(order, intent)
+    convert_reservations(order)
+    # Queued in this transaction; process_inventory_outbox talks to Square.
+    decrement_square_inventory_for_order(order)
+    # Queued in this transaction too; process_email_queue renders and sends it.
+    queue_order_receipt_email_once(order)
+
+
+def handle_payment_intent_failed(intent: Dict[str, Any]) -> None:
+    """Hand the order's held stock back; a later successful retry is decremented as usual."""
+    order = _order_for_intent(intent)
+    if order:
+        release_reservations(order)
+
+
+EVENT_HANDLERS = {
+    "payment_intent.succeeded": handle_payment_intent_succeeded,
+    "payment_intent.payment_failed": handle_payment_intent_failed,
+    "payment_intent.canceled": handle_payment_intent_failed,
+}
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return min(timedelta(seconds=30 * 2 ** max(attempts - 1, 0)), STRIPE_EVENT_MAX_BACKOFF)
+
+
+def process_stripe_event(event: StripeEvent) -> None:
+    """Apply a stored event. Raises if the handler fails so the caller can retry."""
+    handler = EVENT_HANDLERS.get(event.event_type)
+    data_object = (event.payload.get("data") or {}).get("object")
+    if handler and isinstance(data_object, dict):
+        handler(data_object)
+
+
+def process_pending_stripe_events(limit: int = 50) -> int:
+    """
+    Drain due events from the inbox, oldest first, and return how many were handled.
+
+    Each event is claimed with SELECT ... FOR UPDATE SKIP LOCKED and marked
+    processed in the same transaction as its side effects, so concurrent workers
+    never apply one event id twice. Failures are retried with exponential
+    backoff until STRIPE_EVENT_MAX_ATTEMPTS, after which the event is parked as
+    failed for manual review.
+    """
+    handled = 0
+    while handled < limit:
+        with transaction.atomic():
+            event = (
+                StripeEvent.objects.select_for_update(skip_locked=True)
+                .filter(
+                    status=StripeEvent.Status.PENDING,
+                    next_attempt_at__lte=timezone.now(),
+                )
+                .order_by("next_attempt_at", "id")
+                .first()
             )
-            metadata = (
-                data_object.get("metadata") if isinstance(data_object, dict) else getattr(data_object, "metadata", {})
-            ) or {}
-            order_id = metadata.get("order_id") if hasattr(metadata, "get") else getattr(metadata, "order_id", None)
-
-            if not order_id:
-                return Response({"detail": "No order_id in metadata"}, status=status.HTTP_200_OK)
-
-            order = Order.objects.filter(id=order_id).first()
-            if order:
-                order.status = Order.Status.PROCESSING
-                order.stripe_payment_intent_id = payment_intent_id or ""
-                order.save(update_fields=["status", "stripe_payment_intent_id", "updated_at"])
-
-                intent_dict: Dict[str, Any]
-                if isinstance(data_object, dict):
-                    intent_dict = data_object
+            if event is None:
+                break
+
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    process_stripe_event(event)
+            except Exception as exc:
+                logger.exception("Stripe event %s failed", event.event_id)
+                event.last_error = str(exc)
+                if event.attempts >= STRIPE_EVENT_MAX_ATTEMPTS:
+                    event.status = StripeEvent.Status.FAILED
                 else:
-                    intent_dict = {
-                        "id": getattr(data_object, "id", ""),
-                        "amount": getattr(data_object, "amount", 0),
-                        "currency": getattr(data_object, "currency", "cad"),
-                        "status": getattr(data_object, "status", ""),
-                    }
-
-                record_stripe_payment_from_intent(order, intent_dict)
-                send_order_receipt_email_once(order)
-                if order and order.status == Order.Status.PROCESSING:
-                    decrement_square_inventory_for_order(order)
-                    sync_products_from_square()
-
-        return Response({"received": True}, status=status.HTTP_200_OK)
+                    event.next_attempt_at = timezone.now() + _retry_delay(event.attempts)
+            else:
+                event.status = StripeEvent.Status.PROCESSED
+                event.processed_at = timezone.now()
+                event.last_error = ""
+            event.save(
+                update_fields=[
+                    "status",
+                    "attempts",
+                    "next_attempt_at",
+                    "last_error",
+                    "processed_at",
+                ]
+            )
+        handled += 1
+
+    return handled
@@ -1,12 +1,16 @@
 from django import forms
 from django.contrib import admin, messages
 from django.core.exceptions import PermissionDenied
-from django.core.management import call_command
-from django.shortcuts import redirect
-from django.urls import path
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
 from django.utils.html import format_html
 
-from .models import Product, ProductImage, StorefrontSettings
+from square_sync.jobs import enqueue_sync_job, sync_job_status
+from square_sync.models import SyncJob
+
+from .models import Product, ProductImage, ProductStock, StorefrontSettings
 
 
 class StorefrontSettingsForm(forms.ModelForm):
@@ -44,6 +48,17 @@ class ProductImageInline(admin.TabularInline):
     fields = ("image_url", "alt_text", "sort_order")
 
 
+class ProductStockInline(admin.TabularInline):
+    model = ProductStock
+    extra = 0
+    can_delete = False
+    fields = ("location_id", "quantity", "counted_at", "updated_at")
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     change_list_template = "admin/products/product/change_list.html"
@@ -63,7 +78,7 @@ class ProductAdmin(admin.ModelAdmin):
         "is_popular",
         "image_preview",
     )
-    inlines = [ProductImageInline]
+    inlines = [ProductImageInline, ProductStockInline]
 
     def get_urls(self):
         urls = super().get_urls()
@@ -73,6 +88,16 @@ class ProductAdmin(admin.ModelAdmin):
                 self.admin_site.admin_view(self.sync_with_square),
                 name="products_product_sync_square",
             ),
+            path(
+                "sync-square/<int:job_id>/",
+                self.admin_site.admin_view(self.sync_job_view),
+                name="products_product_sync_square_job",
+            ),
+            path(
+                "sync-square/<int:job_id>/status/",
+                self.admin_site.admin_view(self.sync_job_status_view),
+                name="products_product_sync_square_job_status",
+            ),
         ]
         return custom_urls + urls
 
@@ -80,28 +105,42 @@ class ProductAdmin(admin.ModelAdmin):
         if not request.user.has_perm("products.change_product"):
             raise PermissionDenied
 
-        try:
-            call_command("sync_square_products")
-        except Exception as exc:  # pragma: no cover - defensive for admin trigger
+        # The sync itself runs in the process_sync_jobs worker; this only queues it.
+        job, created = enqueue_sync_job(request.user)
+        if created:
+            self.message_user(request, "Square sync queued.")
+        else:
             self.message_user(
                 request,
-                f"Square product sync failed: {exc}",
-                level=messages.ERROR,
+                "A Square sync is already in progress; showing that one.",
+                level=messages.WARNING,
             )
-            return redirect("admin:products_product_changelist")
+        return redirect("admin:products_product_sync_square_job", job_id=job.pk)
 
-        try:
-            call_command("sync_square_inventory")
-        except Exception as exc:  # pragma: no cover - defensive for admin trigger
-            self.message_user(
-                request,
-                f"Square inventory sync failed: {exc}",
-                level=messages.ERROR,
-            )
-        else:
-            self.message_user(request, "Products and inventory synced with Square.")
+    def sync_job_view(self, request, job_id):
+        if not request.user.has_perm("products.view_product"):
+            raise PermissionDenied
+        job = get_object_or_404(SyncJob, pk=job_id)
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": f"Square sync #{job.pk}",
+            "job": job,
+            "status": sync_job_status(job),
+            "status_url": reverse("admin:products_product_sync_square_job_status", args=[job.pk]),
+        }
+        return TemplateResponse(request, "admin/products/product/sync_job.html", context)
+
+    def sync_job_status_view(self, request, job_id):
+        if not request.user.has_perm("products.view_product"):
+            raise PermissionDenied
+        job = get_object_or_404(SyncJob, pk=job_id)
+        return JsonResponse(sync_job_status(job))
 
-        return redirect("admin:products_product_changelist")
+    def save_model(self, request, obj, form, change):
+        # Manual edits make the next Square sync rewrite this row.
+        obj.square_sync_hash = ""
+        super().save_model(request, obj, form, change)
 
     def image_preview(self, obj):
         if obj.image:
@@ -12,11 +12,15 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     lookup_field = "slug"
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().prefetch_related("images", "stocks")
         category = self.request.query_params.get("category")
+        location = self.request.query_params.get("location")
 
         if category:
             queryset = queryset.filter(category__iexact=category)
+        if location:
+            # Served by the (location_id, quantity) index on ProductStock.
+            queryset = queryset.filter(stocks__location_id=location, stocks__quantity__gt=0)
 
         return queryset
 
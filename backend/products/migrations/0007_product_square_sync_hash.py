@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0006_storefrontsettings"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="square_sync_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="Hash of the fields last written by the Square sync; unchanged rows are skipped.",
+                max_length=64,
+            ),
+        ),
+    ]
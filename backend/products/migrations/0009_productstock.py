@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0008_product_reserved_quantity"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="product",
+            name="square_quantity",
+            field=models.IntegerField(default=0, help_text="Cached stock from Square Inventory: the total of the ProductStock rows for this variation."),
+        ),
+        migrations.CreateModel(
+            name="ProductStock",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("location_id", models.CharField(help_text="Square location id", max_length=64)),
+                ("quantity", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("product", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="stocks", to="products.product")),
+            ],
+            options={
+                "ordering": ["product_id", "location_id"],
+                "indexes": [models.Index(fields=["location_id", "quantity"], name="products_stock_by_location")],
+                "constraints": [models.UniqueConstraint(fields=("product", "location_id"), name="products_stock_one_row_per_location")],
+            },
+        ),
+    ]
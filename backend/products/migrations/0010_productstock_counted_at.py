@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0009_productstock"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productstock",
+            name="counted_at",
+            field=models.DateTimeField(blank=True, help_text="When Square calculated the stored quantity; older counts are ignored.", null=True),
+        ),
+    ]
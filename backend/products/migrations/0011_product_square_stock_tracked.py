@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:38
+
+from django.db import migrations, models
+
+
+def mark_synced_stock_tracked(apps, _schema_editor):
+    # ProductStock rows are only written for variations Square returned counts for.
+    Product = apps.get_model("products", "Product")
+    Product.objects.filter(stocks__isnull=False).update(square_stock_tracked=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0010_productstock_counted_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="square_stock_tracked",
+            field=models.BooleanField(default=False, editable=False, help_text="Square returned inventory counts for this variation, so checkout holds its stock."),
+        ),
+        migrations.RunPython(mark_synced_stock_tracked, migrations.RunPython.noop),
+    ]
@@ -38,13 +38,62 @@ class Product(models.Model):
     )
     square_quantity = models.IntegerField(
         default=0,
-        help_text="Cached stock from Square Inventory (for this variation)",
+        help_text="Cached stock from Square Inventory: the total of the ProductStock rows for this variation.",
+    )
+    reserved_quantity = models.IntegerField(
+        default=0,
+        editable=False,
+        help_text="Units held by unpaid checkouts; available stock is square_quantity minus this.",
+    )
+    square_stock_tracked = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text="Square returned inventory counts for this variation, so checkout holds its stock.",
+    )
+    square_sync_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        help_text="Hash of the fields last written by the Square sync; unchanged rows are skipped.",
     )
 
     def __str__(self):
         return self.name
 
 
+class ProductStock(models.Model):
+    """
+    Stock of one product at one Square location, refreshed by the inventory
+    syncs. Product.square_quantity holds the total across tracked locations.
+    """
+
+    product = models.ForeignKey(
+        Product, related_name="stocks", on_delete=models.CASCADE
+    )
+    location_id = models.CharField(max_length=64, help_text="Square location id")
+    quantity = models.IntegerField(default=0)
+    counted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When Square calculated the stored quantity; older counts are ignored.",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["product_id", "location_id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "location_id"], name="products_stock_one_row_per_location"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["location_id", "quantity"], name="products_stock_by_location"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.location_id}: {self.quantity}"
+
+
 class ProductImage(models.Model):
     product = models.ForeignKey(
         Product, related_name="images", on_delete=models.CASCADE
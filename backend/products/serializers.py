@@ -12,6 +12,7 @@ class ProductImageSerializer(serializers.ModelSerializer):
 class ProductSerializer(serializers.ModelSerializer):
     images = ProductImageSerializer(many=True, read_only=True)
     image_url = serializers.SerializerMethodField()
+    stock_by_location = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
@@ -26,10 +27,14 @@ class ProductSerializer(serializers.ModelSerializer):
             "category",
             "is_active",
             "square_quantity",
+            "stock_by_location",
             "is_popular",
             "images",
         ]
 
+    def get_stock_by_location(self, obj):
+        return {stock.location_id: stock.quantity for stock in obj.stocks.all()}
+
     def get_image_url(self, obj):
         if getattr(obj, "image_url", ""):
             return obj.image_url
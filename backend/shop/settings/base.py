@@ -120,6 +120,9 @@ DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "hello@meatdirect.com"
 ANYMAIL = {
     "SENDGRID_API_KEY": os.environ.get("SENDGRID_API_KEY", ""),
 }
+# Processes that render receipt PDFs for process_email_queue (0 renders them in
+# the queue worker itself).
+RECEIPT_PDF_WORKERS = int(os.environ.get("RECEIPT_PDF_WORKERS", "2"))
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -205,6 +208,19 @@ else:
     SQUARE_BASE_URL = "https://connect.squareup.com/v2"
 
 SQUARE_LOCATION_ID = os.environ.get("SQUARE_LOCATION_ID", "")
+# Other Square locations whose stock is tracked in ProductStock (comma or space
+# separated). Sales are decremented at SQUARE_LOCATION_ID.
+SQUARE_ADDITIONAL_LOCATION_IDS = _split_env_list("SQUARE_ADDITIONAL_LOCATION_IDS")
+# Square signs webhooks with HMAC-SHA256 over notification URL + body. The URL must
+# match the one registered in the Square dashboard (defaults to the request URL).
+SQUARE_WEBHOOK_SIGNATURE_KEY = os.environ.get("SQUARE_WEBHOOK_SIGNATURE_KEY", "")
+SQUARE_WEBHOOK_NOTIFICATION_URL = os.environ.get("SQUARE_WEBHOOK_NOTIFICATION_URL", "")
+# Copy catalog images into STORAGES["default"] during syncs and serve them from
+# there (content-hashed, long-cache URLs) instead of Square's image host.
+SQUARE_MIRROR_IMAGES = _get_env_bool("SQUARE_MIRROR_IMAGES", default=False)
+
+# Compressed Stripe payloads behind Payment rows are purged after this many days.
+PAYMENT_RAW_PAYLOAD_RETENTION_DAYS = int(os.environ.get("PAYMENT_RAW_PAYLOAD_RETENTION_DAYS", "180"))
 
 WHOLESALE_ACCESS_COOKIE_NAME = "wholesale_access"
 WHOLESALE_ACCESS_TOKEN_DAYS = int(os.environ.get("WHOLESALE_ACCESS_TOKEN_DAYS", "14"))
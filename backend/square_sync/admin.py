@@ -0,0 +1,155 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import (
+    InventoryDecrement,
+    MirroredImage,
+    SquareCatalogObject,
+    SquareWebhookEvent,
+    SyncCheckpoint,
+    SyncJob,
+    SyncRun,
+)
+
+
+@admin.register(SyncCheckpoint)
+class SyncCheckpointAdmin(admin.ModelAdmin):
+    list_display = ("key", "latest_time", "updated_at")
+    readonly_fields = ("updated_at",)
+
+
+@admin.register(SquareWebhookEvent)
+class SquareWebhookEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "event_type", "status", "attempts", "received_at", "processed_at")
+    list_filter = ("status", "event_type", "received_at")
+    search_fields = ("event_id",)
+    readonly_fields = (
+        "event_id",
+        "event_type",
+        "payload",
+        "attempts",
+        "last_error",
+        "received_at",
+        "processed_at",
+    )
+
+
+@admin.register(SyncRun)
+class SyncRunAdmin(admin.ModelAdmin):
+    list_display = (
+        "started_at",
+        "kind",
+        "status",
+        "duration_display",
+        "fetch_seconds",
+        "transform_seconds",
+        "write_seconds",
+        "api_calls",
+        "created",
+        "updated",
+        "deactivated",
+    )
+    list_filter = ("kind", "status", "started_at")
+    date_hierarchy = "started_at"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Duration (s)")
+    def duration_display(self, obj):
+        duration = obj.duration_seconds
+        return "-" if duration is None else f"{duration:.2f}"
+
+
+class SyncRunInline(admin.TabularInline):
+    model = SyncRun
+    extra = 0
+    can_delete = False
+    fields = (
+        "kind",
+        "status",
+        "fetch_seconds",
+        "transform_seconds",
+        "write_seconds",
+        "api_calls",
+        "created",
+        "updated",
+        "deactivated",
+        "error",
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SyncJob)
+class SyncJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "status", "stage", "requested_by", "requested_at", "finished_at")
+    list_filter = ("status",)
+    readonly_fields = (
+        "status",
+        "stage",
+        "in_flight",
+        "requested_by",
+        "requested_at",
+        "started_at",
+        "finished_at",
+        "error",
+    )
+    inlines = [SyncRunInline]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(InventoryDecrement)
+class InventoryDecrementAdmin(admin.ModelAdmin):
+    list_display = (
+        "idempotency_key",
+        "order",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "created_at",
+        "sent_at",
+    )
+    list_filter = ("status", "created_at")
+    search_fields = ("idempotency_key", "batch_key")
+    readonly_fields = (
+        "order",
+        "idempotency_key",
+        "adjustments",
+        "batch_key",
+        "attempts",
+        "last_error",
+        "created_at",
+        "sent_at",
+    )
+    actions = ["retry_now"]
+
+    @admin.action(description="Retry now")
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status=InventoryDecrement.Status.SENT).update(
+            status=InventoryDecrement.Status.PENDING,
+            next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f"{updated} decrement(s) queued for retry.")
+
+
+@admin.register(MirroredImage)
+class MirroredImageAdmin(admin.ModelAdmin):
+    list_display = ("image_id", "name", "size", "mirrored_at")
+    search_fields = ("image_id", "checksum")
+    readonly_fields = ("image_id", "source_url", "checksum", "name", "url", "size", "mirrored_at")
+
+
+@admin.register(SquareCatalogObject)
+class SquareCatalogObjectAdmin(admin.ModelAdmin):
+    list_display = ("object_id", "type", "version", "updated_at", "is_deleted", "synced_at")
+    list_filter = ("type", "is_deleted")
+    search_fields = ("object_id",)
+    readonly_fields = ("object_id", "type", "version", "updated_at", "is_deleted", "data", "synced_at")
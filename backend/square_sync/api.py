@@ -1,8 +1,28 @@
-from typing import Dict, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List
 
 import requests
 from django.conf import settings
 from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Every Square call goes through one pooled Session. Retries cover 429 and
+# transient 5xx responses, waiting for Retry-After when Square sends it. POSTs
+# are retried too: the search/retrieve endpoints are read-only and
+# batch-create carries an idempotency key.
+SQUARE_POOL_SIZE = 10
+SQUARE_MAX_RETRIES = 4
+SQUARE_RETRY_BACKOFF = 0.5
+SQUARE_INVENTORY_WORKERS = 4
+SQUARE_IMAGE_WORKERS = 4
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+_metrics: Dict[str, dict] = {}
+_metrics_lock = threading.Lock()
 
 
 def _headers() -> dict:
@@ -13,90 +33,284 @@ def _headers() -> dict:
     }
 
 
-def list_catalog_items() -> list[dict]:
+def get_session() -> requests.Session:
+    """Return the process-wide Square session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=SQUARE_MAX_RETRIES,
+                    backoff_factor=SQUARE_RETRY_BACKOFF,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=None,
+                    respect_retry_after_header=True,
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=SQUARE_POOL_SIZE,
+                    max_retries=retry,
+                )
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _record(endpoint: str, elapsed: float, ok: bool) -> None:
+    with _metrics_lock:
+        stats = _metrics.setdefault(
+            endpoint, {"calls": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+        )
+        stats["calls"] += 1
+        stats["errors"] += 0 if ok else 1
+        stats["total_seconds"] += elapsed
+        stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+
+def get_request_metrics() -> Dict[str, dict]:
+    """
+    Per-endpoint latency for this process: calls, errors, total/avg/max seconds.
+    Latency includes any retries urllib3 made for the call.
+    """
+    with _metrics_lock:
+        snapshot = {endpoint: dict(stats) for endpoint, stats in _metrics.items()}
+    for stats in snapshot.values():
+        stats["avg_seconds"] = stats["total_seconds"] / stats["calls"] if stats["calls"] else 0.0
+    return snapshot
+
+
+def reset_request_metrics() -> None:
+    with _metrics_lock:
+        _metrics.clear()
+
+
+def _request(method: str, path: str, **kwargs) -> requests.Response:
+    """Send a request to ``SQUARE_BASE_URL + path`` and record its latency under ``path``."""
+    url = f"{settings.SQUARE_BASE_URL.rstrip('/')}{path}"
+    kwargs.setdefault("timeout", 10)
+    started = time.monotonic()
+    ok = False
+    try:
+        resp = get_session().request(method, url, headers=_headers(), **kwargs)
+        ok = resp.ok
+        return resp
+    finally:
+        _record(f"{method} {path}", time.monotonic() - started, ok)
+
+
+def iter_catalog_pages(types: str = "ITEM") -> Iterator[list[dict]]:
     """
-    Use ListCatalog to get all ITEM and IMAGE objects (with pagination).
+    Page through ListCatalog, yielding each page's objects as soon as it arrives.
     Equivalent to the cURL from the docs:
 
-    curl https://connect.squareupsandbox.com/v2/catalog/list?types=ITEM,IMAGE,CATEGORY \\
+    curl https://connect.squareupsandbox.com/v2/catalog/list?types=ITEM \\
       -H 'Square-Version: 2025-10-16' \\
       -H 'Authorization: Bearer {ACCESS_TOKEN}' \\
       -H 'Content-Type: application/json'
+
+    Only ITEMs (with their nested variations) are listed by default; images and
+    categories are looked up by id as items reference them.
     """
     if not settings.SQUARE_ACCESS_TOKEN:
-        return []
-
-    base_url = settings.SQUARE_BASE_URL.rstrip("/")
-    url = f"{base_url}/catalog/list"
+        return
 
-    # Request ITEM, IMAGE, CATEGORY types so we can attach descriptions and category names
-    params: dict = {"types": "ITEM,IMAGE,CATEGORY"}
-    objects: list[dict] = []
+    params: dict = {"types": types}
     cursor: str | None = None
 
     while True:
         if cursor:
             params["cursor"] = cursor
 
-        resp = requests.get(url, headers=_headers(), params=params, timeout=10)
+        resp = _request("GET", "/catalog/list", params=params)
+        resp.raise_for_status()
+        data = resp.json()
+
+        objects = data.get("objects", [])
+        if objects:
+            yield objects
+        cursor = data.get("cursor")
+        if not cursor:
+            break
+
+
+def search_catalog_changes(begin_time: str) -> dict:
+    """
+    Use SearchCatalogObjects to fetch every ITEM, ITEM_VARIATION, IMAGE and CATEGORY
+    changed since ``begin_time`` (RFC 3339), including deleted objects.
+
+    Returns {"objects": [...], "related_objects": [...], "latest_time": str}.
+    ``latest_time`` is taken from the first page so anything that changes while we
+    page is picked up again on the next run.
+    Uses POST /v2/catalog/search
+    """
+    if not settings.SQUARE_ACCESS_TOKEN:
+        return {"objects": [], "related_objects": [], "latest_time": ""}
+
+    body: dict = {
+        "object_types": ["ITEM", "ITEM_VARIATION", "IMAGE", "CATEGORY"],
+        "include_deleted_objects": True,
+        "include_related_objects": True,
+        "begin_time": begin_time,
+    }
+    objects: list[dict] = []
+    related: Dict[str, dict] = {}
+    latest_time = ""
+
+    while True:
+        resp = _request("POST", "/catalog/search", json=body)
         resp.raise_for_status()
         data = resp.json()
 
         objects.extend(data.get("objects", []))
+        for obj in data.get("related_objects", []):
+            related[obj["id"]] = obj
+        latest_time = latest_time or data.get("latest_time", "")
         cursor = data.get("cursor")
         if not cursor:
             break
+        body["cursor"] = cursor
+
+    return {
+        "objects": objects,
+        "related_objects": list(related.values()),
+        "latest_time": latest_time,
+    }
 
-    return objects
 
+def batch_retrieve_catalog_objects(object_ids: List[str]) -> list[dict]:
+    """
+    Fetch the given catalog objects plus their related objects (images, categories).
 
-def batch_retrieve_inventory_counts(variation_ids: List[str]) -> Dict[str, int]:
+    Returns the requested objects followed by related objects, de-duplicated by id.
+    Uses POST /v2/catalog/batch-retrieve
+    """
+    if not settings.SQUARE_ACCESS_TOKEN or not object_ids:
+        return []
+
+    found: Dict[str, dict] = {}
+    CHUNK = 1000  # Square's documented maximum per request
+    for i in range(0, len(object_ids), CHUNK):
+        body = {
+            "object_ids": object_ids[i : i + CHUNK],
+            "include_related_objects": True,
+        }
+        resp = _request("POST", "/catalog/batch-retrieve", json=body)
+        resp.raise_for_status()
+        data = resp.json()
+        for obj in data.get("objects", []) + data.get("related_objects", []):
+            found.setdefault(obj["id"], obj)
+
+    return list(found.values())
+
+
+def search_item_ids_by_category(category_ids: List[str]) -> List[str]:
+    """
+    Return ids of items assigned to any of the given categories.
+    Uses POST /v2/catalog/search-catalog-items
+    """
+    if not settings.SQUARE_ACCESS_TOKEN or not category_ids:
+        return []
+
+    body: dict = {"category_ids": category_ids, "limit": 100}
+    item_ids: List[str] = []
+    while True:
+        resp = _request("POST", "/catalog/search-catalog-items", json=body)
+        resp.raise_for_status()
+        data = resp.json()
+
+        item_ids.extend(item["id"] for item in data.get("items", []))
+        cursor = data.get("cursor")
+        if not cursor:
+            break
+        body["cursor"] = cursor
+
+    return item_ids
+
+
+def inventory_location_ids() -> List[str]:
+    """The Square locations whose stock we track: SQUARE_LOCATION_ID first, then any additional ones."""
+    return list(
+        dict.fromkeys(
+            filter(None, [settings.SQUARE_LOCATION_ID, *settings.SQUARE_ADDITIONAL_LOCATION_IDS])
+        )
+    )
+
+
+def _fetch_inventory_chunk(chunk: List[str]) -> Dict[str, Dict[str, int]]:
+    location_ids = inventory_location_ids()
+    body = {
+        "catalog_object_ids": chunk,
+        "location_ids": location_ids,
+        "states": ["IN_STOCK"],
+    }
+    resp = _request("POST", "/inventory/counts/batch-retrieve", json=body)
+    resp.raise_for_status()
+    data = resp.json()
+
+    result: Dict[str, Dict[str, int]] = {}
+    for count in data.get("counts", []):
+        location_id = count.get("location_id")
+        if location_id in location_ids and count.get("state") == "IN_STOCK":
+            vid = count.get("catalog_object_id")
+            qty_str = count.get("quantity", "0")
+            try:
+                qty = int(qty_str)
+            except (TypeError, ValueError):
+                qty = 0
+            if vid:
+                result.setdefault(vid, {})[location_id] = qty
+    return result
+
+
+def batch_retrieve_location_counts(variation_ids: List[str]) -> Dict[str, Dict[str, int]]:
     """
-    Fetch current IN_STOCK quantities from Square Inventory for the given item variation IDs.
+    Fetch current IN_STOCK quantities at every tracked location for the given
+    item variation IDs. Each chunk of 100 ids asks for all locations at once,
+    so adding a location adds no calls.
 
-    Returns: {variation_id: quantity_int}
+    Chunks are independent, so they are fetched concurrently by at most
+    SQUARE_INVENTORY_WORKERS threads sharing the pooled session.
+
+    Returns: {variation_id: {location_id: quantity_int}}; variations Square
+    has no counts for are absent.
     Uses POST /v2/inventory/counts/batch-retrieve
     """
-    if not settings.SQUARE_ACCESS_TOKEN or not settings.SQUARE_LOCATION_ID:
+    if not settings.SQUARE_ACCESS_TOKEN or not inventory_location_ids():
         return {}
 
     if not variation_ids:
         return {}
 
-    base_url = settings.SQUARE_BASE_URL.rstrip("/")
-    url = f"{base_url}/inventory/counts/batch-retrieve"
-
-    result: Dict[str, int] = {}
-
     CHUNK = 100  # safe chunk size
-    for i in range(0, len(variation_ids), CHUNK):
-        chunk = variation_ids[i : i + CHUNK]
-        body = {
-            "catalog_object_ids": chunk,
-            "location_ids": [settings.SQUARE_LOCATION_ID],
-            "states": ["IN_STOCK"],
-        }
-        resp = requests.post(url, headers=_headers(), json=body, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
+    chunks = [variation_ids[i : i + CHUNK] for i in range(0, len(variation_ids), CHUNK)]
+
+    result: Dict[str, Dict[str, int]] = {}
+    if len(chunks) == 1:
+        result.update(_fetch_inventory_chunk(chunks[0]))
+        return result
 
-        for count in data.get("counts", []):
-            if (
-                count.get("location_id") == settings.SQUARE_LOCATION_ID
-                and count.get("state") == "IN_STOCK"
-            ):
-                vid = count.get("catalog_object_id")
-                qty_str = count.get("quantity", "0")
-                try:
-                    qty = int(qty_str)
-                except (TypeError, ValueError):
-                    qty = 0
-                if vid:
-                    result[vid] = qty
+    with ThreadPoolExecutor(max_workers=min(SQUARE_INVENTORY_WORKERS, len(chunks))) as pool:
+        for counts in pool.map(_fetch_inventory_chunk, chunks):
+            result.update(counts)
 
     return result
 
 
+def batch_retrieve_inventory_counts(variation_ids: List[str]) -> Dict[str, int]:
+    """
+    Like batch_retrieve_location_counts, but summed across locations.
+
+    Returns: {variation_id: total_quantity_int}
+    """
+    return {
+        vid: sum(by_location.values())
+        for vid, by_location in batch_retrieve_location_counts(variation_ids).items()
+    }
+
+
 def batch_change_inventory_for_sale(adjustments: List[dict], idempotency_key: str) -> None:
     """
     Apply inventory ADJUSTMENT changes in Square to mark items as SOLD.
@@ -104,6 +318,11 @@ def batch_change_inventory_for_sale(adjustments: List[dict], idempotency_key: st
     Each adjustment dict must contain:
       - square_variation_id (str)
       - quantity (int)
+    and may name the ``location_id`` it was sold from (default SQUARE_LOCATION_ID)
+    and the ISO 8601 ``occurred_at`` of the sale (default now). Callers that
+    retry under the same idempotency key must pass ``occurred_at``, so the
+    retried body is identical to the first one.
+    Raises requests.HTTPError if Square rejects the batch.
     Uses POST /v2/inventory/changes/batch-create
     """
     if not settings.SQUARE_ACCESS_TOKEN or not settings.SQUARE_LOCATION_ID:
@@ -112,9 +331,6 @@ def batch_change_inventory_for_sale(adjustments: List[dict], idempotency_key: st
     if not adjustments:
         return
 
-    base_url = settings.SQUARE_BASE_URL.rstrip("/")
-    url = f"{base_url}/inventory/changes/batch-create"
-
     occurred_at = timezone.now().isoformat()
     changes_payload: List[dict] = []
 
@@ -130,10 +346,10 @@ def batch_change_inventory_for_sale(adjustments: List[dict], idempotency_key: st
                 "adjustment": {
                     "from_state": "IN_STOCK",
                     "to_state": "SOLD",
-                    "location_id": settings.SQUARE_LOCATION_ID,
+                    "location_id": adj.get("location_id") or settings.SQUARE_LOCATION_ID,
                     "catalog_object_id": vid,
                     "quantity": str(quantity),
-                    "occurred_at": occurred_at,
+                    "occurred_at": adj.get("occurred_at") or occurred_at,
                 },
             }
         )
@@ -146,11 +362,23 @@ def batch_change_inventory_for_sale(adjustments: List[dict], idempotency_key: st
         "changes": changes_payload,
     }
 
-    resp = requests.post(url, headers=_headers(), json=body, timeout=10)
-    if not resp.ok:
-        # Log only; don't raise (we don't want to break Stripe webhook)
-        try:
-            data = resp.json()
-        except Exception:
-            data = resp.text
-        print("Square batch_change_inventory_for_sale error:", resp.status_code, data)
+    resp = _request("POST", "/inventory/changes/batch-create", json=body)
+    resp.raise_for_status()
+
+
+def download_catalog_image(url: str) -> bytes:
+    """
+    Download an IMAGE object's file from Square's image host.
+
+    Uses the pooled session (so transient failures are retried) but never the
+    API headers: the access token must not leave Square's API host.
+    """
+    started = time.monotonic()
+    ok = False
+    try:
+        resp = get_session().get(url, timeout=30)
+        resp.raise_for_status()
+        ok = True
+        return resp.content
+    finally:
+        _record("GET image", time.monotonic() - started, ok)
@@ -0,0 +1,217 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+from django.utils import timezone
+
+FAKE_LOCATION_ID = "FAKE_LOCATION"
+LIST_PAGE_SIZE = 100
+
+
+class FakeSquareCatalog:
+    """
+    Deterministic catalog of ``variations`` ITEM_VARIATIONs spread over ITEMs
+    with ``variations_per_item`` each, sharing a small pool of images and
+    categories the way a real butcher catalog does.
+    """
+
+    def __init__(
+        self,
+        variations: int,
+        *,
+        variations_per_item: int = 2,
+        images: int = 50,
+        categories: int = 8,
+    ):
+        self.items: List[dict] = []
+        self.lookups: Dict[str, dict] = {}
+        self.counts: Dict[str, int] = {}
+        self.changes: List[dict] = []
+        self._idempotency_keys: set = set()
+        self._lock = threading.Lock()
+
+        for index in range(categories):
+            category_id = f"CAT_{index}"
+            self.lookups[category_id] = {
+                "type": "CATEGORY",
+                "id": category_id,
+                "category_data": {"name": f"Category {index}"},
+            }
+        for index in range(images):
+            image_id = f"IMG_{index}"
+            self.lookups[image_id] = {
+                "type": "IMAGE",
+                "id": image_id,
+                "image_data": {"url": f"https://images.example.com/{image_id}.jpg"},
+            }
+
+        item_count = -(-variations // variations_per_item)
+        made = 0
+        for index in range(item_count):
+            item_id = f"ITEM_{index}"
+            item_variations = []
+            for position in range(min(variations_per_item, variations - made)):
+                variation_id = f"VAR_{index}_{position}"
+                item_variations.append(
+                    {
+                        "type": "ITEM_VARIATION",
+                        "id": variation_id,
+                        "item_variation_data": {
+                            "item_id": item_id,
+                            "name": f"{position + 1} lb",
+                            "price_money": {"amount": 1000 + 250 * position, "currency": "CAD"},
+                        },
+                    }
+                )
+                self.counts[variation_id] = (index * 7 + position) % 20
+                made += 1
+            self.items.append(
+                {
+                    "type": "ITEM",
+                    "id": item_id,
+                    "is_deleted": False,
+                    "item_data": {
+                        "name": f"Cut {index}",
+                        "description": f"Cut {index} description",
+                        "image_ids": [f"IMG_{index % images}"] if images else [],
+                        "categories": [{"id": f"CAT_{index % categories}"}] if categories else [],
+                        "variations": item_variations,
+                    },
+                }
+            )
+
+    def list_page(self, cursor: str) -> dict:
+        offset = int(cursor or 0)
+        page = {"objects": self.items[offset : offset + LIST_PAGE_SIZE]}
+        if offset + LIST_PAGE_SIZE < len(self.items):
+            page["cursor"] = str(offset + LIST_PAGE_SIZE)
+        return page
+
+    def retrieve(self, object_ids: List[str]) -> dict:
+        items = {item["id"]: item for item in self.items}
+        return {
+            "objects": [
+                items.get(object_id) or self.lookups[object_id]
+                for object_id in object_ids
+                if object_id in items or object_id in self.lookups
+            ]
+        }
+
+    def inventory_counts(self, variation_ids: List[str]) -> dict:
+        with self._lock:
+            counts = [
+                {
+                    "catalog_object_id": variation_id,
+                    "catalog_object_type": "ITEM_VARIATION",
+                    "state": "IN_STOCK",
+                    "location_id": FAKE_LOCATION_ID,
+                    "quantity": str(self.counts[variation_id]),
+                }
+                for variation_id in variation_ids
+                if variation_id in self.counts
+            ]
+        return {"counts": counts}
+
+    def apply_changes(self, body: dict) -> dict:
+        with self._lock:
+            key = body.get("idempotency_key")
+            if key in self._idempotency_keys:
+                return {"counts": []}
+            self._idempotency_keys.add(key)
+            for change in body.get("changes", []):
+                adjustment = change.get("adjustment") or {}
+                variation_id = adjustment.get("catalog_object_id")
+                if variation_id in self.counts and adjustment.get("to_state") == "SOLD":
+                    self.counts[variation_id] -= int(adjustment.get("quantity", "0"))
+                self.changes.append(change)
+        return {"counts": []}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FakeSquareServer"
+
+    def _reply(self, payload: dict, status: int = 200) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.server.record(f"GET {url.path}")
+        if url.path == "/v2/catalog/list":
+            cursor = parse_qs(url.query).get("cursor", [""])[0]
+            return self._reply(self.server.catalog.list_page(cursor))
+        return self._reply({"errors": [{"code": "NOT_FOUND"}]}, status=404)
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        self.server.record(f"POST {path}")
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        catalog = self.server.catalog
+
+        if path == "/v2/catalog/batch-retrieve":
+            return self._reply(catalog.retrieve(body.get("object_ids", [])))
+        if path == "/v2/inventory/counts/batch-retrieve":
+            return self._reply(catalog.inventory_counts(body.get("catalog_object_ids", [])))
+        if path == "/v2/inventory/changes/batch-create":
+            return self._reply(catalog.apply_changes(body))
+        if path == "/v2/catalog/search":
+            # Nothing changes behind our back, so incremental syncs find no changes.
+            return self._reply(
+                {"objects": [], "latest_time": timezone.now().strftime("%Y-%m-%dT%H:%M:%SZ")}
+            )
+        return self._reply({"errors": [{"code": "NOT_FOUND"}]}, status=404)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeSquareServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the Square endpoints square_sync calls, serving a
+    FakeSquareCatalog on 127.0.0.1 from a background thread:
+
+        with FakeSquareServer(FakeSquareCatalog(variations=1000)) as server:
+            with override_settings(**server.settings()):
+                sync_products_from_square()
+    """
+
+    daemon_threads = True
+
+    def __init__(self, catalog: FakeSquareCatalog):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.catalog = catalog
+        self.requests: Dict[str, int] = {}
+        self._requests_lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def record(self, endpoint: str) -> None:
+        with self._requests_lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v2"
+
+    def settings(self) -> dict:
+        """Settings overrides that point square_sync at this server."""
+        return {
+            "SQUARE_BASE_URL": self.base_url,
+            "SQUARE_ACCESS_TOKEN": "fake-token",
+            "SQUARE_LOCATION_ID": FAKE_LOCATION_ID,
+        }
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,130 @@
+import hashlib
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage, storages
+
+from .api import SQUARE_IMAGE_WORKERS, download_catalog_image
+from .models import MirroredImage
+
+logger = logging.getLogger(__name__)
+
+MIRROR_PREFIX = "square-images"
+# Mirrored names change with their content, so they can be cached for good.
+MIRROR_CACHE_CONTROL = "public, max-age=31536000, immutable"
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+
+
+def get_mirror_storage() -> Storage:
+    """
+    The default storage, with the long-cache header added for S3 uploads.
+    Local media has no per-file headers; serve ``/media/square-images/`` with
+    the same Cache-Control from the web server instead.
+    """
+    config = settings.STORAGES["default"]
+    if "s3" not in config["BACKEND"].lower():
+        return storages["default"]
+    options = dict(config.get("OPTIONS") or {})
+    options["object_parameters"] = {
+        **(options.get("object_parameters") or {}),
+        "CacheControl": MIRROR_CACHE_CONTROL,
+    }
+    return storages.create_storage({**config, "OPTIONS": options})
+
+
+def _mirror_name(image_id: str, checksum: str, source_url: str) -> str:
+    extension = posixpath.splitext(urlparse(source_url).path)[1].lower()
+    if extension not in IMAGE_EXTENSIONS:
+        extension = ".jpg"
+    return f"{MIRROR_PREFIX}/{image_id}/{checksum[:16]}{extension}"
+
+
+def _download(source_url: str) -> Optional[bytes]:
+    try:
+        return download_catalog_image(source_url)
+    except Exception:
+        logger.warning("Could not download Square image %s", source_url, exc_info=True)
+        return None
+
+
+def mirror_images(image_urls: Dict[str, str]) -> Dict[str, str]:
+    """
+    Copy Square images into our storage and return {image_id: our url}.
+
+    Images whose MirroredImage row still has the same source URL are not
+    downloaded again. The rest are downloaded by up to SQUARE_IMAGE_WORKERS
+    threads and stored under their image id and content checksum; content we
+    already hold is not uploaded twice. An image that cannot be downloaded
+    keeps its previous mirror if it has one and its Square URL otherwise, so a
+    flaky image host never fails the sync.
+    """
+    if not image_urls:
+        return {}
+
+    existing = {
+        row.image_id: row
+        for row in MirroredImage.objects.filter(image_id__in=image_urls.keys())
+    }
+    result: Dict[str, str] = {}
+    stale: Dict[str, str] = {}
+    for image_id, source_url in image_urls.items():
+        row = existing.get(image_id)
+        if row and row.source_url == source_url:
+            result[image_id] = row.url
+        else:
+            stale[image_id] = source_url
+    if not stale:
+        return result
+
+    with ThreadPoolExecutor(max_workers=min(SQUARE_IMAGE_WORKERS, len(stale))) as pool:
+        downloads = dict(zip(stale, pool.map(_download, stale.values())))
+
+    storage = get_mirror_storage()
+    for image_id, source_url in stale.items():
+        row = existing.get(image_id)
+        content = downloads[image_id]
+        if content is None:
+            result[image_id] = row.url if row else source_url
+            continue
+
+        checksum = hashlib.sha256(content).hexdigest()
+        if row and row.checksum == checksum:
+            name = row.name
+        else:
+            name = _mirror_name(image_id, checksum, source_url)
+            if not storage.exists(name):
+                name = storage.save(name, ContentFile(content))
+
+        row, _ = MirroredImage.objects.update_or_create(
+            image_id=image_id,
+            defaults={
+                "source_url": source_url,
+                "checksum": checksum,
+                "name": name,
+                "url": storage.url(name),
+                "size": len(content),
+            },
+        )
+        result[image_id] = row.url
+
+    return result
+
+
+def mirrored_image_urls(image_urls: Dict[str, str]) -> Dict[str, str]:
+    """
+    Offline counterpart of ``mirror_images``: swap in the mirrors we already
+    hold for these exact Square URLs and leave the other URLs as they are.
+    """
+    result = dict(image_urls)
+    rows = MirroredImage.objects.filter(image_id__in=image_urls.keys()).values_list(
+        "image_id", "source_url", "url"
+    )
+    for image_id, source_url, url in rows:
+        if image_urls[image_id] == source_url:
+            result[image_id] = url
+    return result
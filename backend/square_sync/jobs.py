@@ -0,0 +1,114 @@
+import logging
+from datetime import timedelta
+from typing import Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import SyncJob
+from .serializers import SyncRunSerializer
+from .services import sync_inventory_from_square, sync_products_from_square
+
+logger = logging.getLogger(__name__)
+
+# A job still "running" after this long is assumed to belong to a dead worker.
+SYNC_JOB_STALE_AFTER = timedelta(hours=1)
+
+
+def _expire_stale_jobs() -> None:
+    SyncJob.objects.filter(
+        in_flight=True,
+        status=SyncJob.Status.RUNNING,
+        started_at__lt=timezone.now() - SYNC_JOB_STALE_AFTER,
+    ).update(
+        status=SyncJob.Status.FAILED,
+        in_flight=False,
+        finished_at=timezone.now(),
+        error="Abandoned: the worker stopped before the sync finished.",
+    )
+
+
+def enqueue_sync_job(user=None) -> Tuple[SyncJob, bool]:
+    """
+    Queue a full products + inventory sync, or return the job already in flight.
+
+    Returns (job, created). Two simultaneous requests race on the
+    square_sync_one_job_in_flight constraint, and the loser gets the winner's job.
+    """
+    _expire_stale_jobs()
+    existing = SyncJob.objects.filter(in_flight=True).first()
+    if existing:
+        return existing, False
+    try:
+        with transaction.atomic():
+            return SyncJob.objects.create(requested_by=user), True
+    except IntegrityError:
+        return SyncJob.objects.get(in_flight=True), False
+
+
+def _claim_next_job() -> Optional[SyncJob]:
+    with transaction.atomic():
+        job = (
+            SyncJob.objects.select_for_update(skip_locked=True)
+            .filter(status=SyncJob.Status.QUEUED)
+            .order_by("requested_at")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = SyncJob.Status.RUNNING
+        job.started_at = timezone.now()
+        job.save(update_fields=["status", "started_at"])
+    return job
+
+
+def _set_stage(job: SyncJob, stage: str) -> None:
+    job.stage = stage
+    job.save(update_fields=["stage"])
+
+
+def run_sync_job(job: SyncJob) -> None:
+    """
+    Run the catalog then the inventory sync for ``job`` and record the outcome.
+    If a cron or webhook sync is already running, each step waits for it to
+    finish and then runs; a step that gives up waiting fails the job.
+    """
+    try:
+        _set_stage(job, SyncJob.Stage.CATALOG)
+        sync_products_from_square(job=job, wait=True)
+        _set_stage(job, SyncJob.Stage.INVENTORY)
+        sync_inventory_from_square(job=job, wait=True)
+    except Exception as exc:
+        logger.exception("Square sync job %s failed", job.pk)
+        job.status = SyncJob.Status.FAILED
+        job.error = f"{type(exc).__name__}: {exc}"
+    else:
+        job.status = SyncJob.Status.SUCCEEDED
+    job.in_flight = False
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "error", "in_flight", "finished_at"])
+
+
+def process_sync_jobs() -> int:
+    """Run every queued job, oldest first. Returns how many were run."""
+    handled = 0
+    while True:
+        job = _claim_next_job()
+        if job is None:
+            return handled
+        run_sync_job(job)
+        handled += 1
+
+
+def sync_job_status(job: SyncJob) -> dict:
+    """JSON-ready snapshot of a job and the SyncRuns it has produced so far."""
+    return {
+        "id": job.pk,
+        "status": job.status,
+        "stage": job.stage,
+        "requested_at": job.requested_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "error": job.error,
+        "runs": SyncRunSerializer(job.runs.order_by("started_at"), many=True).data,
+    }
@@ -0,0 +1,92 @@
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, TypeVar
+
+from django.utils import timezone
+
+from .api import get_request_metrics
+from .models import SyncRun
+
+T = TypeVar("T")
+PHASES = ("fetch", "transform", "write")
+
+
+def _total_api_calls() -> int:
+    return sum(stats["calls"] for stats in get_request_metrics().values())
+
+
+class SyncRecorder:
+    """Accumulates phase timings and row counts for one SyncRun."""
+
+    def __init__(self, run: SyncRun):
+        self.run = run
+        self._api_calls_at_start = _total_api_calls()
+
+    @contextmanager
+    def phase(self, name: str):
+        if name not in PHASES:
+            raise ValueError(f"Unknown sync phase: {name}")
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            field = f"{name}_seconds"
+            setattr(self.run, field, getattr(self.run, field) + time.monotonic() - started)
+
+    def timed(self, name: str, iterable: Iterable[T]) -> Iterator[T]:
+        """Iterate ``iterable``, charging the time spent producing each item to ``name``."""
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def save_progress(self) -> None:
+        """Persist the counters so far, so a long sync can be watched while it runs."""
+        self.run.save(
+            update_fields=[
+                "fetch_seconds",
+                "transform_seconds",
+                "write_seconds",
+                "created",
+                "updated",
+                "deactivated",
+            ]
+        )
+
+    def fail(self, error: str) -> None:
+        """Mark the run failed without raising, for errors the caller chooses to swallow."""
+        self.run.status = SyncRun.Status.FAILED
+        self.run.error = error
+
+    def finish(self) -> None:
+        self.run.finished_at = timezone.now()
+        # Process-wide counter: concurrent syncs in one process would share it.
+        self.run.api_calls = _total_api_calls() - self._api_calls_at_start
+        self.run.save()
+
+
+@contextmanager
+def record_sync_run(kind: str, job=None) -> Iterator[SyncRecorder]:
+    """
+    Create a SyncRun for ``kind`` (linked to ``job`` if given) and yield a
+    SyncRecorder to fill in.
+
+    The run is saved as succeeded when the block exits normally and as failed,
+    with the exception text, when it raises (the exception still propagates).
+    Inside a caller's transaction the row shares that transaction's fate.
+    """
+    recorder = SyncRecorder(SyncRun.objects.create(kind=kind, job=job))
+    try:
+        yield recorder
+    except Exception as exc:
+        recorder.fail(f"{type(exc).__name__}: {exc}")
+        raise
+    else:
+        if recorder.run.status == SyncRun.Status.RUNNING:
+            recorder.run.status = SyncRun.Status.SUCCEEDED
+    finally:
+        recorder.finish()
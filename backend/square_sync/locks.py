@@ -0,0 +1,112 @@
+import hashlib
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Iterator
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import SyncLock
+
+logger = logging.getLogger(__name__)
+
+SQUARE_SYNC_LOCK = "square-sync"
+# How long a lock-table row is honoured before another process may take it over.
+SYNC_LOCK_TTL = timedelta(hours=2)
+SYNC_LOCK_WAIT_TIMEOUT = 15 * 60
+SYNC_LOCK_POLL_INTERVAL = 1.0
+
+_held = threading.local()
+
+
+def _advisory_key(name: str) -> int:
+    # pg_advisory_lock takes a signed 64-bit key.
+    return int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], "big", signed=True)
+
+
+def _owner_id() -> str:
+    owner = getattr(_held, "owner", None)
+    if owner is None:
+        owner = _held.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    return owner
+
+
+def _try_acquire(name: str) -> bool:
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", [_advisory_key(name)])
+            return cursor.fetchone()[0]
+
+    now = timezone.now()
+    SyncLock.objects.filter(name=name, expires_at__lt=now).delete()
+    try:
+        with transaction.atomic():
+            SyncLock.objects.create(name=name, owner=_owner_id(), expires_at=now + SYNC_LOCK_TTL)
+    except IntegrityError:
+        return False
+    return True
+
+
+def _release(name: str) -> None:
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [_advisory_key(name)])
+        return
+    SyncLock.objects.filter(name=name, owner=_owner_id()).delete()
+
+
+class SyncLockTimeout(Exception):
+    """Raised when ``single_flight(wait=True)`` gives up waiting for the lock."""
+
+
+@contextmanager
+def single_flight(
+    name: str = SQUARE_SYNC_LOCK,
+    *,
+    wait: bool = False,
+    timeout: float = SYNC_LOCK_WAIT_TIMEOUT,
+) -> Iterator[bool]:
+    """
+    Cross-process guard so only one Square sync runs at a time.
+
+    Yields True when this caller holds the lock and should do the work. When
+    another process holds it, yields False straight away (``wait=False``), or
+    waits for that process to finish and then takes the lock and yields True
+    (``wait=True``): the other sync may be of a different kind or may have
+    started before the caller's changes, so its result cannot stand in for
+    the caller's. Waiting raises SyncLockTimeout after ``timeout`` seconds.
+
+    Postgres uses a session-level advisory lock; other databases use a SyncLock
+    row with a TTL. The guard is re-entrant within a thread, so a sync that
+    falls back to another sync does not deadlock on itself.
+    """
+    held = getattr(_held, "names", None)
+    if held is None:
+        held = _held.names = set()
+    if name in held:
+        yield True
+        return
+
+    if not _try_acquire(name):
+        if not wait:
+            logger.info("Skipping %s: another sync is in progress", name)
+            yield False
+            return
+        deadline = time.monotonic() + timeout
+        while not _try_acquire(name):
+            if time.monotonic() >= deadline:
+                raise SyncLockTimeout(f"Gave up waiting for {name} after {timeout}s")
+            time.sleep(SYNC_LOCK_POLL_INTERVAL)
+
+    held.add(name)
+    try:
+        yield True
+    finally:
+        held.discard(name)
+        _release(name)
@@ -0,0 +1,85 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from square_sync.api import get_request_metrics, reset_request_metrics
+from square_sync.fake_server import FakeSquareCatalog, FakeSquareServer
+from square_sync.services import sync_inventory_from_square, sync_products_from_square
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time sync_products_from_square / sync_inventory_from_square against a local "
+        "fake Square server at several catalog sizes. All writes are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[100, 1000, 10000],
+            help="Catalog sizes to benchmark, in variations.",
+        )
+        parser.add_argument(
+            "--output",
+            help="Append one JSON line per measurement to this file for regression tracking.",
+        )
+
+    def _measure(self, label, size, func):
+        reset_request_metrics()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+        return {
+            "step": label,
+            "variations": size,
+            "seconds": round(elapsed, 4),
+            "queries": len(queries.captured_queries),
+            "api_calls": sum(stats["calls"] for stats in get_request_metrics().values()),
+        }
+
+    def _benchmark_size(self, size):
+        catalog = FakeSquareCatalog(variations=size)
+        results = []
+        with FakeSquareServer(catalog) as server, override_settings(**server.settings()):
+            try:
+                # Run against the real schema but never keep the fake products.
+                with transaction.atomic():
+                    results.append(self._measure("products (initial)", size, sync_products_from_square))
+                    results.append(self._measure("products (unchanged)", size, sync_products_from_square))
+                    for variation_id in list(catalog.counts)[::10]:
+                        catalog.counts[variation_id] += 1
+                    results.append(self._measure("inventory (10% changed)", size, sync_inventory_from_square))
+                    raise _Rollback
+            except _Rollback:
+                pass
+        return results
+
+    def handle(self, *args, **options):
+        results = []
+        for size in options["sizes"]:
+            self.stdout.write(f"Benchmarking {size} variations...")
+            results.extend(self._benchmark_size(size))
+
+        self.stdout.write(f"{'step':<26}{'variations':>11}{'seconds':>10}{'queries':>9}{'api calls':>11}")
+        for row in results:
+            self.stdout.write(
+                f"{row['step']:<26}{row['variations']:>11}{row['seconds']:>10.3f}"
+                f"{row['queries']:>9}{row['api_calls']:>11}"
+            )
+
+        if options["output"]:
+            recorded_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            with open(options["output"], "a", encoding="utf-8") as handle:
+                for row in results:
+                    handle.write(json.dumps({"recorded_at": recorded_at, **row}) + "\n")
+        self.stdout.write(self.style.SUCCESS("Square sync benchmark completed."))
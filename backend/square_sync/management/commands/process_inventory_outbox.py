@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from square_sync.outbox import process_inventory_outbox
+
+
+class Command(BaseCommand):
+    help = "Send queued inventory decrements for paid orders to Square"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=500,
+            help="Maximum number of orders to send per pass.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new decrements instead of exiting after one pass.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=5.0,
+            help="Seconds to wait between polls when the outbox is empty (with --loop).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            handled = process_inventory_outbox(limit=options["limit"])
+            if handled:
+                self.stdout.write(f"Sent {handled} inventory decrement(s).")
+            if not options["loop"]:
+                break
+            if handled < options["limit"]:
+                time.sleep(options["sleep"])
+        self.stdout.write(self.style.SUCCESS("Inventory outbox processing completed."))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from square_sync.webhooks import process_pending_square_events
+
+
+class Command(BaseCommand):
+    help = "Apply pending Square catalog webhook events as one incremental catalog sync"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new events instead of exiting after one pass.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=10.0,
+            help="Seconds to wait between polls (with --loop).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            handled = process_pending_square_events()
+            if handled:
+                self.stdout.write(f"Handled {handled} Square event(s).")
+            if not options["loop"]:
+                break
+            time.sleep(options["sleep"])
+        self.stdout.write(self.style.SUCCESS("Square event processing completed."))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from square_sync.jobs import process_sync_jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued Square sync jobs (requested from the product admin)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new jobs instead of exiting after one pass.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=2.0,
+            help="Seconds to wait between polls (with --loop).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            handled = process_sync_jobs()
+            if handled:
+                self.stdout.write(f"Ran {handled} Square sync job(s).")
+            if not options["loop"]:
+                break
+            time.sleep(options["sleep"])
+        self.stdout.write(self.style.SUCCESS("Square sync job processing completed."))
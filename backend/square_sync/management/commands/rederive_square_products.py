@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from square_sync.locks import SyncLockTimeout
+from square_sync.services import rederive_products_from_square_mirror
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Rebuild Square products from the local SquareCatalogObject mirror (no Square API calls)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--wait",
+            action="store_true",
+            help="If a Square sync is running, wait for it to finish and then run instead of skipping.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rewrite every product, even those whose mapped fields are unchanged.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would change, then roll everything back.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            if options["dry_run"]:
+                # Only a dry run is held in one transaction; a real run commits
+                # batch by batch like the other syncs.
+                try:
+                    with transaction.atomic():
+                        summary = self._rederive(options)
+                        raise _Rollback
+                except _Rollback:
+                    self.stdout.write("Dry run: no changes were saved.")
+            else:
+                summary = self._rederive(options)
+        except SyncLockTimeout as exc:
+            raise CommandError(str(exc))
+
+        if summary["mode"] == "skipped":
+            self.stdout.write("Another Square sync was in progress; nothing else to do.")
+        else:
+            self.stdout.write(
+                f"Created: {summary['created']}, updated: {summary['updated']}, "
+                f"deactivated: {summary['deactivated']}."
+            )
+        self.stdout.write(self.style.SUCCESS("Square product re-derive completed."))
+
+    def _rederive(self, options):
+        return rederive_products_from_square_mirror(wait=options["wait"], force=options["force"])
@@ -1,12 +1,31 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
+from square_sync.api import get_request_metrics
+from square_sync.locks import SyncLockTimeout
 from square_sync.services import sync_inventory_from_square
 
 
 class Command(BaseCommand):
     help = "Sync inventory counts from Square into Product.square_quantity"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--wait",
+            action="store_true",
+            help="If another Square sync is running, wait for it to finish and then run instead of skipping.",
+        )
+
     def handle(self, *args, **options):
         self.stdout.write("Syncing inventory from Square...")
-        sync_inventory_from_square()
+        try:
+            changed = sync_inventory_from_square(wait=options["wait"])
+        except SyncLockTimeout as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(f"{changed} product(s) changed.")
+        if options["verbosity"] >= 2:
+            for endpoint, stats in sorted(get_request_metrics().items()):
+                self.stdout.write(
+                    f"  {endpoint}: {stats['calls']} call(s), {stats['errors']} error(s), "
+                    f"avg {stats['avg_seconds']:.3f}s, max {stats['max_seconds']:.3f}s"
+                )
         self.stdout.write(self.style.SUCCESS("Square inventory sync completed."))
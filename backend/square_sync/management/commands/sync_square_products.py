@@ -1,12 +1,47 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
-from square_sync.services import sync_products_from_square
+from square_sync.api import get_request_metrics
+from square_sync.locks import SyncLockTimeout
+from square_sync.services import (
+    sync_catalog_changes_from_square,
+    sync_products_from_square,
+)
 
 
 class Command(BaseCommand):
     help = "Sync products from Square Catalog into local Product table"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only fetch catalog objects changed since the last successful sync.",
+        )
+        parser.add_argument(
+            "--wait",
+            action="store_true",
+            help="If another Square sync is running, wait for it to finish and then run instead of skipping.",
+        )
+
     def handle(self, *args, **options):
-        self.stdout.write("Syncing products from Square Catalog...")
-        sync_products_from_square()
+        try:
+            if options["incremental"]:
+                self.stdout.write("Syncing catalog changes from Square...")
+                summary = sync_catalog_changes_from_square(wait=options["wait"])
+                self.stdout.write(
+                    f"Mode: {summary['mode']}, changed objects: {summary['changed_objects']}, "
+                    f"items refreshed: {summary['items_refreshed']}."
+                )
+            else:
+                self.stdout.write("Syncing products from Square Catalog...")
+                if not sync_products_from_square(wait=options["wait"]):
+                    self.stdout.write("Another Square sync was in progress; nothing else to do.")
+        except SyncLockTimeout as exc:
+            raise CommandError(str(exc))
+        if options["verbosity"] >= 2:
+            for endpoint, stats in sorted(get_request_metrics().items()):
+                self.stdout.write(
+                    f"  {endpoint}: {stats['calls']} call(s), {stats['errors']} error(s), "
+                    f"avg {stats['avg_seconds']:.3f}s, max {stats['max_seconds']:.3f}s"
+                )
         self.stdout.write(self.style.SUCCESS("Square product sync completed."))
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("square_sync", "0003_syncrun"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SyncJob",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("status", models.CharField(choices=[("queued", "Queued"), ("running", "Running"), ("succeeded", "Succeeded"), ("failed", "Failed")], default="queued", max_length=20)),
+                ("stage", models.CharField(blank=True, choices=[("catalog", "Catalog"), ("inventory", "Inventory")], max_length=20)),
+                ("in_flight", models.BooleanField(default=True)),
+                ("requested_at", models.DateTimeField(auto_now_add=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("error", models.TextField(blank=True)),
+                ("requested_by", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="+", to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                "ordering": ["-requested_at"],
+            },
+        ),
+        migrations.AddField(
+            model_name="syncrun",
+            name="job",
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="runs", to="square_sync.syncjob"),
+        ),
+        migrations.AddConstraint(
+            model_name="syncjob",
+            constraint=models.UniqueConstraint(condition=models.Q(("in_flight", True)), fields=("in_flight",), name="square_sync_one_job_in_flight"),
+        ),
+    ]
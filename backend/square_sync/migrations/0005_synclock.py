@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("square_sync", "0004_syncjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SyncLock",
+            fields=[
+                ("name", models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ("owner", models.CharField(max_length=255)),
+                ("acquired_at", models.DateTimeField(auto_now_add=True)),
+                ("expires_at", models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:57
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0002_add_delivery_fields_and_statuses"),
+        ("square_sync", "0005_synclock"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InventoryDecrement",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("idempotency_key", models.CharField(max_length=64, unique=True)),
+                ("adjustments", models.JSONField()),
+                ("status", models.CharField(choices=[("pending", "Pending"), ("sent", "Sent"), ("failed", "Failed")], default="pending", max_length=20)),
+                ("batch_key", models.CharField(blank=True, db_index=True, max_length=64)),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("next_attempt_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("last_error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+                ("order", models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="inventory_decrements", to="orders.order")),
+            ],
+            options={
+                "ordering": ["created_at"],
+                "indexes": [models.Index(fields=["status", "next_attempt_at"], name="square_sync_status_1d5de3_idx")],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("square_sync", "0006_inventorydecrement"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MirroredImage",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("image_id", models.CharField(max_length=64, unique=True)),
+                ("source_url", models.URLField(max_length=1000)),
+                ("checksum", models.CharField(max_length=64)),
+                ("name", models.CharField(max_length=255)),
+                ("url", models.URLField(max_length=1000)),
+                ("size", models.PositiveIntegerField(default=0)),
+                ("mirrored_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("square_sync", "0007_mirroredimage"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="syncrun",
+            name="kind",
+            field=models.CharField(choices=[("products", "Full catalog"), ("catalog_changes", "Incremental catalog"), ("inventory", "Inventory"), ("inventory_decrement", "Inventory decrement"), ("rederive", "Re-derive from mirror")], max_length=32),
+        ),
+        migrations.CreateModel(
+            name="SquareCatalogObject",
+            fields=[
+                ("object_id", models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ("type", models.CharField(max_length=32)),
+                ("version", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(blank=True, null=True)),
+                ("is_deleted", models.BooleanField(default=False)),
+                ("data", models.JSONField()),
+                ("synced_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "indexes": [models.Index(fields=["type", "is_deleted"], name="square_sync_type_389ad3_idx")],
+            },
+        ),
+    ]
@@ -0,0 +1 @@
+"""Migrations package for square_sync app."""
@@ -0,0 +1,63 @@
+from typing import Dict, Iterable, Set
+
+from django.utils.dateparse import parse_datetime
+
+from .models import SquareCatalogObject
+
+MIRROR_FIELDS = ["type", "version", "updated_at", "is_deleted", "data", "synced_at"]
+MIRROR_BATCH_SIZE = 500
+
+
+def store_catalog_objects(objects: Iterable[dict]) -> int:
+    """
+    Upsert raw catalog objects into SquareCatalogObject and return how many
+    rows were written. Objects whose version and deleted flag match the stored
+    row are skipped, so re-seeing an unchanged catalog costs one SELECT.
+    """
+    latest: Dict[str, dict] = {}
+    for obj in objects:
+        if obj.get("id") and obj.get("type"):
+            latest[obj["id"]] = obj
+    if not latest:
+        return 0
+
+    stored = {
+        object_id: (version, is_deleted)
+        for object_id, version, is_deleted in SquareCatalogObject.objects.filter(
+            object_id__in=latest.keys()
+        ).values_list("object_id", "version", "is_deleted")
+    }
+    rows = []
+    for object_id, obj in latest.items():
+        version = int(obj.get("version") or 0)
+        is_deleted = bool(obj.get("is_deleted"))
+        if stored.get(object_id) == (version, is_deleted):
+            continue
+        rows.append(
+            SquareCatalogObject(
+                object_id=object_id,
+                type=obj["type"],
+                version=version,
+                updated_at=parse_datetime(obj.get("updated_at") or ""),
+                is_deleted=is_deleted,
+                data=obj,
+            )
+        )
+
+    SquareCatalogObject.objects.bulk_create(
+        rows,
+        batch_size=MIRROR_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["object_id"],
+        update_fields=MIRROR_FIELDS,
+    )
+    return len(rows)
+
+
+def mark_items_deleted_except(item_ids: Set[str]) -> int:
+    """After a full listing, flag mirrored ITEMs Square no longer returned as deleted."""
+    return (
+        SquareCatalogObject.objects.filter(type="ITEM", is_deleted=False)
+        .exclude(object_id__in=item_ids)
+        .update(is_deleted=True)
+    )
@@ -0,0 +1,268 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class SyncCheckpoint(models.Model):
+    """
+    High-water mark for incremental Square syncs.
+
+    ``latest_time`` is Square's RFC 3339 ``latest_time`` from the last successful
+    delta run and is passed back verbatim as the next ``begin_time``.
+    """
+
+    CATALOG = "catalog"
+
+    key = models.CharField(max_length=50, unique=True)
+    latest_time = models.CharField(max_length=64, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key}: {self.latest_time or 'never synced'}"
+
+
+class SquareWebhookEvent(models.Model):
+    """
+    Square webhook notification, de-duplicated by Square's event_id.
+
+    inventory.count.updated events are applied as they arrive; catalog.version.updated
+    events stay pending until ``manage.py process_square_events`` coalesces them into
+    one incremental catalog sync.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        PROCESSED = "processed", "Processed"
+        FAILED = "failed", "Failed"
+
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100, blank=True)
+    payload = models.JSONField()
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["received_at"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"SquareWebhookEvent {self.event_id} ({self.event_type or 'unknown'}, {self.status})"
+
+
+class SyncJob(models.Model):
+    """
+    A queued "sync products and inventory" request, run by ``process_sync_jobs``.
+
+    At most one job is in flight (queued or running) at a time: the partial
+    unique constraint on ``in_flight`` makes duplicate requests collapse into
+    the existing job. The SyncRuns it produces are linked through ``runs``.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        SUCCEEDED = "succeeded", "Succeeded"
+        FAILED = "failed", "Failed"
+
+    class Stage(models.TextChoices):
+        CATALOG = "catalog", "Catalog"
+        INVENTORY = "inventory", "Inventory"
+
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.QUEUED
+    )
+    stage = models.CharField(max_length=20, choices=Stage.choices, blank=True)
+    in_flight = models.BooleanField(default=True)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+    requested_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["-requested_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["in_flight"],
+                condition=models.Q(in_flight=True),
+                name="square_sync_one_job_in_flight",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Square sync job #{self.pk} ({self.status})"
+
+
+class SyncRun(models.Model):
+    """
+    Journal entry for one Square sync: when it ran, where the time went and what
+    it changed. Phase durations are accumulated, so a streaming sync that
+    alternates fetch/transform/write reports the total spent in each.
+    """
+
+    class Kind(models.TextChoices):
+        PRODUCTS = "products", "Full catalog"
+        CATALOG_CHANGES = "catalog_changes", "Incremental catalog"
+        INVENTORY = "inventory", "Inventory"
+        INVENTORY_DECREMENT = "inventory_decrement", "Inventory decrement"
+        REDERIVE = "rederive", "Re-derive from mirror"
+
+    class Status(models.TextChoices):
+        RUNNING = "running", "Running"
+        SUCCEEDED = "succeeded", "Succeeded"
+        FAILED = "failed", "Failed"
+
+    kind = models.CharField(max_length=32, choices=Kind.choices)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.RUNNING
+    )
+    started_at = models.DateTimeField(default=timezone.now, db_index=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    fetch_seconds = models.FloatField(default=0)
+    transform_seconds = models.FloatField(default=0)
+    write_seconds = models.FloatField(default=0)
+    api_calls = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    deactivated = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    job = models.ForeignKey(
+        SyncJob, null=True, blank=True, on_delete=models.SET_NULL, related_name="runs"
+    )
+
+    class Meta:
+        ordering = ["-started_at"]
+        indexes = [
+            models.Index(fields=["kind", "-started_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} sync at {self.started_at:%Y-%m-%d %H:%M} ({self.status})"
+
+    @property
+    def duration_seconds(self):
+        if not self.finished_at:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
+
+
+class SyncLock(models.Model):
+    """
+    Lock row used by ``square_sync.locks`` on databases without advisory locks
+    (SQLite in development). ``expires_at`` lets a crashed holder's lock be
+    taken over instead of blocking syncs forever.
+    """
+
+    name = models.CharField(max_length=100, primary_key=True)
+    owner = models.CharField(max_length=255)
+    acquired_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} held by {self.owner}"
+
+
+class InventoryDecrement(models.Model):
+    """
+    Outbox row for one paid order's Square inventory decrement.
+
+    Written in the same transaction as the order's move to PROCESSING and sent
+    later by ``process_inventory_outbox``. ``batch_key`` is fixed the first time
+    a row is sent and reused as the Square idempotency key on every retry, so a
+    batch whose response was lost can never be applied twice.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        SENT = "sent", "Sent"
+        FAILED = "failed", "Failed"
+
+    order = models.ForeignKey(
+        "orders.Order",
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name="inventory_decrements",
+    )
+    idempotency_key = models.CharField(max_length=64, unique=True)
+    adjustments = models.JSONField()
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.PENDING
+    )
+    batch_key = models.CharField(max_length=64, blank=True, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.idempotency_key} ({self.status})"
+
+
+class MirroredImage(models.Model):
+    """
+    Our copy of a Square IMAGE object's file in ``STORAGES["default"]``.
+
+    The file is stored under the image id and a checksum of its content, so its
+    URL changes whenever the content does and can be cached indefinitely.
+    ``source_url`` is the Square URL it was downloaded from: while an image
+    still points there, later syncs reuse this row without downloading.
+    """
+
+    image_id = models.CharField(max_length=64, unique=True)
+    source_url = models.URLField(max_length=1000)
+    checksum = models.CharField(max_length=64)
+    name = models.CharField(max_length=255)
+    url = models.URLField(max_length=1000)
+    size = models.PositiveIntegerField(default=0)
+    mirrored_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.image_id} -> {self.name}"
+
+
+class SquareCatalogObject(models.Model):
+    """
+    Raw copy of a Square catalog object as last seen by a sync.
+
+    Kept up to date by the full and incremental catalog syncs (a row is only
+    rewritten when Square's ``version`` changes) so Product can be rebuilt from
+    it without calling Square; see ``rederive_products_from_square_mirror``.
+    ITEM rows carry their variations nested, as Square returns them.
+    """
+
+    object_id = models.CharField(max_length=64, primary_key=True)
+    type = models.CharField(max_length=32)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(null=True, blank=True)
+    is_deleted = models.BooleanField(default=False)
+    data = models.JSONField()
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["type", "is_deleted"]),
+        ]
+
+    def __str__(self):
+        return f"{self.type} {self.object_id} v{self.version}"
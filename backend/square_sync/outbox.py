@@ -0,0 +1,195 @@
+import hashlib
+import logging
+from collections import Counter
+from datetime import timedelta
+from typing import Dict, List
+
+import requests
+from django.db import transaction
+from django.utils import timezone
+
+from .api import batch_change_inventory_for_sale
+from .journal import record_sync_run
+from .models import InventoryDecrement, SyncRun
+from .services import refresh_inventory_for_variations
+
+logger = logging.getLogger(__name__)
+
+# Square accepts at most 100 changes per batch-create call.
+OUTBOX_MAX_CHANGES = 100
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_MAX_BACKOFF = timedelta(hours=1)
+# How long claimed rows stay hidden from other workers while their batch is sent.
+OUTBOX_LEASE = timedelta(minutes=10)
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return min(timedelta(seconds=30 * 2 ** max(attempts - 1, 0)), OUTBOX_MAX_BACKOFF)
+
+
+def _batch_key(rows: List[InventoryDecrement]) -> str:
+    # A single order keeps its own order-{id}-sold key; a coalesced batch gets a
+    # key derived from all of its orders' keys.
+    if len(rows) == 1:
+        return rows[0].idempotency_key
+    keys = ",".join(sorted(row.idempotency_key for row in rows))
+    return f"orders-{hashlib.sha256(keys.encode()).hexdigest()[:48]}-sold"
+
+
+def _plan_batches(rows: List[InventoryDecrement]) -> Dict[str, List[InventoryDecrement]]:
+    """
+    Group claimed rows into batch-create calls. Rows that were sent before keep
+    their batch (and its idempotency key); new rows are packed into batches of
+    up to OUTBOX_MAX_CHANGES changes.
+    """
+    batches: Dict[str, List[InventoryDecrement]] = {}
+    fresh: List[InventoryDecrement] = []
+    for row in rows:
+        if row.batch_key:
+            batches.setdefault(row.batch_key, []).append(row)
+        else:
+            fresh.append(row)
+
+    current: List[InventoryDecrement] = []
+    changes = 0
+    for row in fresh:
+        if current and changes + len(row.adjustments) > OUTBOX_MAX_CHANGES:
+            batches[_batch_key(current)] = current
+            current, changes = [], 0
+        current.append(row)
+        changes += len(row.adjustments)
+    if current:
+        batches[_batch_key(current)] = current
+
+    for key, batch in batches.items():
+        for row in batch:
+            row.batch_key = key
+    return batches
+
+
+def _claim_whole_batches(rows: List[InventoryDecrement]) -> List[InventoryDecrement]:
+    """
+    Add the other rows of every batch that was planned before to the claimed
+    rows, whatever their next_attempt_at or parked status, so a retry sends
+    exactly the changes its idempotency key was first used for. Call inside
+    the claiming transaction. A batch with rows locked by another worker is
+    dropped from this pass and left for a later one.
+    """
+    keys = {row.batch_key for row in rows if row.batch_key}
+    if not keys:
+        return rows
+    unsent = InventoryDecrement.objects.filter(batch_key__in=keys).exclude(
+        status=InventoryDecrement.Status.SENT
+    )
+    rows = rows + list(
+        unsent.select_for_update(skip_locked=True)
+        .exclude(pk__in=[row.pk for row in rows])
+        .order_by("created_at", "id")
+    )
+    members = Counter(unsent.values_list("batch_key", flat=True))
+    held = Counter(row.batch_key for row in rows if row.batch_key)
+    incomplete = {key for key in keys if held[key] < members[key]}
+    return [row for row in rows if row.batch_key not in incomplete]
+
+
+def _claim_batches(limit: int) -> Dict[str, List[InventoryDecrement]]:
+    """
+    Claim due rows in a short transaction, plan their batches and save each
+    row's ``batch_key`` with a lease on next_attempt_at before anything is
+    sent, so a worker that dies mid-send leaves the batches, and their
+    idempotency keys, exactly as Square may already have seen them.
+    """
+    with transaction.atomic():
+        rows = list(
+            InventoryDecrement.objects.select_for_update(skip_locked=True)
+            .filter(
+                status=InventoryDecrement.Status.PENDING,
+                next_attempt_at__lte=timezone.now(),
+            )
+            .order_by("created_at", "id")[:limit]
+        )
+        rows = _claim_whole_batches(rows)
+        if not rows:
+            return {}
+        batches = _plan_batches(rows)
+        leased_until = timezone.now() + OUTBOX_LEASE
+        for row in rows:
+            row.next_attempt_at = leased_until
+        InventoryDecrement.objects.bulk_update(rows, ["batch_key", "next_attempt_at"])
+    return batches
+
+
+def process_inventory_outbox(limit: int = 500) -> int:
+    """
+    Send due InventoryDecrement rows to Square and return how many were handled.
+
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED and coalesced so
+    many orders go out in one batch-create call. The batches are fixed and
+    leased in the claiming transaction; the Square calls run outside it and
+    each batch's outcome is saved as soon as it is known. Failed batches are
+    retried with exponential backoff under the same idempotency key, always
+    with all of their rows, and parked as failed after OUTBOX_MAX_ATTEMPTS.
+    Once a batch lands, the local stock of its variations is refreshed from
+    Square.
+    """
+    batches = _claim_batches(limit)
+    if not batches:
+        return 0
+
+    sent_variation_ids: List[str] = []
+    with record_sync_run(SyncRun.Kind.INVENTORY_DECREMENT) as run:
+        for key, batch in batches.items():
+            # The sale time comes from the row, so a retry sends exactly
+            # the body its idempotency key was first used with.
+            adjustments = [
+                {**adj, "occurred_at": row.created_at.isoformat()}
+                for row in batch
+                for adj in row.adjustments
+            ]
+            try:
+                with run.phase("fetch"):
+                    batch_change_inventory_for_sale(adjustments, idempotency_key=key)
+            except requests.RequestException as exc:
+                logger.warning("Square inventory batch %s failed: %s", key, exc)
+                run.fail(f"{key}: {exc}")
+                now = timezone.now()
+                for row in batch:
+                    row.attempts += 1
+                    row.last_error = str(exc)
+                    if row.attempts >= OUTBOX_MAX_ATTEMPTS:
+                        row.status = InventoryDecrement.Status.FAILED
+                    else:
+                        row.next_attempt_at = now + _retry_delay(row.attempts)
+            else:
+                run.run.updated += len(batch)
+                now = timezone.now()
+                for row in batch:
+                    row.attempts += 1
+                    row.status = InventoryDecrement.Status.SENT
+                    row.sent_at = now
+                    row.last_error = ""
+                sent_variation_ids.extend(adj["square_variation_id"] for adj in adjustments)
+
+            with run.phase("write"):
+                InventoryDecrement.objects.bulk_update(
+                    batch, ["attempts", "status", "next_attempt_at", "last_error", "sent_at"]
+                )
+
+    # Square's counts don't include decrements still waiting here; leave those
+    # variations to their own drain rather than undo the local decrement.
+    still_pending = {
+        adj["square_variation_id"]
+        for adjustments in InventoryDecrement.objects.filter(
+            status=InventoryDecrement.Status.PENDING
+        ).values_list("adjustments", flat=True)
+        for adj in adjustments
+    }
+    refresh_ids = [vid for vid in sent_variation_ids if vid not in still_pending]
+    if refresh_ids:
+        try:
+            refresh_inventory_for_variations(refresh_ids)
+        except Exception:
+            # The scheduled inventory sync catches up; the decrements are already sent.
+            logger.warning("Inventory refresh after outbox drain failed", exc_info=True)
+
+    return sum(len(batch) for batch in batches.values())
@@ -0,0 +1,27 @@
+from rest_framework import serializers
+
+from .models import SyncRun
+
+
+class SyncRunSerializer(serializers.ModelSerializer):
+    duration_seconds = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = SyncRun
+        fields = [
+            "id",
+            "kind",
+            "status",
+            "started_at",
+            "finished_at",
+            "duration_seconds",
+            "fetch_seconds",
+            "transform_seconds",
+            "write_seconds",
+            "api_calls",
+            "created",
+            "updated",
+            "deactivated",
+            "error",
+        ]
+        read_only_fields = fields
@@ -1,15 +1,49 @@
-from typing import Dict, List
+import hashlib
+import json
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
 
+from django.conf import settings
 from django.db import transaction
+from django.db.models import BooleanField, Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.text import slugify
 
 from orders.models import Order
-from products.models import Product
+from products.models import Product, ProductStock
 from .api import (
-    batch_change_inventory_for_sale,
-    batch_retrieve_inventory_counts,
-    list_catalog_items,
+    batch_retrieve_catalog_objects,
+    batch_retrieve_location_counts,
+    inventory_location_ids,
+    iter_catalog_pages,
+    search_catalog_changes,
+    search_item_ids_by_category,
 )
+from .images import mirror_images, mirrored_image_urls
+from .journal import SyncRecorder, record_sync_run
+from .locks import single_flight
+from .mirror import MIRROR_BATCH_SIZE, mark_items_deleted_except, store_catalog_objects
+from .models import InventoryDecrement, SquareCatalogObject, SyncCheckpoint, SyncJob, SyncRun
+
+SYNC_BATCH_SIZE = 500
+# Upper bound on image/category ids remembered during a full sync.
+CATALOG_LOOKUP_SIZE = 5000
+SYNC_FIELDS_WITHOUT_QTY = (
+    "name",
+    "price_cents",
+    "square_item_id",
+    "image_url",
+    "main_image_url",
+    "description",
+    "category",
+    "is_active",
+    "square_sync_hash",
+)
+SYNC_FIELDS = SYNC_FIELDS_WITHOUT_QTY + ("square_quantity", "square_stock_tracked")
+INVENTORY_ROW_FIELDS = ("id", "square_variation_id", "square_quantity", "is_active", "square_stock_tracked")
 
 
 def _slug_for_variation(name: str, variation_id: str) -> str:
@@ -23,54 +57,126 @@ def _slug_for_variation(name: str, variation_id: str) -> str:
     return slug[:50]
 
 
-def sync_products_from_square() -> None:
-    """
-    Pull CatalogItem + CatalogImage objects from Square and sync them
-    into our Product table.
-
-    Rules:
-    - Each ITEM_VARIATION becomes one Product.
-    - Product.name = item name + variation name in parentheses if variation has a name.
-    - Product.price_cents = price_money.amount (integer, in cents).
-    - Product.image_url = primary image URL from ITEM.image_ids[0] -> IMAGE.image_data.url
-    - Product.description = item's description from Square.
-    - Product.category = category name from Square (requires CATEGORY objects).
-    - Product.square_quantity/is_active are refreshed from Square Inventory when available.
-    - Product.square_item_id, Product.square_variation_id are set from Square ids.
-    - Existing Products matched by square_variation_id are updated.
-    - New variations are inserted as new Products.
-    - Products that have square_variation_id set but no longer exist in Square
-      are marked is_active=False (soft deactivation).
-    """
-    objects = list_catalog_items()
-    if not objects:
-        return
-
-    # Build image_id -> url map from IMAGE objects
+def _lookup_maps(objects: List[dict]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Build image_id -> url and category_id -> name maps from IMAGE/CATEGORY objects."""
     image_map: Dict[str, str] = {}
-    for obj in objects:
-        if obj.get("type") != "IMAGE":
-            continue
-        image_data = obj.get("image_data") or {}
-        url = image_data.get("url")
-        if url:
-            image_map[obj["id"]] = url
-
-    # Build category_id -> name map from CATEGORY objects
     category_map: Dict[str, str] = {}
     for obj in objects:
-        if obj.get("type") != "CATEGORY":
+        if obj.get("is_deleted"):
             continue
-        category_data = obj.get("category_data") or {}
-        name = (category_data.get("name") or "").strip()
-        if name:
-            category_map[obj["id"]] = name
+        if obj.get("type") == "IMAGE":
+            image_data = obj.get("image_data") or {}
+            url = image_data.get("url")
+            if url:
+                image_map[obj["id"]] = url
+        elif obj.get("type") == "CATEGORY":
+            category_data = obj.get("category_data") or {}
+            name = (category_data.get("name") or "").strip()
+            if name:
+                category_map[obj["id"]] = name
+    return image_map, category_map
+
+
+def _category_id_for_item(item_data: dict) -> str:
+    # Square now returns categories as a list under item_data["categories"].
+    # Fall back to legacy item_data["category_id"] and reporting_category if present.
+    category_id = item_data.get("category_id") or ""
+    if not category_id:
+        categories = item_data.get("categories") or []
+        if categories:
+            category_id = categories[0].get("id") or ""
+    if not category_id:
+        reporting_category = item_data.get("reporting_category") or {}
+        category_id = reporting_category.get("id") or ""
+    return category_id
+
+
+def _lookup_ids_for_items(items: List[dict]) -> Set[str]:
+    """The primary IMAGE id and CATEGORY id each ITEM references."""
+    wanted: Set[str] = set()
+    for obj in items:
+        item_data = obj.get("item_data") or {}
+        image_ids = item_data.get("image_ids") or []
+        if image_ids:
+            wanted.add(image_ids[0])
+        category_id = _category_id_for_item(item_data)
+        if category_id:
+            wanted.add(category_id)
+    return wanted
+
+
+class _CatalogLookup:
+    """
+    Bounded LRU of IMAGE id -> url and CATEGORY id -> name used while paging
+    the catalog. Ids an item references that are not cached are fetched with
+    one batch-retrieve per batch of items; ids Square does not know are cached
+    as "" so they are not requested again. The raw objects fetched are kept
+    until ``take_fetched()`` so the caller can mirror them.
+    """
+
+    def __init__(self, maxsize: int = CATALOG_LOOKUP_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._fetched: List[dict] = []
 
+    def _remember(self, object_id: str, value: str) -> None:
+        self._entries[object_id] = value
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def resolve(self, items: List[dict]) -> Dict[str, str]:
+        """Return an id -> url/name map covering every image and category in ``items``."""
+        wanted = _lookup_ids_for_items(items)
+
+        resolved: Dict[str, str] = {}
+        for object_id in wanted & self._entries.keys():
+            self._entries.move_to_end(object_id)
+            resolved[object_id] = self._entries[object_id]
+
+        missing = sorted(wanted - resolved.keys())
+        if missing:
+            fetched = batch_retrieve_catalog_objects(missing)
+            self._fetched.extend(fetched)
+            image_map, category_map = _lookup_maps(fetched)
+            for object_id in missing:
+                resolved[object_id] = image_map.get(object_id) or category_map.get(object_id, "")
+                self._remember(object_id, resolved[object_id])
+
+        return resolved
+
+    def take_fetched(self) -> List[dict]:
+        """Return, and forget, the raw objects fetched since the last call."""
+        fetched, self._fetched = self._fetched, []
+        return fetched
+
+
+def _mirror_primary_images(objects: List[dict], image_map: Dict[str, str]) -> Dict[str, str]:
+    """
+    With SQUARE_MIRROR_IMAGES on, swap the Square URL of each item's primary
+    image in ``image_map`` for our mirrored copy (see square_sync.images).
+    """
+    if not settings.SQUARE_MIRROR_IMAGES:
+        return image_map
+    wanted: Dict[str, str] = {}
+    for obj in objects:
+        image_ids = (obj.get("item_data") or {}).get("image_ids") or []
+        if image_ids and image_map.get(image_ids[0]):
+            wanted[image_ids[0]] = image_map[image_ids[0]]
+    if not wanted:
+        return image_map
+    return {**image_map, **mirror_images(wanted)}
+
+
+def _variation_meta_for_items(
+    objects: List[dict],
+    image_map: Dict[str, str],
+    category_map: Dict[str, str],
+) -> Dict[str, dict]:
+    """Build meta for each ITEM_VARIATION nested in the (non-deleted) ITEM objects."""
     variation_meta: Dict[str, dict] = {}
 
-    # Build meta for each variation (ITEM_VARIATION)
     for obj in objects:
-        if obj.get("type") != "ITEM":
+        if obj.get("type") != "ITEM" or obj.get("is_deleted"):
             continue
 
         item_id = obj["id"]
@@ -78,24 +184,13 @@ def sync_products_from_square() -> None:
         item_name = (item_data.get("name") or "").strip()
         description = (item_data.get("description") or "").strip()
 
-        # Square now returns categories as a list under item_data["categories"].
-        # Fall back to legacy item_data["category_id"] and reporting_category if present.
-        category_id = item_data.get("category_id") or ""
-        if not category_id:
-            categories = item_data.get("categories") or []
-            if categories:
-                category_id = categories[0].get("id") or ""
-        if not category_id:
-            reporting_category = item_data.get("reporting_category") or {}
-            category_id = reporting_category.get("id") or ""
-
-        category_name = category_map.get(category_id, "")
+        category_name = category_map.get(_category_id_for_item(item_data), "")
         image_ids = item_data.get("image_ids") or []
         primary_image_url = image_map.get(image_ids[0]) if image_ids else ""
 
         for variation in item_data.get("variations", []) or []:
             v_id = variation.get("id")
-            if not v_id:
+            if not v_id or variation.get("is_deleted"):
                 continue
 
             v_data = variation.get("item_variation_data", {}) or {}
@@ -119,96 +214,722 @@ def sync_products_from_square() -> None:
                 "category": category_name,
             }
 
-    variation_ids = list(variation_meta.keys())
-    if not variation_ids:
-        return
+    return variation_meta
 
-    # Fetch inventory counts so new/updated products include current stock levels
-    counts: Dict[str, int] = batch_retrieve_inventory_counts(variation_ids)
 
-    with transaction.atomic():
-        existing = {
-            p.square_variation_id: p
-            for p in Product.objects.filter(square_variation_id__in=variation_ids)
-        }
+def _content_hash(values: dict) -> str:
+    encoded = json.dumps(values, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha256(encoded).hexdigest()
 
-        seen_ids: set[str] = set()
 
-        for v_id, meta in variation_meta.items():
-            seen_ids.add(v_id)
-            qty = counts.get(v_id) if counts else None
-
-            defaults = {
-                "name": meta["name"],
-                "price_cents": meta["price_cents"],
-                "square_item_id": meta["item_id"],
-                "image_url": meta.get("image_url", ""),
-                "main_image_url": meta.get("main_image_url", ""),
-                "description": meta.get("description", ""),
-                "category": meta.get("category", ""),
-            }
+def _upsert_variations(
+    variation_meta: Dict[str, dict], counts: Dict[str, int], *, force: bool = False
+) -> Tuple[int, int]:
+    """
+    Create or update one Product per variation. Call inside transaction.atomic().
 
-            if qty is not None:
-                defaults["square_quantity"] = qty
-                defaults["is_active"] = qty > 0
-            elif hasattr(Product, "is_active"):
-                defaults["is_active"] = True
-
-            product = existing.get(v_id)
-            if product:
-                for field, value in defaults.items():
-                    setattr(product, field, value)
-                product.save()
-            else:
-                Product.objects.create(
+    Catalog fields are hashed and compared with Product.square_sync_hash, and the
+    inventory fields with the row's current values, so unchanged rows are not
+    written at all (unless ``force``). Changed and new rows go out through
+    bulk_update / bulk_create in SYNC_BATCH_SIZE batches. Returns (created, updated).
+    """
+    existing = {
+        p.square_variation_id: p
+        for p in Product.objects.filter(square_variation_id__in=variation_meta.keys()).only(
+            "id",
+            "square_variation_id",
+            "square_sync_hash",
+            "square_quantity",
+            "is_active",
+            "square_stock_tracked",
+        )
+    }
+
+    to_create: List[Product] = []
+    to_update: List[Product] = []
+    for v_id, meta in variation_meta.items():
+        qty = counts.get(v_id) if counts else None
+
+        defaults = {
+            "name": meta["name"],
+            "price_cents": meta["price_cents"],
+            "square_item_id": meta["item_id"],
+            "image_url": meta.get("image_url", ""),
+            "main_image_url": meta.get("main_image_url", ""),
+            "description": meta.get("description", ""),
+            "category": meta.get("category", ""),
+        }
+        digest = _content_hash(defaults)
+
+        if qty is not None:
+            defaults["square_quantity"] = qty
+            defaults["is_active"] = qty > 0
+            defaults["square_stock_tracked"] = True
+        elif hasattr(Product, "is_active"):
+            defaults["is_active"] = True
+
+        product = existing.get(v_id)
+        if product:
+            unchanged = (
+                product.square_sync_hash == digest
+                and product.is_active == defaults["is_active"]
+                and product.square_quantity == defaults.get("square_quantity", product.square_quantity)
+                and product.square_stock_tracked
+                == defaults.get("square_stock_tracked", product.square_stock_tracked)
+            )
+            if unchanged and not force:
+                continue
+            for field, value in defaults.items():
+                setattr(product, field, value)
+            product.square_sync_hash = digest
+            to_update.append(product)
+        else:
+            to_create.append(
+                Product(
                     slug=_slug_for_variation(meta["name"], v_id),
                     square_variation_id=v_id,
+                    square_sync_hash=digest,
                     **defaults,
                 )
+            )
+
+    if to_create:
+        Product.objects.bulk_create(to_create, batch_size=SYNC_BATCH_SIZE)
+    # Rows without inventory data skip the inventory fields, so group by field set.
+    by_fields: Dict[Tuple[str, ...], List[Product]] = {}
+    for product in to_update:
+        fields = SYNC_FIELDS if product.square_variation_id in counts else SYNC_FIELDS_WITHOUT_QTY
+        by_fields.setdefault(fields, []).append(product)
+    for fields, products in by_fields.items():
+        Product.objects.bulk_update(products, list(fields), batch_size=SYNC_BATCH_SIZE)
+
+    return len(to_create), len(to_update)
+
+
+def _deactivate_missing_variations(variation_ids: Set[str]) -> int:
+    """Soft-deactivate Square products whose variation is not in ``variation_ids``."""
+    return (
+        Product.objects.exclude(square_variation_id="")
+        .exclude(square_variation_id__in=variation_ids)
+        .filter(is_active=True)
+        .update(is_active=False)
+    )
+
+
+def _save_catalog_checkpoint(latest_time: str) -> None:
+    SyncCheckpoint.objects.update_or_create(
+        key=SyncCheckpoint.CATALOG, defaults={"latest_time": latest_time}
+    )
+
+
+def _sync_item_batch(items: List[dict], lookup: _CatalogLookup, run: SyncRecorder) -> Set[str]:
+    """Upsert one batch of ITEM objects in its own transaction; return the variation ids seen."""
+    with run.phase("fetch"):
+        resolved = _mirror_primary_images(items, lookup.resolve(items))
+    with run.phase("transform"):
+        variation_meta = _variation_meta_for_items(items, resolved, resolved)
+    if not variation_meta:
+        return set()
+
+    # Fetch inventory counts so new/updated products include current stock levels
+    with run.phase("fetch"):
+        counted_at = timezone.now()
+        location_counts = batch_retrieve_location_counts(list(variation_meta.keys()))
+    with run.phase("write"), transaction.atomic():
+        created, updated = _upsert_variations(variation_meta, _stock_totals(location_counts))
+        _store_location_stock(location_counts, counted_at=counted_at)
+        store_catalog_objects(items + lookup.take_fetched())
+    run.run.created += created
+    run.run.updated += updated
+    return set(variation_meta.keys())
+
+
+def sync_products_from_square(job: Optional[SyncJob] = None, *, wait: bool = False) -> bool:
+    """
+    Pull CatalogItem objects from Square, page by page, and sync them
+    into our Product table.
 
-        # Deactivate products that disappeared from Square
-        if hasattr(Product, "is_active"):
+    Rules:
+    - Each ITEM_VARIATION becomes one Product.
+    - Product.name = item name + variation name in parentheses if variation has a name.
+    - Product.price_cents = price_money.amount (integer, in cents).
+    - Product.image_url = primary image URL from ITEM.image_ids[0] -> IMAGE.image_data.url
+      (our mirrored copy of that image when SQUARE_MIRROR_IMAGES is on)
+    - Product.description = item's description from Square.
+    - Product.category = category name from Square (CATEGORY looked up by id).
+    - Product.square_quantity/is_active are refreshed from Square Inventory when available.
+    - Product.square_item_id, Product.square_variation_id are set from Square ids.
+    - Existing Products matched by square_variation_id are updated.
+    - New variations are inserted as new Products.
+    - Products that have square_variation_id set but no longer exist in Square
+      are marked is_active=False (soft deactivation).
+
+    Pages are buffered only until they hold SYNC_BATCH_SIZE variations, then
+    upserted and dropped, so memory stays flat as the catalog grows. Only the
+    set of variation ids seen is kept for the final deactivation step, which
+    (like the checkpoint) is skipped if any page fails.
+
+    A successful run also resets the catalog checkpoint used by
+    sync_catalog_changes_from_square() to the time the listing started.
+    Each run is journalled as a SyncRun (linked to ``job`` when one is given),
+    with counters saved after every batch.
+
+    Runs under the cross-process ``single_flight`` guard: if another sync holds
+    it, this returns False without syncing, after waiting for that sync to
+    finish when ``wait`` is True. Returns True when this call did the sync.
+    """
+    with single_flight(wait=wait) as acquired:
+        if acquired:
+            _sync_all_products(job)
+    return acquired
+
+
+def _sync_all_products(job: Optional[SyncJob]) -> None:
+    with record_sync_run(SyncRun.Kind.PRODUCTS, job=job) as run:
+        # Back off a minute for clock skew; replaying a few changes is harmless.
+        started_at = timezone.now() - timedelta(minutes=1)
+        lookup = _CatalogLookup()
+        item_ids: Set[str] = set()
+        variation_ids: Set[str] = set()
+        batch: List[dict] = []
+        buffered = 0
+
+        for page in run.timed("fetch", iter_catalog_pages()):
+            for obj in page:
+                if obj.get("type") != "ITEM" or obj.get("is_deleted"):
+                    continue
+                batch.append(obj)
+                item_ids.add(obj["id"])
+                buffered += len((obj.get("item_data") or {}).get("variations") or [])
+            if buffered >= SYNC_BATCH_SIZE:
+                variation_ids |= _sync_item_batch(batch, lookup, run)
+                run.save_progress()
+                batch, buffered = [], 0
+        if batch:
+            variation_ids |= _sync_item_batch(batch, lookup, run)
+
+        if not variation_ids:
+            return
+
+        with run.phase("write"), transaction.atomic():
+            run.run.deactivated = _deactivate_missing_variations(variation_ids)
+            mark_items_deleted_except(item_ids)
+            _save_catalog_checkpoint(started_at.strftime("%Y-%m-%dT%H:%M:%SZ"))
+
+
+def sync_catalog_changes_from_square(*, wait: bool = False) -> dict:
+    """
+    Incremental catalog sync driven by SearchCatalogObjects ``begin_time``.
+
+    Only objects changed since the stored checkpoint are fetched:
+    - changed ITEMs, items owning changed ITEM_VARIATIONs and items in renamed
+      CATEGORYs are re-read with one batch-retrieve and upserted;
+    - deleted ITEMs / ITEM_VARIATIONs, and variations dropped from a changed
+      item, are soft-deactivated.
+    Image edits are picked up when they change an item's image_ids. With no
+    checkpoint yet, this falls back to a full sync_products_from_square().
+
+    Returns a summary dict with the number of changed objects and items refreshed;
+    ``mode`` is "skipped" when another sync held the ``single_flight`` guard.
+    """
+    with single_flight(wait=wait) as acquired:
+        if acquired:
+            return _sync_catalog_changes()
+    return {"mode": "skipped", "changed_objects": 0, "items_refreshed": 0}
+
+
+def _sync_catalog_changes() -> dict:
+    checkpoint = SyncCheckpoint.objects.filter(key=SyncCheckpoint.CATALOG).first()
+    if not checkpoint or not checkpoint.latest_time:
+        _sync_all_products(None)
+        return {"mode": "full", "changed_objects": 0, "items_refreshed": 0}
+
+    with record_sync_run(SyncRun.Kind.CATALOG_CHANGES) as run:
+        with run.phase("fetch"):
+            changes = search_catalog_changes(checkpoint.latest_time)
+        changed = changes["objects"]
+
+        deleted_item_ids: Set[str] = set()
+        deleted_variation_ids: Set[str] = set()
+        item_ids: Set[str] = set()
+        category_ids: Set[str] = set()
+
+        with run.phase("transform"):
+            for obj in changed:
+                obj_type = obj.get("type")
+                if obj_type == "ITEM":
+                    (deleted_item_ids if obj.get("is_deleted") else item_ids).add(obj["id"])
+                elif obj_type == "ITEM_VARIATION":
+                    if obj.get("is_deleted"):
+                        deleted_variation_ids.add(obj["id"])
+                    else:
+                        parent_id = (obj.get("item_variation_data") or {}).get("item_id")
+                        if parent_id:
+                            item_ids.add(parent_id)
+                elif obj_type == "CATEGORY" and not obj.get("is_deleted"):
+                    category_ids.add(obj["id"])
+
+        with run.phase("fetch"):
+            if category_ids:
+                item_ids.update(search_item_ids_by_category(sorted(category_ids)))
+            item_ids -= deleted_item_ids
+            objects = batch_retrieve_catalog_objects(sorted(item_ids)) if item_ids else []
+
+        with run.phase("transform"):
+            image_map, category_map = _lookup_maps(objects + changes["related_objects"])
+        with run.phase("fetch"):
+            image_map = _mirror_primary_images(objects, image_map)
+        with run.phase("transform"):
+            variation_meta = _variation_meta_for_items(objects, image_map, category_map)
+            refreshed_item_ids = {
+                obj["id"] for obj in objects if obj.get("type") == "ITEM" and not obj.get("is_deleted")
+            }
+
+        with run.phase("fetch"):
+            counted_at = timezone.now()
+            location_counts = (
+                batch_retrieve_location_counts(list(variation_meta.keys())) if variation_meta else {}
+            )
+
+        with run.phase("write"), transaction.atomic():
+            if variation_meta:
+                run.run.created, run.run.updated = _upsert_variations(
+                    variation_meta, _stock_totals(location_counts)
+                )
+                _store_location_stock(location_counts, counted_at=counted_at)
+
+            stale = Product.objects.none()
+            if deleted_item_ids:
+                stale |= Product.objects.filter(square_item_id__in=deleted_item_ids)
+            if deleted_variation_ids:
+                stale |= Product.objects.filter(square_variation_id__in=deleted_variation_ids)
+            if refreshed_item_ids:
+                stale |= Product.objects.filter(square_item_id__in=refreshed_item_ids).exclude(
+                    square_variation_id__in=variation_meta.keys()
+                )
+            run.run.deactivated = stale.filter(is_active=True).update(is_active=False)
+            store_catalog_objects(changed + changes["related_objects"] + objects)
+
+            if changes["latest_time"]:
+                _save_catalog_checkpoint(changes["latest_time"])
+
+    return {
+        "mode": "incremental",
+        "changed_objects": len(changed),
+        "items_refreshed": len(refreshed_item_ids),
+    }
+
+
+def rederive_products_from_square_mirror(*, wait: bool = False, force: bool = False) -> dict:
+    """
+    Rebuild Square products from the SquareCatalogObject mirror, without
+    calling Square.
+
+    Runs the same mapping as the full sync over the mirrored ITEMs, batch by
+    batch, looking images and categories up in the mirror too. Stock comes
+    from the products' current square_quantity, and images use mirrors we
+    already hold (nothing is downloaded). Variations missing from the mirror
+    are deactivated, as in a full sync. Use it after changing the mapping to
+    re-apply it to the whole catalog cheaply. Rows whose mapped fields hash the
+    same as last time are skipped unless ``force``, which rewrites them all
+    (e.g. to undo hand edits).
+
+    Returns {"mode", "created", "updated", "deactivated"}; ``mode`` is
+    "skipped" when another sync held the ``single_flight`` guard.
+    """
+    with single_flight(wait=wait) as acquired:
+        if acquired:
+            return _rederive_products(force)
+    return {"mode": "skipped", "created": 0, "updated": 0, "deactivated": 0}
+
+
+def _rederive_item_batch(items: List[dict], run: SyncRecorder, force: bool) -> Set[str]:
+    with run.phase("fetch"):
+        lookups = SquareCatalogObject.objects.filter(
+            object_id__in=_lookup_ids_for_items(items)
+        ).values_list("data", flat=True)
+        image_map, category_map = _lookup_maps(list(lookups))
+        if settings.SQUARE_MIRROR_IMAGES:
+            image_map = mirrored_image_urls(image_map)
+    with run.phase("transform"):
+        variation_meta = _variation_meta_for_items(items, image_map, category_map)
+        if not variation_meta:
+            return set()
+        # Only stock Square counts is carried over; an untracked product's
+        # square_quantity is not a count and must not make it tracked.
+        counts = dict(
             Product.objects.filter(
-                square_variation_id__isnull=False
-            ).exclude(
-                square_variation_id__in=seen_ids
-            ).update(is_active=False)
+                square_variation_id__in=variation_meta.keys(), square_stock_tracked=True
+            ).values_list("square_variation_id", "square_quantity")
+        )
+    with run.phase("write"), transaction.atomic():
+        created, updated = _upsert_variations(variation_meta, counts, force=force)
+    run.run.created += created
+    run.run.updated += updated
+    return set(variation_meta.keys())
+
+
+def _rederive_products(force: bool) -> dict:
+    with record_sync_run(SyncRun.Kind.REDERIVE) as run:
+        items = (
+            SquareCatalogObject.objects.filter(type="ITEM", is_deleted=False)
+            .order_by("object_id")
+            .values_list("data", flat=True)
+        )
+        variation_ids: Set[str] = set()
+        batch: List[dict] = []
+        buffered = 0
+        for obj in run.timed("fetch", items.iterator(chunk_size=MIRROR_BATCH_SIZE)):
+            batch.append(obj)
+            buffered += len((obj.get("item_data") or {}).get("variations") or [])
+            if buffered >= SYNC_BATCH_SIZE:
+                variation_ids |= _rederive_item_batch(batch, run, force)
+                run.save_progress()
+                batch, buffered = [], 0
+        if batch:
+            variation_ids |= _rederive_item_batch(batch, run, force)
+
+        if variation_ids:
+            with run.phase("write"):
+                run.run.deactivated = _deactivate_missing_variations(variation_ids)
+
+    return {
+        "mode": "rederive",
+        "created": run.run.created,
+        "updated": run.run.updated,
+        "deactivated": run.run.deactivated,
+    }
+
+
+def _stock_totals(location_counts: Dict[str, Dict[str, int]]) -> Dict[str, int]:
+    return {vid: sum(by_location.values()) for vid, by_location in location_counts.items()}
+
+
+def _without_pending_decrements(
+    location_counts: Dict[str, Dict[str, int]]
+) -> Dict[str, Dict[str, int]]:
+    """
+    Take the sales still queued in the InventoryDecrement outbox off Square's
+    {variation_id: {location_id: quantity}} counts, clamped at zero. The local
+    stock already has them applied and Square's counts don't yet, so writing
+    the raw counts would put sold stock back on sale until the outbox drains.
+    """
+    pending: Counter = Counter()
+    for adjustments in InventoryDecrement.objects.filter(
+        status=InventoryDecrement.Status.PENDING
+    ).values_list("adjustments", flat=True):
+        for adj in adjustments:
+            pending[(adj["square_variation_id"], adj.get("location_id"))] += int(adj["quantity"])
+    if not pending:
+        return location_counts
+    return {
+        vid: {
+            location_id: max(quantity - pending[(vid, location_id)], 0)
+            for location_id, quantity in by_location.items()
+        }
+        for vid, by_location in location_counts.items()
+    }
 
 
-def sync_inventory_from_square() -> None:
+def _store_location_stock(
+    location_counts: Dict[str, Dict[str, int]],
+    product_ids: Optional[Dict[str, int]] = None,
+    counted_at: Union[datetime, Dict[Tuple[str, str], datetime], None] = None,
+) -> int:
+    """
+    Write {variation_id: {location_id: quantity}} to ProductStock: one row per
+    product and tracked location, locations missing from a variation's counts
+    being 0 (so the rows always add up to Product.square_quantity). Stored rows
+    are diffed first and only changed ones go out, in one upsert per batch.
+    ``product_ids`` maps variation ids to products when the caller has it.
+
+    ``counted_at`` is when Square calculated the counts: one time for a
+    whole sync fetch, stored on the rows it changes, or {(variation_id,
+    location_id): time} for webhook counts, where a newer time alone is
+    enough to write the row. Returns the number of rows written.
+    """
+    per_row = isinstance(counted_at, dict)
+    locations = inventory_location_ids()
+    if not location_counts or not locations:
+        return 0
+    if product_ids is None:
+        product_ids = dict(
+            Product.objects.filter(square_variation_id__in=location_counts.keys()).values_list(
+                "square_variation_id", "id"
+            )
+        )
+    wanted = {vid: product_ids[vid] for vid in location_counts if vid in product_ids}
+    stored = {
+        (product_id, location_id): (quantity, stored_at)
+        for product_id, location_id, quantity, stored_at in ProductStock.objects.filter(
+            product_id__in=wanted.values()
+        ).values_list("product_id", "location_id", "quantity", "counted_at")
+    }
+
+    rows: List[ProductStock] = []
+    for vid, product_id in wanted.items():
+        for location_id in locations:
+            quantity = location_counts[vid].get(location_id, 0)
+            stored_quantity, stored_at = stored.get((product_id, location_id), (None, None))
+            when = counted_at.get((vid, location_id)) if per_row else counted_at
+            newer = when is not None and (stored_at is None or when > stored_at)
+            if stored_quantity == quantity and not (per_row and newer):
+                continue
+            rows.append(
+                ProductStock(
+                    product_id=product_id,
+                    location_id=location_id,
+                    quantity=quantity,
+                    counted_at=when if newer else stored_at,
+                )
+            )
+
+    ProductStock.objects.bulk_create(
+        rows,
+        batch_size=SYNC_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["product", "location_id"],
+        update_fields=["quantity", "counted_at", "updated_at"],
+    )
+    return len(rows)
+
+
+def _apply_inventory_counts(
+    rows: Iterable[Tuple[int, str, int, bool, bool]], counts: Dict[str, int]
+) -> int:
+    """
+    Diff INVENTORY_ROW_FIELDS rows (id, square_variation_id, square_quantity,
+    is_active, square_stock_tracked) against Square counts and write only the
+    changed ones with bulk_update (one CASE UPDATE per batch). A variation
+    with a count is marked as tracked; ones Square returned no count for are
+    left alone.
+    """
+    changed: List[Product] = []
+    for pk, vid, current_qty, current_active, tracked in rows:
+        if vid not in counts:
+            continue
+        qty = counts[vid]
+        if current_qty == qty and current_active == (qty > 0) and tracked:
+            continue
+        changed.append(Product(id=pk, square_quantity=qty, is_active=qty > 0, square_stock_tracked=True))
+
+    if changed:
+        Product.objects.bulk_update(
+            changed,
+            ["square_quantity", "is_active", "square_stock_tracked"],
+            batch_size=SYNC_BATCH_SIZE,
+        )
+    return len(changed)
+
+
+def sync_inventory_from_square(job: Optional[SyncJob] = None, *, wait: bool = False) -> int:
     """
     For all Products that have a square_variation_id, pull current IN_STOCK quantities
-    from Square Inventory and update Product.square_quantity and is_active.
+    at every tracked location from Square Inventory and update ProductStock,
+    Product.square_quantity and is_active.
 
-    - square_quantity = Square's IN_STOCK quantity at SQUARE_LOCATION_ID
+    - ProductStock.quantity = Square's IN_STOCK quantity at that location, less
+      the sales still queued in the InventoryDecrement outbox
+    - square_quantity = the sum over tracked locations
     - is_active = (square_quantity > 0)
+
+    Only rows whose quantity or active flag actually changed are written.
+    Returns the number of rows changed (0 if another sync held the
+    ``single_flight`` guard). Each run is journalled as a SyncRun.
+    """
+    with single_flight(wait=wait) as acquired:
+        if acquired:
+            return _sync_all_inventory(job)
+    return 0
+
+
+def _sync_all_inventory(job: Optional[SyncJob]) -> int:
+    with record_sync_run(SyncRun.Kind.INVENTORY, job=job) as run:
+        with run.phase("transform"):
+            rows = list(
+                Product.objects.exclude(square_variation_id="")
+                .exclude(square_variation_id__isnull=True)
+                .values_list(*INVENTORY_ROW_FIELDS)
+            )
+        if not rows:
+            return 0
+
+        with run.phase("fetch"):
+            counted_at = timezone.now()
+            location_counts = batch_retrieve_location_counts([row[1] for row in rows])
+        if not location_counts:
+            return 0
+        with run.phase("write"), transaction.atomic():
+            location_counts = _without_pending_decrements(location_counts)
+            run.run.updated = _apply_inventory_counts(rows, _stock_totals(location_counts))
+            # Variations Square no longer returns counts for have stopped
+            # being tracked, so checkout stops holding their stock.
+            Product.objects.filter(
+                pk__in=[pk for pk, vid, *_, tracked in rows if tracked and vid not in location_counts]
+            ).update(square_stock_tracked=False)
+            _store_location_stock(
+                location_counts, {vid: pk for pk, vid, *_ in rows}, counted_at=counted_at
+            )
+    return run.run.updated
+
+
+def refresh_inventory_for_variations(variation_ids: List[str]) -> int:
     """
-    qs = Product.objects.exclude(square_variation_id="").exclude(square_variation_id__isnull=True)
-    variation_ids: List[str] = list(qs.values_list("square_variation_id", flat=True))
+    Refresh ProductStock and square_quantity/is_active for just the given
+    variations using one batch-retrieve call and bulk writes. Returns the
+    number of products changed.
+    """
+    variation_ids = [vid for vid in dict.fromkeys(variation_ids) if vid]
     if not variation_ids:
-        return
+        return 0
 
-    counts = batch_retrieve_inventory_counts(variation_ids)
+    counted_at = timezone.now()
+    location_counts = batch_retrieve_location_counts(variation_ids)
+    if not location_counts:
+        return 0
 
+    rows = list(
+        Product.objects.filter(square_variation_id__in=location_counts.keys()).values_list(
+            *INVENTORY_ROW_FIELDS
+        )
+    )
     with transaction.atomic():
-        for product in qs:
-            vid = product.square_variation_id
-            if not vid:
-                continue
-            if vid not in counts:
-                # If no count returned, skip or optionally set 0; here we skip
+        _store_location_stock(
+            location_counts, {vid: pk for pk, vid, *_ in rows}, counted_at=counted_at
+        )
+        return _apply_inventory_counts(rows, _stock_totals(location_counts))
+
+
+def apply_inventory_count_updates(inventory_counts: List[dict]) -> int:
+    """
+    Apply the absolute counts carried by an inventory.count.updated webhook.
+
+    Only IN_STOCK counts at tracked locations are used. A notification usually
+    covers one location, so each product's new total is summed from those
+    counts plus its stored ProductStock rows for the other locations.
+
+    Square may deliver notifications out of order, so a count whose
+    ``calculated_at`` is not newer than the stored row's ``counted_at`` is
+    skipped. Sales still queued in the outbox are taken off the counts, as
+    Square hasn't applied them yet. Returns the number of products changed.
+    """
+    locations = inventory_location_ids()
+    updates: Dict[str, Dict[str, int]] = {}
+    calculated: Dict[Tuple[str, str], datetime] = {}
+    for count in inventory_counts:
+        location_id = count.get("location_id")
+        if location_id not in locations or count.get("state") != "IN_STOCK":
+            continue
+        vid = count.get("catalog_object_id")
+        if not vid:
+            continue
+        try:
+            qty = int(count.get("quantity", "0"))
+        except (TypeError, ValueError):
+            qty = 0
+        try:
+            calculated_at = parse_datetime(count.get("calculated_at") or "")
+        except ValueError:
+            calculated_at = None
+        key = (vid, location_id)
+        if calculated_at is not None:
+            if key in calculated and calculated[key] >= calculated_at:
                 continue
+            calculated[key] = calculated_at
+        updates.setdefault(vid, {})[location_id] = qty
 
-            qty = counts[vid]
-            product.square_quantity = qty
-            product.is_active = qty > 0
-            product.save(update_fields=["square_quantity", "is_active"])
+    if not updates:
+        return 0
+    updates = _without_pending_decrements(updates)
 
+    rows = list(
+        Product.objects.filter(square_variation_id__in=updates.keys()).values_list(
+            *INVENTORY_ROW_FIELDS
+        )
+    )
+    product_ids = {vid: pk for pk, vid, *_ in rows}
+    vid_for_product = {pk: vid for vid, pk in product_ids.items()}
+    location_counts: Dict[str, Dict[str, int]] = {vid: {} for vid in product_ids}
+    for product_id, location_id, quantity, stored_at in ProductStock.objects.filter(
+        product_id__in=vid_for_product.keys(), location_id__in=locations
+    ).values_list("product_id", "location_id", "quantity", "counted_at"):
+        vid = vid_for_product[product_id]
+        location_counts[vid][location_id] = quantity
+        calculated_at = calculated.get((vid, location_id))
+        if stored_at is not None and calculated_at is not None and calculated_at <= stored_at:
+            updates[vid].pop(location_id, None)
+    for vid, by_location in location_counts.items():
+        by_location.update(updates[vid])
 
-def decrement_square_inventory_for_order(order: Order) -> None:
+    with transaction.atomic():
+        _store_location_stock(location_counts, product_ids, counted_at=calculated)
+        return _apply_inventory_counts(rows, _stock_totals(location_counts))
+
+
+def decrement_local_stock(quantities: Dict[int, int]) -> int:
+    """
+    Subtract {product_id: quantity} from Product.square_quantity in a single
+    UPDATE, clamped at zero, deactivating products that run out. Only products
+    whose stock Square counts (square_stock_tracked) are touched; the others
+    have no count to decrement and stay on sale:
+
+        UPDATE ... SET square_quantity = GREATEST(square_quantity - n, 0),
+                       is_active = CASE WHEN square_quantity <= n THEN false ELSE is_active END
+
+    Both columns are computed from the row's current values, so concurrent
+    callers never lose each other's decrements. Returns the rows updated.
+    """
+    quantities = {pk: qty for pk, qty in quantities.items() if qty > 0}
+    if not quantities:
+        return 0
+
+    sold = Case(
+        *(When(pk=pk, then=Value(qty)) for pk, qty in quantities.items()),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    return Product.objects.filter(pk__in=quantities.keys(), square_stock_tracked=True).update(
+        square_quantity=Greatest(F("square_quantity") - sold, Value(0)),
+        is_active=Case(
+            When(square_quantity__lte=sold, then=Value(False)),
+            default=F("is_active"),
+            output_field=BooleanField(),
+        ),
+    )
+
+
+def decrement_location_stock(location_id: str, quantities: Dict[int, int]) -> int:
+    """
+    Subtract {product_id: quantity} from the ProductStock rows at
+    ``location_id`` in one UPDATE, clamped at zero, so the per-location rows
+    keep matching the total decrement_local_stock() applied. Returns rows updated.
+    """
+    quantities = {pk: qty for pk, qty in quantities.items() if qty > 0}
+    if not quantities or not location_id:
+        return 0
+
+    sold = Case(
+        *(When(product_id=pk, then=Value(qty)) for pk, qty in quantities.items()),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    return ProductStock.objects.filter(
+        location_id=location_id, product_id__in=quantities.keys(), product__square_stock_tracked=True
+    ).update(
+        quantity=Greatest(F("quantity") - sold, Value(0))
+    )
+
+
+def decrement_square_inventory_for_order(order: Order) -> bool:
     """
-    When an order is successfully paid, decrement inventory in Square for each order item
-    that is linked to a Square variation, and update local Product.square_quantity best-effort.
+    When an order is successfully paid, queue an InventoryDecrement outbox row
+    for the order items linked to a Square variation and update the local
+    Product.square_quantity cache.
+
+    No Square call is made here: ``process_inventory_outbox`` sends the row
+    later. Call this in the same transaction as the order status change. The
+    row is keyed by ``order-{id}-sold``, so a redelivered payment event neither
+    queues nor applies the local decrement twice. Returns True if queued now.
     """
     adjustments: list[dict] = []
     products_to_update: Dict[int, int] = {}  # product_id -> total_quantity_sold
@@ -226,30 +947,24 @@ def decrement_square_inventory_for_order(order: Order) -> None:
             {
                 "square_variation_id": product.square_variation_id,
                 "quantity": qty,
+                "location_id": settings.SQUARE_LOCATION_ID,
             }
         )
         products_to_update[product.id] = products_to_update.get(product.id, 0) + qty
 
     if not adjustments:
-        return
+        return False
 
-    # Call Square Inventory API
-    idempotency_key = f"order-{order.id}-sold"
-    batch_change_inventory_for_sale(adjustments, idempotency_key=idempotency_key)
-
-    # Best-effort local cache update
-    from products.models import Product  # local import to avoid circular deps
-
-    for product_id, qty in products_to_update.items():
-        try:
-            product = Product.objects.get(id=product_id)
-        except Product.DoesNotExist:
-            continue
-
-        new_qty = max(0, (product.square_quantity or 0) - qty)
-        product.square_quantity = new_qty
-        if new_qty <= 0:
-            product.is_active = False
-            product.save(update_fields=["square_quantity", "is_active"])
-        else:
-            product.save(update_fields=["square_quantity"])
+    with transaction.atomic():
+        _, created = InventoryDecrement.objects.get_or_create(
+            idempotency_key=f"order-{order.id}-sold",
+            defaults={"order": order, "adjustments": adjustments},
+        )
+        if not created:
+            return False
+
+        # One UPDATE for every product in the order, computed from the row's
+        # current value so concurrent orders can't overwrite each other.
+        decrement_local_stock(products_to_update)
+        decrement_location_stock(settings.SQUARE_LOCATION_ID, products_to_update)
+    return True
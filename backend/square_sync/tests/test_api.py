@@ -0,0 +1,89 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import SimpleTestCase, override_settings
+
+from square_sync import api
+
+
+class _SquareHandler(BaseHTTPRequestHandler):
+    """Answers inventory batch-retrieve; the first ``throttle`` requests get a 429."""
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.requests += 1
+            throttled = server.requests <= server.throttle
+        if throttled:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        counts = [
+            {
+                "catalog_object_id": vid,
+                "location_id": "LOC1",
+                "state": "IN_STOCK",
+                "quantity": str(len(vid)),
+            }
+            for vid in body["catalog_object_ids"]
+        ]
+        payload = json.dumps({"counts": counts}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class SquareClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _SquareHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = 0
+        self.server.throttle = 0
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        host, port = self.server.server_address
+        override = override_settings(
+            SQUARE_BASE_URL=f"http://{host}:{port}/v2",
+            SQUARE_ACCESS_TOKEN="token",
+            SQUARE_LOCATION_ID="LOC1",
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        api.reset_request_metrics()
+
+    def test_session_is_shared(self):
+        self.assertIs(api.get_session(), api.get_session())
+
+    def test_inventory_chunks_are_fetched_and_merged(self):
+        variation_ids = [f"VAR{i}" for i in range(250)]
+
+        counts = api.batch_retrieve_inventory_counts(variation_ids)
+
+        self.assertEqual(len(counts), 250)
+        self.assertEqual(counts["VAR7"], 4)
+        self.assertEqual(self.server.requests, 3)
+        stats = api.get_request_metrics()["POST /inventory/counts/batch-retrieve"]
+        self.assertEqual(stats["calls"], 3)
+        self.assertEqual(stats["errors"], 0)
+
+    def test_rate_limited_requests_are_retried(self):
+        self.server.throttle = 1
+
+        counts = api.batch_retrieve_inventory_counts(["VAR1"])
+
+        self.assertEqual(counts, {"VAR1": 4})
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(api.get_request_metrics()["POST /inventory/counts/batch-retrieve"]["calls"], 1)
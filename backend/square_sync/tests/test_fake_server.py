@@ -0,0 +1,56 @@
+import io
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from products.models import Product
+from square_sync.api import batch_change_inventory_for_sale
+from square_sync.fake_server import FakeSquareCatalog, FakeSquareServer
+from square_sync.services import sync_inventory_from_square, sync_products_from_square
+
+
+class FakeSquareServerSyncTests(TestCase):
+    def setUp(self):
+        self.catalog = FakeSquareCatalog(variations=250)
+        self.server = FakeSquareServer(self.catalog).__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        override = override_settings(**self.server.settings())
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_full_sync_pages_through_the_catalog(self):
+        sync_products_from_square()
+
+        self.assertEqual(Product.objects.count(), 250)
+        # 125 items -> two ListCatalog pages.
+        self.assertEqual(self.server.requests["GET /v2/catalog/list"], 2)
+        product = Product.objects.get(square_variation_id="VAR_3_1")
+        self.assertEqual(product.name, "Cut 3 (2 lb)")
+        self.assertEqual(product.category, "Category 3")
+        self.assertEqual(product.square_quantity, 22 % 20)
+
+    def test_inventory_changes_round_trip(self):
+        sync_products_from_square()
+
+        batch_change_inventory_for_sale(
+            [{"square_variation_id": "VAR_10_0", "quantity": 3}], idempotency_key="order-1-sold"
+        )
+        batch_change_inventory_for_sale(
+            [{"square_variation_id": "VAR_10_0", "quantity": 3}], idempotency_key="order-1-sold"
+        )
+        changed = sync_inventory_from_square()
+
+        self.assertEqual(changed, 1)
+        self.assertEqual(Product.objects.get(square_variation_id="VAR_10_0").square_quantity, 70 % 20 - 3)
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_reports_each_step_and_keeps_no_rows(self):
+        out = io.StringIO()
+
+        call_command("benchmark_square_sync", "--sizes", "20", stdout=out)
+
+        output = out.getvalue()
+        self.assertIn("products (initial)", output)
+        self.assertIn("inventory (10% changed)", output)
+        self.assertFalse(Product.objects.exists())
@@ -0,0 +1,87 @@
+import hashlib
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.storage import storages
+from django.test import TestCase, override_settings
+
+from products.models import Product
+from square_sync.fake_server import FakeSquareCatalog, FakeSquareServer
+from square_sync.images import mirror_images
+from square_sync.models import MirroredImage
+from square_sync.services import sync_products_from_square
+
+LOCAL_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+def _fake_download(url):
+    return f"pixels of {url}".encode()
+
+
+class MirrorImagesTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(STORAGES=LOCAL_STORAGES, MEDIA_ROOT=media_root, MEDIA_URL="/media/")
+        override.enable()
+        self.addCleanup(override.disable)
+        patcher = mock.patch("square_sync.images.download_catalog_image", side_effect=_fake_download)
+        self.download = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stores_images_under_id_and_checksum(self):
+        urls = mirror_images({"IMG_1": "https://images.example.com/a/brisket.PNG"})
+
+        checksum = hashlib.sha256(b"pixels of https://images.example.com/a/brisket.PNG").hexdigest()
+        self.assertEqual(urls, {"IMG_1": f"/media/square-images/IMG_1/{checksum[:16]}.png"})
+        row = MirroredImage.objects.get(image_id="IMG_1")
+        self.assertEqual(row.checksum, checksum)
+        with storages["default"].open(row.name) as stored:
+            self.assertEqual(stored.read(), b"pixels of https://images.example.com/a/brisket.PNG")
+
+    def test_unchanged_source_url_is_not_downloaded_again(self):
+        first = mirror_images({"IMG_1": "https://images.example.com/1.jpg"})
+        self.download.reset_mock()
+
+        second = mirror_images({"IMG_1": "https://images.example.com/1.jpg"})
+
+        self.assertEqual(first, second)
+        self.download.assert_not_called()
+
+    def test_new_url_with_new_content_gets_a_new_name(self):
+        first = mirror_images({"IMG_1": "https://images.example.com/1.jpg"})["IMG_1"]
+        second = mirror_images({"IMG_1": "https://images.example.com/1-v2.jpg"})["IMG_1"]
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(MirroredImage.objects.get().url, second)
+
+    def test_failed_download_falls_back_without_failing(self):
+        mirrored = mirror_images({"IMG_1": "https://images.example.com/1.jpg"})["IMG_1"]
+        self.download.side_effect = OSError("image host down")
+
+        urls = mirror_images(
+            {"IMG_1": "https://images.example.com/1-v2.jpg", "IMG_2": "https://images.example.com/2.jpg"}
+        )
+
+        self.assertEqual(urls, {"IMG_1": mirrored, "IMG_2": "https://images.example.com/2.jpg"})
+        self.assertEqual(MirroredImage.objects.count(), 1)
+
+    def test_product_sync_points_products_at_the_mirror(self):
+        catalog = FakeSquareCatalog(variations=20, images=3)
+        with FakeSquareServer(catalog) as server, override_settings(
+            SQUARE_MIRROR_IMAGES=True, **server.settings()
+        ):
+            sync_products_from_square()
+            self.assertEqual(self.download.call_count, 3)
+            self.download.reset_mock()
+            sync_products_from_square()
+
+        self.download.assert_not_called()
+        self.assertEqual(MirroredImage.objects.count(), 3)
+        mirrored_urls = set(MirroredImage.objects.values_list("url", flat=True))
+        product_urls = set(Product.objects.values_list("image_url", flat=True))
+        self.assertEqual(product_urls, mirrored_urls)
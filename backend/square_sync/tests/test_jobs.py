@@ -0,0 +1,105 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from square_sync.jobs import enqueue_sync_job, process_sync_jobs
+from square_sync.locks import SyncLockTimeout
+from square_sync.models import SyncJob, SyncRun
+
+
+class SyncJobQueueTests(TestCase):
+    def test_duplicate_requests_collapse_into_the_in_flight_job(self):
+        first, created = enqueue_sync_job()
+        second, created_again = enqueue_sync_job()
+
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(SyncJob.objects.count(), 1)
+
+    @mock.patch("square_sync.jobs.sync_inventory_from_square")
+    @mock.patch("square_sync.jobs.sync_products_from_square")
+    def test_worker_runs_catalog_then_inventory(self, mock_products, mock_inventory):
+        job, _ = enqueue_sync_job()
+
+        self.assertEqual(process_sync_jobs(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, SyncJob.Status.SUCCEEDED)
+        self.assertFalse(job.in_flight)
+        mock_products.assert_called_once_with(job=job, wait=True)
+        mock_inventory.assert_called_once_with(job=job, wait=True)
+        # A new request after completion starts a fresh job.
+        self.assertTrue(enqueue_sync_job()[1])
+
+    @mock.patch("square_sync.jobs.sync_inventory_from_square")
+    @mock.patch("square_sync.jobs.sync_products_from_square", side_effect=RuntimeError("Square down"))
+    def test_failed_job_records_error_and_frees_the_slot(self, _products, mock_inventory):
+        job, _ = enqueue_sync_job()
+
+        process_sync_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, SyncJob.Status.FAILED)
+        self.assertEqual(job.stage, SyncJob.Stage.CATALOG)
+        self.assertIn("Square down", job.error)
+        mock_inventory.assert_not_called()
+        self.assertFalse(job.in_flight)
+
+
+    @mock.patch("square_sync.jobs.sync_inventory_from_square")
+    @mock.patch("square_sync.jobs.sync_products_from_square")
+    def test_job_fails_when_a_step_cannot_get_the_sync_lock(self, mock_products, mock_inventory):
+        mock_inventory.side_effect = SyncLockTimeout("Gave up waiting for square-sync after 900s")
+        job, _ = enqueue_sync_job()
+
+        process_sync_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, SyncJob.Status.FAILED)
+        self.assertEqual(job.stage, SyncJob.Stage.INVENTORY)
+        self.assertIn("Gave up waiting", job.error)
+
+
+@override_settings(
+    STORAGES={
+        **settings.STORAGES,
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    }
+)
+class ProductAdminSyncButtonTests(TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "x")
+        self.client.force_login(self.admin)
+
+    @mock.patch("square_sync.jobs.sync_products_from_square")
+    def test_button_queues_a_job_without_syncing(self, mock_products):
+        response = self.client.get(reverse("admin:products_product_sync_square"))
+
+        job = SyncJob.objects.get()
+        self.assertRedirects(
+            response, reverse("admin:products_product_sync_square_job", args=[job.pk])
+        )
+        mock_products.assert_not_called()
+        self.assertEqual(job.status, SyncJob.Status.QUEUED)
+        self.assertEqual(job.requested_by, self.admin)
+
+        self.client.get(reverse("admin:products_product_sync_square"))
+        self.assertEqual(SyncJob.objects.count(), 1)
+
+    def test_status_endpoint_reports_progress(self):
+        job, _ = enqueue_sync_job(self.admin)
+        SyncRun.objects.create(kind=SyncRun.Kind.PRODUCTS, job=job, created=40)
+
+        page = self.client.get(reverse("admin:products_product_sync_square_job", args=[job.pk]))
+        response = self.client.get(
+            reverse("admin:products_product_sync_square_job_status", args=[job.pk])
+        )
+
+        self.assertEqual(page.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["status"], "queued")
+        self.assertEqual(data["runs"][0]["created"], 40)
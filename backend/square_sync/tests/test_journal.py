@@ -0,0 +1,71 @@
+from unittest import mock
+
+import requests
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from products.models import Product
+from square_sync.models import SyncRun
+from square_sync.services import sync_inventory_from_square, sync_products_from_square
+
+from .test_services import _catalog_mocks, _item
+
+
+class SyncRunJournalTests(TestCase):
+    def test_full_sync_records_counts_and_phases(self):
+        Product.objects.create(
+            name="Old cut", slug="old-cut", price_cents=100, square_variation_id="VAR_OLD"
+        )
+        pages, lookup = _catalog_mocks(
+            [_item("ITEM_1", "Brisket", [("VAR_1", "Flat", 5000), ("VAR_2", "Point", 4500)])]
+        )
+        with pages, lookup, mock.patch(
+            "square_sync.services.batch_retrieve_location_counts", return_value={}
+        ):
+            sync_products_from_square()
+
+        run = SyncRun.objects.get()
+        self.assertEqual(run.kind, SyncRun.Kind.PRODUCTS)
+        self.assertEqual(run.status, SyncRun.Status.SUCCEEDED)
+        self.assertEqual((run.created, run.updated, run.deactivated), (2, 0, 1))
+        self.assertIsNotNone(run.finished_at)
+        self.assertGreater(run.write_seconds, 0)
+
+    @mock.patch(
+        "square_sync.services.batch_retrieve_location_counts",
+        side_effect=requests.ConnectionError("Square unreachable"),
+    )
+    def test_failed_sync_is_journalled_and_reraised(self, _counts):
+        Product.objects.create(
+            name="Cut", slug="cut", price_cents=100, square_variation_id="VAR_1"
+        )
+
+        with self.assertRaises(requests.ConnectionError):
+            sync_inventory_from_square()
+
+        run = SyncRun.objects.get()
+        self.assertEqual(run.status, SyncRun.Status.FAILED)
+        self.assertIn("Square unreachable", run.error)
+
+
+class SyncRunEndpointTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        SyncRun.objects.create(kind=SyncRun.Kind.INVENTORY, status=SyncRun.Status.SUCCEEDED, updated=4)
+        SyncRun.objects.create(kind=SyncRun.Kind.PRODUCTS, status=SyncRun.Status.FAILED, error="boom")
+
+    def test_requires_staff(self):
+        response = self.client.get("/api/square/sync-runs/")
+        self.assertIn(response.status_code, (401, 403))
+
+    def test_lists_runs_filtered_by_kind(self):
+        staff = get_user_model().objects.create_user("ops", password="x", is_staff=True)
+        self.client.force_authenticate(staff)
+
+        response = self.client.get("/api/square/sync-runs/", {"kind": "inventory"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["kind"], "inventory")
+        self.assertEqual(response.data[0]["updated"], 4)
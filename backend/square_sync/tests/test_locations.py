@@ -0,0 +1,201 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from orders.models import Order, OrderItem
+from products.models import Product, ProductStock
+from square_sync import api
+from square_sync.models import InventoryDecrement
+from square_sync.services import (
+    apply_inventory_count_updates,
+    decrement_square_inventory_for_order,
+    sync_inventory_from_square,
+)
+
+TWO_LOCATIONS = {
+    "SQUARE_ACCESS_TOKEN": "token",
+    "SQUARE_LOCATION_ID": "LOC1",
+    "SQUARE_ADDITIONAL_LOCATION_IDS": ["LOC2"],
+}
+
+
+def _count(variation_id, location_id, quantity, state="IN_STOCK", calculated_at=None):
+    count = {
+        "catalog_object_id": variation_id,
+        "location_id": location_id,
+        "state": state,
+        "quantity": str(quantity),
+    }
+    if calculated_at:
+        count["calculated_at"] = calculated_at
+    return count
+
+
+def _stock(product):
+    return dict(product.stocks.values_list("location_id", "quantity"))
+
+
+@override_settings(**TWO_LOCATIONS)
+class MultiLocationInventoryTests(TestCase):
+    def setUp(self):
+        self.brisket = Product.objects.create(
+            name="Brisket",
+            slug="brisket",
+            price_cents=5000,
+            square_variation_id="VAR_B",
+            square_quantity=0,
+            square_stock_tracked=True,
+        )
+        self.ribs = Product.objects.create(
+            name="Ribs",
+            slug="ribs",
+            price_cents=3000,
+            square_variation_id="VAR_R",
+            square_quantity=0,
+            square_stock_tracked=True,
+        )
+
+    @mock.patch("square_sync.api._request")
+    def test_one_batch_retrieve_covers_every_location(self, mock_request):
+        mock_request.return_value.json.return_value = {
+            "counts": [
+                _count("VAR_B", "LOC1", 3),
+                _count("VAR_B", "LOC2", 4),
+                _count("VAR_B", "LOC3", 50),
+                _count("VAR_R", "LOC2", 1, state="SOLD"),
+            ]
+        }
+
+        counts = api.batch_retrieve_location_counts(["VAR_B", "VAR_R"])
+
+        mock_request.assert_called_once()
+        self.assertEqual(mock_request.call_args.kwargs["json"]["location_ids"], ["LOC1", "LOC2"])
+        self.assertEqual(counts, {"VAR_B": {"LOC1": 3, "LOC2": 4}})
+        self.assertEqual(api.batch_retrieve_inventory_counts(["VAR_B"]), {"VAR_B": 7})
+
+    @mock.patch("square_sync.services.batch_retrieve_location_counts")
+    def test_inventory_sync_stores_each_location_and_the_total(self, mock_counts):
+        mock_counts.return_value = {"VAR_B": {"LOC1": 3, "LOC2": 4}, "VAR_R": {"LOC2": 2}}
+
+        sync_inventory_from_square()
+
+        self.brisket.refresh_from_db()
+        self.ribs.refresh_from_db()
+        self.assertEqual(_stock(self.brisket), {"LOC1": 3, "LOC2": 4})
+        self.assertEqual(_stock(self.ribs), {"LOC1": 0, "LOC2": 2})
+        self.assertEqual((self.brisket.square_quantity, self.ribs.square_quantity), (7, 2))
+
+        # A second, unchanged sync writes no ProductStock rows.
+        with mock.patch("square_sync.services.ProductStock.objects.bulk_create") as bulk_create:
+            sync_inventory_from_square()
+        self.assertEqual(bulk_create.call_args.args[0], [])
+
+    def test_webhook_count_for_one_location_keeps_the_others(self):
+        ProductStock.objects.create(product=self.brisket, location_id="LOC1", quantity=3)
+        ProductStock.objects.create(product=self.brisket, location_id="LOC2", quantity=4)
+
+        changed = apply_inventory_count_updates([_count("VAR_B", "LOC2", 10), _count("VAR_B", "LOC9", 99)])
+
+        self.assertEqual(changed, 1)
+        self.brisket.refresh_from_db()
+        self.assertEqual(_stock(self.brisket), {"LOC1": 3, "LOC2": 10})
+        self.assertEqual(self.brisket.square_quantity, 13)
+
+    def test_webhook_count_older_than_the_stored_one_is_ignored(self):
+        apply_inventory_count_updates([_count("VAR_B", "LOC1", 2, calculated_at="2026-05-01T10:00:05Z")])
+
+        # Square delivers an earlier count late.
+        changed = apply_inventory_count_updates(
+            [_count("VAR_B", "LOC1", 9, calculated_at="2026-05-01T10:00:00Z")]
+        )
+
+        self.assertEqual(changed, 0)
+        self.brisket.refresh_from_db()
+        self.assertEqual(_stock(self.brisket), {"LOC1": 2, "LOC2": 0})
+        self.assertEqual(self.brisket.square_quantity, 2)
+
+    def test_newer_webhook_count_with_the_same_quantity_moves_counted_at(self):
+        apply_inventory_count_updates([_count("VAR_B", "LOC1", 2, calculated_at="2026-05-01T10:00:00Z")])
+        apply_inventory_count_updates([_count("VAR_B", "LOC1", 2, calculated_at="2026-05-01T10:00:10Z")])
+
+        apply_inventory_count_updates([_count("VAR_B", "LOC1", 9, calculated_at="2026-05-01T10:00:05Z")])
+
+        stock = ProductStock.objects.get(product=self.brisket, location_id="LOC1")
+        self.assertEqual(stock.quantity, 2)
+        self.assertEqual(stock.counted_at.isoformat(), "2026-05-01T10:00:10+00:00")
+
+    def test_sale_is_decremented_at_the_primary_location(self):
+        Product.objects.filter(pk=self.brisket.pk).update(square_quantity=7)
+        ProductStock.objects.create(product=self.brisket, location_id="LOC1", quantity=3)
+        ProductStock.objects.create(product=self.brisket, location_id="LOC2", quantity=4)
+        order = Order.objects.create(
+            full_name="Buyer", email="b@example.com", phone="1", order_type=Order.OrderType.PICKUP
+        )
+        OrderItem.objects.create(
+            order=order, product=self.brisket, product_name="Brisket",
+            quantity=2, unit_price_cents=5000, total_cents=10000,
+        )
+
+        decrement_square_inventory_for_order(order)
+
+        self.brisket.refresh_from_db()
+        self.assertEqual(_stock(self.brisket), {"LOC1": 1, "LOC2": 4})
+        self.assertEqual(self.brisket.square_quantity, 5)
+        self.assertEqual(InventoryDecrement.objects.get().adjustments[0]["location_id"], "LOC1")
+
+    def _sell_brisket(self, quantity):
+        order = Order.objects.create(
+            full_name="Buyer", email="b@example.com", phone="1", order_type=Order.OrderType.PICKUP
+        )
+        OrderItem.objects.create(
+            order=order, product=self.brisket, product_name="Brisket",
+            quantity=quantity, unit_price_cents=5000, total_cents=5000 * quantity,
+        )
+        decrement_square_inventory_for_order(order)
+
+    @mock.patch("square_sync.services.batch_retrieve_location_counts")
+    def test_inventory_sync_keeps_sales_still_queued_for_square(self, mock_counts):
+        mock_counts.return_value = {"VAR_B": {"LOC1": 3, "LOC2": 4}}
+        sync_inventory_from_square()
+        self._sell_brisket(2)
+
+        # Square's counts don't include the queued sale yet.
+        sync_inventory_from_square()
+
+        self.brisket.refresh_from_db()
+        self.assertEqual(_stock(self.brisket), {"LOC1": 1, "LOC2": 4})
+        self.assertEqual(self.brisket.square_quantity, 5)
+
+        InventoryDecrement.objects.update(status=InventoryDecrement.Status.SENT)
+        mock_counts.return_value = {"VAR_B": {"LOC1": 1, "LOC2": 4}}
+        sync_inventory_from_square()
+        self.brisket.refresh_from_db()
+        self.assertEqual(self.brisket.square_quantity, 5)
+
+    def test_webhook_count_keeps_sales_still_queued_for_square(self):
+        apply_inventory_count_updates([_count("VAR_B", "LOC1", 3), _count("VAR_B", "LOC2", 4)])
+        self._sell_brisket(2)
+
+        apply_inventory_count_updates([_count("VAR_B", "LOC1", 3), _count("VAR_B", "LOC2", 6)])
+
+        self.brisket.refresh_from_db()
+        self.assertEqual(_stock(self.brisket), {"LOC1": 1, "LOC2": 6})
+        self.assertEqual(self.brisket.square_quantity, 7)
+
+    def test_products_can_be_listed_per_location(self):
+        ProductStock.objects.create(product=self.brisket, location_id="LOC1", quantity=3)
+        ProductStock.objects.create(product=self.brisket, location_id="LOC2", quantity=0)
+        ProductStock.objects.create(product=self.ribs, location_id="LOC2", quantity=5)
+        client = APIClient()
+
+        # Products, then the image and stock prefetches.
+        with self.assertNumQueries(3):
+            response = client.get(reverse("product-list"), {"location": "LOC2"})
+
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        results = payload["results"] if isinstance(payload, dict) else payload
+        self.assertEqual([product["slug"] for product in results], ["ribs"])
+        self.assertEqual(results[0]["stock_by_location"], {"LOC2": 5})
@@ -0,0 +1,83 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from square_sync import locks
+from square_sync.locks import SQUARE_SYNC_LOCK, SyncLockTimeout, single_flight
+from square_sync.models import SyncLock, SyncRun
+from square_sync.services import sync_catalog_changes_from_square, sync_products_from_square
+
+
+def _held_elsewhere(expires_in=timedelta(hours=1)):
+    return SyncLock.objects.create(
+        name=SQUARE_SYNC_LOCK, owner="other-host:1:abc", expires_at=timezone.now() + expires_in
+    )
+
+
+class SingleFlightTests(TestCase):
+    def test_acquires_and_releases(self):
+        with single_flight() as acquired:
+            self.assertTrue(acquired)
+            self.assertTrue(SyncLock.objects.filter(name=SQUARE_SYNC_LOCK).exists())
+        self.assertFalse(SyncLock.objects.exists())
+
+    def test_is_reentrant_within_a_thread(self):
+        with single_flight() as outer, single_flight() as inner:
+            self.assertTrue(outer and inner)
+        self.assertFalse(SyncLock.objects.exists())
+
+    def test_skips_when_held_by_another_process(self):
+        _held_elsewhere()
+
+        with single_flight() as acquired:
+            self.assertFalse(acquired)
+        self.assertEqual(SyncLock.objects.get().owner, "other-host:1:abc")
+
+    def test_waiter_runs_once_the_holder_finishes(self):
+        lock = _held_elsewhere()
+
+        def holder_finishes(_seconds):
+            lock.delete()
+
+        with mock.patch("square_sync.locks.time.sleep", side_effect=holder_finishes) as sleep:
+            with single_flight(wait=True) as acquired:
+                self.assertTrue(acquired)
+                self.assertNotEqual(SyncLock.objects.get().owner, "other-host:1:abc")
+        sleep.assert_called_once()
+        self.assertFalse(SyncLock.objects.exists())
+
+    def test_waiting_gives_up_after_timeout(self):
+        _held_elsewhere()
+
+        with mock.patch.object(locks, "SYNC_LOCK_POLL_INTERVAL", 0):
+            with self.assertRaises(SyncLockTimeout):
+                with single_flight(wait=True, timeout=0):
+                    self.fail("The lock is held elsewhere")
+
+    def test_expired_lock_is_taken_over(self):
+        _held_elsewhere(expires_in=timedelta(seconds=-1))
+
+        with single_flight() as acquired:
+            self.assertTrue(acquired)
+
+
+class GuardedSyncTests(TestCase):
+    def test_busy_full_sync_is_skipped_without_calling_square(self):
+        _held_elsewhere()
+
+        with mock.patch("square_sync.services.iter_catalog_pages") as mock_pages:
+            ran = sync_products_from_square()
+
+        self.assertFalse(ran)
+        mock_pages.assert_not_called()
+        self.assertFalse(SyncRun.objects.exists())
+
+    def test_incremental_fallback_to_full_sync_does_not_deadlock(self):
+        with mock.patch("square_sync.services.iter_catalog_pages", return_value=iter([])) as mock_pages:
+            summary = sync_catalog_changes_from_square()
+
+        self.assertEqual(summary["mode"], "full")
+        mock_pages.assert_called_once()
+        self.assertFalse(SyncLock.objects.exists())
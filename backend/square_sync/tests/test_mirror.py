@@ -0,0 +1,167 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from products.models import Product
+from square_sync.mirror import store_catalog_objects
+from square_sync.models import SquareCatalogObject, SyncCheckpoint, SyncRun
+from square_sync.services import (
+    rederive_products_from_square_mirror,
+    sync_catalog_changes_from_square,
+    sync_products_from_square,
+)
+from square_sync.tests.test_services import _catalog_mocks, _category, _image, _item
+
+
+def _versioned(obj, version):
+    return {**obj, "version": version, "updated_at": "2026-05-01T10:00:00.000Z"}
+
+
+BRISKET = _versioned(
+    _item(
+        "ITEM_BRISKET",
+        "Brisket",
+        [("VAR_FLAT", "Flat", 5000), ("VAR_POINT", "Point", 4500)],
+        image_id="IMG_1",
+        category_id="CAT_BEEF",
+    ),
+    1,
+)
+RIBS = _versioned(_item("ITEM_RIBS", "Ribs", [("VAR_RIBS", "", 3000)], category_id="CAT_BEEF"), 1)
+LOOKUPS = [
+    _versioned(_image("IMG_1", "https://example.com/brisket.jpg"), 1),
+    _versioned(_category("CAT_BEEF", "Beef"), 1),
+]
+
+
+@mock.patch(
+    "square_sync.services.batch_retrieve_location_counts",
+    return_value={"VAR_FLAT": {"LOC1": 4}, "VAR_POINT": {"LOC1": 0}},
+)
+class SquareCatalogMirrorTests(TestCase):
+    def _full_sync(self, items):
+        pages, lookup = _catalog_mocks(items, LOOKUPS)
+        with pages, lookup:
+            sync_products_from_square()
+
+    def test_full_sync_mirrors_items_and_lookups(self, _counts):
+        self._full_sync([BRISKET, RIBS])
+
+        self.assertEqual(
+            dict(SquareCatalogObject.objects.values_list("object_id", "type")),
+            {"ITEM_BRISKET": "ITEM", "ITEM_RIBS": "ITEM", "IMG_1": "IMAGE", "CAT_BEEF": "CATEGORY"},
+        )
+        brisket = SquareCatalogObject.objects.get(object_id="ITEM_BRISKET")
+        self.assertEqual((brisket.version, brisket.data), (1, BRISKET))
+        self.assertEqual(brisket.updated_at.year, 2026)
+
+    def test_only_new_versions_are_rewritten(self, _counts):
+        self.assertEqual(store_catalog_objects([BRISKET, RIBS]), 2)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(store_catalog_objects([BRISKET, RIBS]), 0)
+
+        renamed = _versioned({**BRISKET, "item_data": {**BRISKET["item_data"], "name": "Smoked"}}, 2)
+        self.assertEqual(store_catalog_objects([renamed, RIBS]), 1)
+        self.assertEqual(SquareCatalogObject.objects.get(object_id="ITEM_BRISKET").data["item_data"]["name"], "Smoked")
+
+    def test_items_missing_from_a_full_listing_are_flagged_deleted(self, _counts):
+        self._full_sync([BRISKET, RIBS])
+        self._full_sync([BRISKET])
+
+        self.assertTrue(SquareCatalogObject.objects.get(object_id="ITEM_RIBS").is_deleted)
+        self.assertFalse(SquareCatalogObject.objects.get(object_id="ITEM_BRISKET").is_deleted)
+
+    def test_incremental_sync_mirrors_changes_and_deletions(self, _counts):
+        self._full_sync([BRISKET, RIBS])
+        SyncCheckpoint.objects.filter(key=SyncCheckpoint.CATALOG).update(latest_time="2026-05-01T00:00:00Z")
+        renamed = _versioned({**BRISKET, "item_data": {**BRISKET["item_data"], "name": "Smoked"}}, 2)
+        changes = {
+            "objects": [renamed, {"type": "ITEM", "id": "ITEM_RIBS", "is_deleted": True, "version": 2}],
+            "related_objects": [],
+            "latest_time": "2026-05-02T00:00:00Z",
+        }
+
+        with mock.patch("square_sync.services.search_catalog_changes", return_value=changes), \
+                mock.patch("square_sync.services.batch_retrieve_catalog_objects", return_value=[renamed, *LOOKUPS]):
+            sync_catalog_changes_from_square()
+
+        ribs = SquareCatalogObject.objects.get(object_id="ITEM_RIBS")
+        self.assertEqual((ribs.version, ribs.is_deleted), (2, True))
+        self.assertEqual(SquareCatalogObject.objects.get(object_id="ITEM_BRISKET").version, 2)
+
+    def test_rederive_rebuilds_products_without_square(self, _counts):
+        self._full_sync([BRISKET, RIBS])
+        Product.objects.filter(square_variation_id="VAR_FLAT").update(name="Hand edited", square_quantity=7)
+        SquareCatalogObject.objects.filter(object_id="ITEM_RIBS").update(is_deleted=True)
+
+        with mock.patch("square_sync.services.iter_catalog_pages") as listing, \
+                mock.patch("square_sync.services.batch_retrieve_catalog_objects") as retrieve:
+            summary = rederive_products_from_square_mirror(force=True)
+
+        listing.assert_not_called()
+        retrieve.assert_not_called()
+        _counts.assert_called_once()  # only by the initial full sync
+        # Forced: both live brisket rows are rewritten, hand edits included.
+        self.assertEqual(summary, {"mode": "rederive", "created": 0, "updated": 2, "deactivated": 1})
+        flat = Product.objects.get(square_variation_id="VAR_FLAT")
+        self.assertEqual((flat.name, flat.square_quantity, flat.is_active), ("Brisket (Flat)", 7, True))
+        self.assertEqual((flat.category, flat.image_url), ("Beef", "https://example.com/brisket.jpg"))
+        self.assertFalse(Product.objects.get(square_variation_id="VAR_POINT").is_active)
+        self.assertFalse(Product.objects.get(square_variation_id="VAR_RIBS").is_active)
+        self.assertEqual(SyncRun.objects.filter(kind=SyncRun.Kind.REDERIVE).get().updated, 2)
+
+    def test_rederive_leaves_untracked_stock_untracked(self, _counts):
+        self._full_sync([BRISKET, RIBS])  # Square counts no stock for VAR_RIBS
+        Product.objects.filter(square_variation_id="VAR_RIBS").update(square_quantity=0)
+
+        rederive_products_from_square_mirror(force=True)
+
+        ribs = Product.objects.get(square_variation_id="VAR_RIBS")
+        self.assertEqual((ribs.square_quantity, ribs.is_active, ribs.square_stock_tracked), (0, True, False))
+        flat = Product.objects.get(square_variation_id="VAR_FLAT")
+        self.assertEqual((flat.square_quantity, flat.square_stock_tracked), (4, True))
+
+    def test_rederive_applies_mapping_changes_only(self, _counts):
+        self._full_sync([BRISKET, RIBS])
+        SquareCatalogObject.objects.filter(object_id="CAT_BEEF").update(
+            data=_versioned(_category("CAT_BEEF", "Beef & Bison"), 2)
+        )
+
+        summary = rederive_products_from_square_mirror()
+
+        self.assertEqual(summary["updated"], 3)
+        self.assertEqual(set(Product.objects.values_list("category", flat=True)), {"Beef & Bison"})
+        self.assertEqual(rederive_products_from_square_mirror()["updated"], 0)
+
+    def test_rederive_command_dry_run_saves_nothing(self, _counts):
+        self._full_sync([BRISKET, RIBS])
+        Product.objects.filter(square_variation_id="VAR_FLAT").update(name="Hand edited")
+
+        out = StringIO()
+        call_command("rederive_square_products", "--dry-run", "--force", stdout=out)
+
+        self.assertIn("Dry run", out.getvalue())
+        self.assertIn("updated: 3", out.getvalue())
+        self.assertEqual(Product.objects.get(square_variation_id="VAR_FLAT").name, "Hand edited")
+
+    def test_rederive_command_runs_without_an_outer_transaction(self, _counts):
+        self._full_sync([BRISKET, RIBS])
+        depths = []
+
+        def rederive(**kwargs):
+            depths.append(len(connection.savepoint_ids))
+            return rederive_products_from_square_mirror(**kwargs)
+
+        with mock.patch(
+            "square_sync.management.commands.rederive_square_products.rederive_products_from_square_mirror",
+            side_effect=rederive,
+        ):
+            call_command("rederive_square_products", "--force", stdout=StringIO())
+            call_command("rederive_square_products", "--force", "--dry-run", stdout=StringIO())
+
+        outside = len(connection.savepoint_ids)
+        self.assertEqual(depths, [outside, outside + 1])
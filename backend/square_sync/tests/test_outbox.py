@@ -0,0 +1,270 @@
+from datetime import timedelta
+from unittest import mock
+
+import requests
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from payments.models import StripeEvent
+from payments.webhooks import process_pending_stripe_events
+from products.models import Product
+from square_sync.models import InventoryDecrement, SyncRun
+from square_sync.outbox import process_inventory_outbox
+from square_sync.services import decrement_square_inventory_for_order
+
+
+class InventoryOutboxTests(TestCase):
+    def setUp(self):
+        self.brisket = Product.objects.create(
+            name="Brisket",
+            slug="brisket",
+            price_cents=5000,
+            square_variation_id="VAR_B",
+            square_quantity=10,
+            square_stock_tracked=True,
+        )
+        self.ribs = Product.objects.create(
+            name="Ribs",
+            slug="ribs",
+            price_cents=3000,
+            square_variation_id="VAR_R",
+            square_quantity=4,
+            square_stock_tracked=True,
+        )
+
+    def _order(self, *lines):
+        order = Order.objects.create(
+            full_name="Outbox Test",
+            email="outbox@example.com",
+            phone="5550000000",
+            order_type=Order.OrderType.PICKUP,
+            total_cents=1000,
+        )
+        for product, quantity in lines:
+            OrderItem.objects.create(
+                order=order,
+                product=product,
+                product_name=product.name,
+                quantity=quantity,
+                unit_price_cents=product.price_cents,
+                total_cents=product.price_cents * quantity,
+            )
+        return order
+
+    @mock.patch("square_sync.outbox.batch_change_inventory_for_sale")
+    def test_decrement_is_queued_once_without_calling_square(self, mock_change):
+        order = self._order((self.brisket, 2), (self.ribs, 1))
+
+        self.assertTrue(decrement_square_inventory_for_order(order))
+        self.assertFalse(decrement_square_inventory_for_order(order))
+
+        mock_change.assert_not_called()
+        row = InventoryDecrement.objects.get()
+        self.assertEqual(row.idempotency_key, f"order-{order.id}-sold")
+        self.assertEqual(len(row.adjustments), 2)
+        self.brisket.refresh_from_db()
+        self.assertEqual(self.brisket.square_quantity, 8)
+
+    def test_untracked_product_stays_on_sale_after_a_paid_order(self):
+        sauce = Product.objects.create(
+            name="Sauce", slug="sauce", price_cents=800, square_variation_id="VAR_S", square_quantity=0
+        )
+
+        decrement_square_inventory_for_order(self._order((sauce, 2), (self.ribs, 1)))
+
+        sauce.refresh_from_db()
+        self.assertEqual((sauce.square_quantity, sauce.is_active, sauce.square_stock_tracked), (0, True, False))
+        self.ribs.refresh_from_db()
+        self.assertEqual(self.ribs.square_quantity, 3)
+
+    @mock.patch("payments.webhooks.queue_order_receipt_email_once", side_effect=RuntimeError("email queue down"))
+    def test_outbox_row_rolls_back_with_the_order_update(self, _send):
+        order = self._order((self.brisket, 1))
+        StripeEvent.objects.create(
+            event_id="evt_1",
+            event_type="payment_intent.succeeded",
+            payload={
+                "data": {
+                    "object": {
+                        "id": "pi_1",
+                        "amount": 1000,
+                        "currency": "cad",
+                        "status": "succeeded",
+                        "metadata": {"order_id": str(order.id)},
+                    }
+                }
+            },
+        )
+
+        process_pending_stripe_events()
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.PLACED)
+        self.assertFalse(InventoryDecrement.objects.exists())
+        self.brisket.refresh_from_db()
+        self.assertEqual(self.brisket.square_quantity, 10)
+
+    @mock.patch("square_sync.outbox.refresh_inventory_for_variations")
+    @mock.patch("square_sync.outbox.batch_change_inventory_for_sale")
+    def test_orders_are_coalesced_into_one_batch_create(self, mock_change, mock_refresh):
+        orders = [self._order((self.brisket, 1)) for _ in range(3)]
+        for order in orders:
+            decrement_square_inventory_for_order(order)
+
+        self.assertEqual(process_inventory_outbox(), 3)
+
+        mock_change.assert_called_once()
+        adjustments = mock_change.call_args.args[0]
+        self.assertEqual(len(adjustments), 3)
+        key = mock_change.call_args.kwargs["idempotency_key"]
+        self.assertTrue(key.startswith("orders-"))
+        self.assertEqual(
+            set(InventoryDecrement.objects.values_list("status", "batch_key")),
+            {(InventoryDecrement.Status.SENT, key)},
+        )
+        mock_refresh.assert_called_once_with(["VAR_B", "VAR_B", "VAR_B"])
+        self.assertEqual(SyncRun.objects.get().updated, 3)
+
+    @mock.patch("square_sync.outbox.refresh_inventory_for_variations")
+    @mock.patch("square_sync.outbox.batch_change_inventory_for_sale")
+    def test_single_order_keeps_its_own_idempotency_key(self, mock_change, _refresh):
+        order = self._order((self.ribs, 1))
+        decrement_square_inventory_for_order(order)
+
+        process_inventory_outbox()
+
+        self.assertEqual(mock_change.call_args.kwargs["idempotency_key"], f"order-{order.id}-sold")
+
+    @mock.patch("square_sync.outbox.refresh_inventory_for_variations")
+    @mock.patch("square_sync.outbox.batch_change_inventory_for_sale")
+    def test_large_backlog_is_split_at_square_change_limit(self, mock_change, _refresh):
+        for _ in range(60):
+            decrement_square_inventory_for_order(self._order((self.brisket, 1), (self.ribs, 1)))
+
+        process_inventory_outbox()
+
+        self.assertEqual([len(call.args[0]) for call in mock_change.call_args_list], [100, 20])
+
+    @mock.patch("square_sync.outbox.refresh_inventory_for_variations")
+    @mock.patch("square_sync.outbox.batch_change_inventory_for_sale")
+    def test_failed_batch_is_retried_with_the_same_key(self, mock_change, mock_refresh):
+        for _ in range(2):
+            decrement_square_inventory_for_order(self._order((self.brisket, 1)))
+        mock_change.side_effect = requests.ConnectionError("timeout")
+
+        process_inventory_outbox()
+
+        first_key = mock_change.call_args.kwargs["idempotency_key"]
+        self.assertEqual(
+            InventoryDecrement.objects.filter(status=InventoryDecrement.Status.PENDING).count(), 2
+        )
+        self.assertEqual(SyncRun.objects.get().status, SyncRun.Status.FAILED)
+        mock_refresh.assert_not_called()
+
+        # A new order arriving meanwhile must not change the retried batch.
+        decrement_square_inventory_for_order(self._order((self.ribs, 1)))
+        InventoryDecrement.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        mock_change.side_effect = None
+        mock_change.reset_mock()
+
+        process_inventory_outbox()
+
+        keys = [call.kwargs["idempotency_key"] for call in mock_change.call_args_list]
+        self.assertIn(first_key, keys)
+        self.assertEqual(len(keys), 2)
+        self.assertFalse(
+            InventoryDecrement.objects.exclude(status=InventoryDecrement.Status.SENT).exists()
+        )
+
+    @mock.patch("square_sync.outbox.refresh_inventory_for_variations")
+    @mock.patch("square_sync.outbox.batch_change_inventory_for_sale")
+    def test_retry_always_sends_the_whole_batch(self, mock_change, _refresh):
+        for _ in range(3):
+            decrement_square_inventory_for_order(self._order((self.brisket, 1)))
+        mock_change.side_effect = requests.ConnectionError("timeout")
+        process_inventory_outbox()
+        first_key = mock_change.call_args.kwargs["idempotency_key"]
+
+        # Only one row of the batch is due and the pass is cut after one row,
+        # as when an admin retries a single row.
+        first = InventoryDecrement.objects.order_by("id").first()
+        InventoryDecrement.objects.filter(pk=first.pk).update(
+            next_attempt_at=timezone.now() - timedelta(seconds=1)
+        )
+        mock_change.side_effect = None
+        mock_change.reset_mock()
+
+        self.assertEqual(process_inventory_outbox(limit=1), 3)
+
+        mock_change.assert_called_once()
+        self.assertEqual(mock_change.call_args.kwargs["idempotency_key"], first_key)
+        self.assertEqual(len(mock_change.call_args.args[0]), 3)
+        self.assertEqual(
+            InventoryDecrement.objects.filter(status=InventoryDecrement.Status.SENT).count(), 3
+        )
+
+    @override_settings(SQUARE_ACCESS_TOKEN="token", SQUARE_LOCATION_ID="LOC1")
+    @mock.patch("square_sync.outbox.refresh_inventory_for_variations")
+    @mock.patch("square_sync.api._request")
+    def test_retry_sends_the_same_body(self, mock_request, _refresh):
+        for _ in range(2):
+            decrement_square_inventory_for_order(self._order((self.brisket, 1)))
+        mock_request.side_effect = requests.ConnectionError("response lost")
+        process_inventory_outbox()
+
+        InventoryDecrement.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        mock_request.side_effect = None
+        with mock.patch("django.utils.timezone.now", return_value=timezone.now() + timedelta(hours=1)):
+            process_inventory_outbox()
+
+        first, retry = (call.kwargs["json"] for call in mock_request.call_args_list)
+        self.assertEqual(retry, first)
+
+    @mock.patch("square_sync.outbox.refresh_inventory_for_variations")
+    @mock.patch("square_sync.outbox.batch_change_inventory_for_sale")
+    def test_batch_key_and_lease_are_saved_before_square_is_called(self, mock_change, _refresh):
+        for _ in range(2):
+            decrement_square_inventory_for_order(self._order((self.brisket, 1)))
+        seen = []
+
+        def check_saved(adjustments, *, idempotency_key):
+            rows = list(InventoryDecrement.objects.all())
+            seen.append(idempotency_key)
+            self.assertEqual({row.batch_key for row in rows}, {idempotency_key})
+            self.assertTrue(all(row.next_attempt_at > timezone.now() for row in rows))
+
+        mock_change.side_effect = check_saved
+        process_inventory_outbox()
+
+        self.assertEqual(len(seen), 1)
+        self.assertEqual(
+            InventoryDecrement.objects.filter(status=InventoryDecrement.Status.SENT).count(), 2
+        )
+
+    @mock.patch("square_sync.outbox.refresh_inventory_for_variations")
+    @mock.patch("square_sync.outbox.batch_change_inventory_for_sale")
+    def test_crash_mid_send_keeps_the_batch_and_its_key(self, mock_change, _refresh):
+        for _ in range(2):
+            decrement_square_inventory_for_order(self._order((self.brisket, 1)))
+        mock_change.side_effect = RuntimeError("worker killed")
+        with self.assertRaises(RuntimeError):
+            process_inventory_outbox()
+        first_key = mock_change.call_args.kwargs["idempotency_key"]
+        self.assertEqual(
+            set(InventoryDecrement.objects.values_list("batch_key", flat=True)), {first_key}
+        )
+
+        # Another order queued before the lease runs out must go in its own batch.
+        decrement_square_inventory_for_order(self._order((self.ribs, 1)))
+        InventoryDecrement.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        mock_change.side_effect = None
+        mock_change.reset_mock()
+
+        process_inventory_outbox()
+
+        sent = {
+            call.kwargs["idempotency_key"]: len(call.args[0]) for call in mock_change.call_args_list
+        }
+        self.assertEqual(sent[first_key], 2)
+        self.assertEqual(len(sent), 2)
@@ -0,0 +1,380 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from products.models import Product
+from square_sync.models import SyncCheckpoint
+from square_sync.services import (
+    refresh_inventory_for_variations,
+    sync_catalog_changes_from_square,
+    sync_inventory_from_square,
+    sync_products_from_square,
+)
+
+
+def _item(item_id, name, variations, *, image_id=None, category_id=None, deleted=False):
+    item_data = {
+        "name": name,
+        "description": f"{name} description",
+        "variations": [
+            {
+                "type": "ITEM_VARIATION",
+                "id": v_id,
+                "item_variation_data": {
+                    "item_id": item_id,
+                    "name": v_name,
+                    "price_money": {"amount": price, "currency": "CAD"},
+                },
+            }
+            for v_id, v_name, price in variations
+        ],
+    }
+    if image_id:
+        item_data["image_ids"] = [image_id]
+    if category_id:
+        item_data["categories"] = [{"id": category_id}]
+    return {"type": "ITEM", "id": item_id, "is_deleted": deleted, "item_data": item_data}
+
+
+def _image(image_id, url):
+    return {"type": "IMAGE", "id": image_id, "image_data": {"url": url}}
+
+
+def _category(category_id, name):
+    return {"type": "CATEGORY", "id": category_id, "category_data": {"name": name}}
+
+
+def _catalog_mocks(items, lookups=(), page_size=100):
+    """Patch the paged ITEM listing and the by-id image/category lookup."""
+    pages = [items[i : i + page_size] for i in range(0, len(items), page_size)]
+    by_id = {obj["id"]: obj for obj in lookups}
+    return (
+        mock.patch("square_sync.services.iter_catalog_pages", return_value=iter(pages)),
+        mock.patch(
+            "square_sync.services.batch_retrieve_catalog_objects",
+            side_effect=lambda ids: [by_id[i] for i in ids if i in by_id],
+        ),
+    )
+
+
+class RefreshInventoryForVariationsTests(TestCase):
+    def setUp(self):
+        self.brisket = Product.objects.create(
+            name="Brisket",
+            slug="brisket",
+            price_cents=5000,
+            square_variation_id="VAR_BRISKET",
+            square_quantity=10,
+            square_stock_tracked=True,
+        )
+        self.ribs = Product.objects.create(
+            name="Ribs",
+            slug="ribs",
+            price_cents=3000,
+            square_variation_id="VAR_RIBS",
+            square_quantity=2,
+            square_stock_tracked=True,
+        )
+        self.bystander = Product.objects.create(
+            name="Turkey",
+            slug="turkey",
+            price_cents=4000,
+            square_variation_id="VAR_TURKEY",
+            square_quantity=7,
+            square_stock_tracked=True,
+        )
+
+    @mock.patch("square_sync.services.batch_retrieve_location_counts")
+    def test_fetches_only_given_variations_and_updates_changed_rows(self, mock_counts):
+        mock_counts.return_value = {"VAR_BRISKET": {"LOC1": 9}, "VAR_RIBS": {"LOC1": 0}}
+
+        changed = refresh_inventory_for_variations(["VAR_BRISKET", "VAR_RIBS"])
+
+        self.assertEqual(changed, 2)
+        mock_counts.assert_called_once()
+        self.assertCountEqual(mock_counts.call_args.args[0], ["VAR_BRISKET", "VAR_RIBS"])
+
+        self.brisket.refresh_from_db()
+        self.ribs.refresh_from_db()
+        self.bystander.refresh_from_db()
+        self.assertEqual(self.brisket.square_quantity, 9)
+        self.assertTrue(self.brisket.is_active)
+        self.assertEqual(self.ribs.square_quantity, 0)
+        self.assertFalse(self.ribs.is_active)
+        self.assertEqual(self.bystander.square_quantity, 7)
+
+    @mock.patch("square_sync.services.batch_retrieve_location_counts")
+    def test_unchanged_counts_issue_no_update(self, mock_counts):
+        mock_counts.return_value = {"VAR_BRISKET": {"LOC1": 10}, "VAR_RIBS": {"LOC1": 2}}
+
+        # The product fetch, plus the savepoint pair around the
+        # ProductStock/total write, which finds nothing to change.
+        with self.assertNumQueries(3):
+            changed = refresh_inventory_for_variations(["VAR_BRISKET", "VAR_RIBS"])
+
+        self.assertEqual(changed, 0)
+
+
+@mock.patch("square_sync.services.batch_retrieve_location_counts", return_value={})
+class IncrementalCatalogSyncTests(TestCase):
+    def _full_sync(self, items, lookups=()):
+        pages, lookup = _catalog_mocks(items, lookups)
+        with pages, lookup:
+            sync_products_from_square()
+
+    def setUp(self):
+        self._full_sync(
+            [
+                _item(
+                    "ITEM_BRISKET",
+                    "Brisket",
+                    [("VAR_FLAT", "Flat", 5000), ("VAR_POINT", "Point", 4500)],
+                    image_id="IMG_1",
+                    category_id="CAT_BEEF",
+                ),
+                _item("ITEM_RIBS", "Ribs", [("VAR_RIBS", "", 3000)], category_id="CAT_BEEF"),
+            ],
+            lookups=[
+                _image("IMG_1", "https://example.com/brisket.jpg"),
+                _category("CAT_BEEF", "Beef"),
+            ],
+        )
+
+    def test_full_sync_seeds_checkpoint(self, _counts):
+        checkpoint = SyncCheckpoint.objects.get(key=SyncCheckpoint.CATALOG)
+        self.assertTrue(checkpoint.latest_time.endswith("Z"))
+        self.assertEqual(Product.objects.filter(is_active=True).count(), 3)
+
+    def test_without_checkpoint_falls_back_to_full_sync(self, _counts):
+        SyncCheckpoint.objects.all().delete()
+
+        with mock.patch("square_sync.services.iter_catalog_pages", return_value=iter([])) as mock_list, \
+                mock.patch("square_sync.services.search_catalog_changes") as mock_search:
+            summary = sync_catalog_changes_from_square()
+
+        self.assertEqual(summary["mode"], "full")
+        mock_list.assert_called_once()
+        mock_search.assert_not_called()
+
+    def test_applies_only_changed_objects_and_advances_checkpoint(self, _counts):
+        SyncCheckpoint.objects.filter(key=SyncCheckpoint.CATALOG).update(
+            latest_time="2026-05-01T00:00:00Z"
+        )
+        changed_brisket = _item(
+            "ITEM_BRISKET",
+            "Smoked Brisket",
+            [("VAR_FLAT", "Flat", 5200)],
+            image_id="IMG_1",
+            category_id="CAT_BEEF",
+        )
+        changes = {
+            "objects": [
+                changed_brisket,
+                {"type": "ITEM", "id": "ITEM_RIBS", "is_deleted": True},
+            ],
+            "related_objects": [],
+            "latest_time": "2026-05-02T12:00:00Z",
+        }
+
+        with mock.patch("square_sync.services.search_catalog_changes", return_value=changes) as mock_search, \
+                mock.patch(
+                    "square_sync.services.batch_retrieve_catalog_objects",
+                    return_value=[
+                        changed_brisket,
+                        _image("IMG_1", "https://example.com/brisket.jpg"),
+                        _category("CAT_BEEF", "Beef"),
+                    ],
+                ) as mock_retrieve, \
+                mock.patch("square_sync.services.iter_catalog_pages") as mock_list:
+            summary = sync_catalog_changes_from_square()
+
+        mock_list.assert_not_called()
+        mock_search.assert_called_once_with("2026-05-01T00:00:00Z")
+        mock_retrieve.assert_called_once_with(["ITEM_BRISKET"])
+        self.assertEqual(summary, {"mode": "incremental", "changed_objects": 2, "items_refreshed": 1})
+
+        flat = Product.objects.get(square_variation_id="VAR_FLAT")
+        self.assertEqual(flat.name, "Smoked Brisket (Flat)")
+        self.assertEqual(flat.price_cents, 5200)
+        self.assertEqual(flat.category, "Beef")
+        self.assertEqual(flat.image_url, "https://example.com/brisket.jpg")
+        self.assertFalse(Product.objects.get(square_variation_id="VAR_POINT").is_active)
+        self.assertFalse(Product.objects.get(square_variation_id="VAR_RIBS").is_active)
+        self.assertEqual(
+            SyncCheckpoint.objects.get(key=SyncCheckpoint.CATALOG).latest_time,
+            "2026-05-02T12:00:00Z",
+        )
+
+    def test_category_rename_refreshes_items_in_that_category(self, _counts):
+        changes = {
+            "objects": [_category("CAT_BEEF", "Alberta Beef")],
+            "related_objects": [],
+            "latest_time": "2026-05-03T00:00:00Z",
+        }
+        ribs = _item("ITEM_RIBS", "Ribs", [("VAR_RIBS", "", 3000)], category_id="CAT_BEEF")
+
+        with mock.patch("square_sync.services.search_catalog_changes", return_value=changes), \
+                mock.patch(
+                    "square_sync.services.search_item_ids_by_category", return_value=["ITEM_RIBS"]
+                ) as mock_by_category, \
+                mock.patch(
+                    "square_sync.services.batch_retrieve_catalog_objects",
+                    return_value=[ribs, _category("CAT_BEEF", "Alberta Beef")],
+                ):
+            sync_catalog_changes_from_square()
+
+        mock_by_category.assert_called_once_with(["CAT_BEEF"])
+        self.assertEqual(Product.objects.get(square_variation_id="VAR_RIBS").category, "Alberta Beef")
+
+
+class BulkCatalogSyncTests(TestCase):
+    def _catalog(self, variations=1200, price=1000):
+        return [
+            _item(f"ITEM_{i}", f"Cut {i}", [(f"VAR_{i}", "", price + (i if i == 0 else 0))])
+            for i in range(variations)
+        ]
+
+    def _sync(self, objects, counts=None):
+        pages, lookup = _catalog_mocks(objects)
+        with pages, lookup, mock.patch(
+            "square_sync.services.batch_retrieve_location_counts",
+            return_value={vid: {"LOC1": qty} for vid, qty in (counts or {}).items()},
+        ):
+            sync_products_from_square()
+
+    def test_large_sync_uses_a_handful_of_statements(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self._sync(self._catalog())
+
+        # SQLite caps rows per INSERT by its parameter limit (~17 inserts here);
+        # Postgres needs 3. Add a few for SyncRun and lock bookkeeping and a
+        # SELECT plus upserts per batch for the raw catalog mirror; either way
+        # nowhere near one statement per variation.
+        self.assertLess(len(ctx.captured_queries), 70)
+        self.assertEqual(Product.objects.count(), 1200)
+
+    def test_rows_are_written_before_the_last_page_arrives(self):
+        catalog = self._catalog()
+        seen_before_last_page = []
+
+        def pages():
+            for start in range(0, len(catalog), 100):
+                if start == len(catalog) - 100:
+                    seen_before_last_page.append(Product.objects.count())
+                yield catalog[start : start + 100]
+
+        with mock.patch("square_sync.services.iter_catalog_pages", side_effect=pages), \
+                mock.patch("square_sync.services.batch_retrieve_catalog_objects", return_value=[]), \
+                mock.patch("square_sync.services.batch_retrieve_location_counts", return_value={}):
+            sync_products_from_square()
+
+        self.assertEqual(seen_before_last_page, [1000])
+        self.assertEqual(Product.objects.count(), 1200)
+
+    def test_shared_images_and_categories_are_looked_up_once(self):
+        catalog = [
+            _item(f"ITEM_{i}", f"Cut {i}", [(f"VAR_{i}", "", 1000)], image_id="IMG", category_id="CAT")
+            for i in range(1200)
+        ]
+        pages, lookup = _catalog_mocks(
+            catalog, lookups=[_image("IMG", "https://example.com/cut.jpg"), _category("CAT", "Beef")]
+        )
+        with pages, lookup as mock_retrieve, mock.patch(
+            "square_sync.services.batch_retrieve_location_counts", return_value={}
+        ):
+            sync_products_from_square()
+
+        mock_retrieve.assert_called_once_with(["CAT", "IMG"])
+        product = Product.objects.get(square_variation_id="VAR_1100")
+        self.assertEqual((product.category, product.image_url), ("Beef", "https://example.com/cut.jpg"))
+
+    def test_unchanged_catalog_writes_nothing(self):
+        catalog = self._catalog()
+        self._sync(catalog)
+
+        with mock.patch.object(Product.objects, "bulk_update") as mock_update, \
+                mock.patch.object(Product.objects, "bulk_create") as mock_create:
+            self._sync(catalog)
+
+        mock_update.assert_not_called()
+        mock_create.assert_not_called()
+
+    def test_only_changed_rows_are_updated(self):
+        catalog = self._catalog(variations=10)
+        self._sync(catalog, counts={f"VAR_{i}": 5 for i in range(10)})
+
+        catalog[3]["item_data"]["description"] = "Now dry aged"
+        with mock.patch.object(
+            Product.objects, "bulk_update", wraps=Product.objects.bulk_update
+        ) as mock_update:
+            self._sync(catalog, counts={**{f"VAR_{i}": 5 for i in range(10)}, "VAR_7": 0})
+
+        updated = [p.square_variation_id for p in mock_update.call_args.args[0]]
+        self.assertCountEqual(updated, ["VAR_3", "VAR_7"])
+        self.assertEqual(Product.objects.get(square_variation_id="VAR_3").description, "Now dry aged")
+        self.assertFalse(Product.objects.get(square_variation_id="VAR_7").is_active)
+
+    def test_local_stock_change_is_corrected_even_if_catalog_is_unchanged(self):
+        catalog = self._catalog(variations=1)
+        self._sync(catalog, counts={"VAR_0": 10})
+        Product.objects.filter(square_variation_id="VAR_0").update(square_quantity=3)
+
+        self._sync(catalog, counts={"VAR_0": 10})
+
+        self.assertEqual(Product.objects.get(square_variation_id="VAR_0").square_quantity, 10)
+
+
+class SyncInventoryFromSquareTests(TestCase):
+    def setUp(self):
+        for index in range(20):
+            Product.objects.create(
+                name=f"Cut {index}",
+                slug=f"cut-{index}",
+                price_cents=1000,
+                square_variation_id=f"VAR_{index}",
+                square_quantity=5,
+                square_stock_tracked=True,
+            )
+        Product.objects.create(name="Local only", slug="local-only", price_cents=100)
+
+    @mock.patch("square_sync.services.batch_retrieve_location_counts")
+    def test_writes_only_changed_rows_in_one_update(self, mock_counts):
+        counts = {f"VAR_{index}": 5 for index in range(20)}
+        counts.update({"VAR_2": 8, "VAR_9": 0})
+        mock_counts.return_value = {vid: {"LOC1": qty} for vid, qty in counts.items()}
+
+        # One row fetch, one read of the outbox's pending sales and one CASE
+        # UPDATE in a savepoint, plus inserting and closing the SyncRun and five
+        # for taking and dropping the SQLite single-flight lock row. No location
+        # is configured, so no ProductStock.
+        with self.assertNumQueries(12):
+            changed = sync_inventory_from_square()
+
+        self.assertEqual(changed, 2)
+        self.assertEqual(Product.objects.get(square_variation_id="VAR_2").square_quantity, 8)
+        self.assertFalse(Product.objects.get(square_variation_id="VAR_9").is_active)
+        self.assertNotIn("", mock_counts.call_args.args[0])
+
+    @mock.patch("square_sync.services.batch_retrieve_location_counts")
+    def test_variations_square_stops_counting_are_no_longer_tracked(self, mock_counts):
+        Product.objects.filter(square_variation_id="VAR_0").update(square_stock_tracked=False)
+        mock_counts.return_value = {f"VAR_{index}": {"LOC1": 5} for index in range(19)}
+
+        sync_inventory_from_square()
+
+        tracked = dict(Product.objects.values_list("square_variation_id", "square_stock_tracked"))
+        self.assertTrue(tracked["VAR_0"])
+        self.assertFalse(tracked["VAR_19"])
+
+    @mock.patch("square_sync.services.batch_retrieve_location_counts")
+    def test_missing_counts_are_left_alone(self, mock_counts):
+        mock_counts.return_value = {}
+
+        # Only the row fetch besides SyncRun and lock bookkeeping; nothing is written.
+        with self.assertNumQueries(8):
+            changed = sync_inventory_from_square()
+
+        self.assertEqual(changed, 0)
+        self.assertEqual(Product.objects.filter(square_quantity=5).count(), 20)
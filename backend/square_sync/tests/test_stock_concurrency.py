@@ -0,0 +1,174 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock, skipUnless
+
+from django.db import OperationalError, connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from orders.models import Order, OrderItem
+from payments.webhooks import handle_payment_intent_succeeded
+from products.models import Product
+from square_sync.models import InventoryDecrement
+from square_sync.services import decrement_local_stock
+
+DELIVERIES = 200
+WORKERS = 8
+
+
+class DecrementLocalStockTests(TestCase):
+    def test_updates_every_product_in_one_statement(self):
+        brisket = Product.objects.create(
+            name="Brisket", slug="brisket", price_cents=1, square_quantity=5, square_stock_tracked=True
+        )
+        ribs = Product.objects.create(
+            name="Ribs", slug="ribs", price_cents=1, square_quantity=2, square_stock_tracked=True
+        )
+        bystander = Product.objects.create(
+            name="Turkey", slug="turkey", price_cents=1, square_quantity=2, square_stock_tracked=True
+        )
+        # Square counts no stock for this one, so its quantity is not a count.
+        untracked = Product.objects.create(name="Sauce", slug="sauce", price_cents=1, square_quantity=0)
+
+        with self.assertNumQueries(1):
+            updated = decrement_local_stock({brisket.pk: 2, ribs.pk: 3, untracked.pk: 1})
+
+        self.assertEqual(updated, 2)
+        brisket.refresh_from_db()
+        ribs.refresh_from_db()
+        bystander.refresh_from_db()
+        untracked.refresh_from_db()
+        self.assertEqual((brisket.square_quantity, brisket.is_active), (3, True))
+        self.assertEqual((ribs.square_quantity, ribs.is_active), (0, False))
+        self.assertEqual((bystander.square_quantity, bystander.is_active), (2, True))
+        self.assertEqual((untracked.square_quantity, untracked.is_active), (0, True))
+
+    @mock.patch("notifications.emails.queue_order_status_update_email")
+    @mock.patch("payments.webhooks.queue_order_receipt_email_once")
+    def test_payment_computes_the_new_stock_inside_the_update(self, _receipt, _status_email):
+        # A read-then-write decrement loses updates when deliveries overlap; the
+        # only product write must take the current quantity from the row itself.
+        brisket = Product.objects.create(
+            name="Brisket",
+            slug="brisket",
+            price_cents=1,
+            square_variation_id="VAR_B",
+            square_quantity=5,
+            square_stock_tracked=True,
+        )
+        order = Order.objects.create(
+            full_name="Buyer", email="b@example.com", phone="1", order_type=Order.OrderType.PICKUP
+        )
+        OrderItem.objects.create(
+            order=order, product=brisket, product_name="Brisket",
+            quantity=2, unit_price_cents=1, total_cents=2,
+        )
+        intent = {
+            "id": "pi_1",
+            "amount": order.total_cents,
+            "currency": "cad",
+            "status": "succeeded",
+            "metadata": {"order_id": str(order.id)},
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            handle_payment_intent_succeeded(intent)
+
+        product_writes = [
+            query["sql"] for query in queries if query["sql"].startswith('UPDATE "products_product"')
+        ]
+        self.assertEqual(len(product_writes), 1)
+        self.assertIn('SET "square_quantity" = ', product_writes[0])
+        self.assertIn('"products_product"."square_quantity" - ', product_writes[0])
+        brisket.refresh_from_db()
+        self.assertEqual(brisket.square_quantity, 3)
+
+
+@skipUnless(connection.vendor == "postgresql", "SQLite serialises every writer, so no update can be lost")
+class ConcurrentStockDecrementTests(TransactionTestCase):
+    """
+    Fires hundreds of payment deliveries at once from a thread pool. Only
+    Postgres lets the deliveries really overlap; there the row lock
+    serialises the UPDATEs. A delivery that hits a lock error anyway is
+    retried, as the Stripe inbox would.
+    """
+
+    def setUp(self):
+        self.brisket = Product.objects.create(
+            name="Brisket",
+            slug="brisket",
+            price_cents=5000,
+            square_variation_id="VAR_B",
+            square_quantity=1000,
+            square_stock_tracked=True,
+        )
+        self.ribs = Product.objects.create(
+            name="Ribs",
+            slug="ribs",
+            price_cents=3000,
+            square_variation_id="VAR_R",
+            square_quantity=DELIVERIES // 2,
+            square_stock_tracked=True,
+        )
+        self.orders = []
+        for index in range(DELIVERIES):
+            order = Order.objects.create(
+                full_name=f"Buyer {index}",
+                email=f"buyer{index}@example.com",
+                phone="5550000000",
+                order_type=Order.OrderType.PICKUP,
+                total_cents=8000,
+            )
+            OrderItem.objects.create(
+                order=order, product=self.brisket, product_name="Brisket",
+                quantity=2, unit_price_cents=5000, total_cents=10000,
+            )
+            OrderItem.objects.create(
+                order=order, product=self.ribs, product_name="Ribs",
+                quantity=1, unit_price_cents=3000, total_cents=3000,
+            )
+            self.orders.append(order)
+
+    def _deliver(self, order, start):
+        intent = {
+            "id": f"pi_{order.id}",
+            "amount": order.total_cents,
+            "currency": "cad",
+            "status": "succeeded",
+            "metadata": {"order_id": str(order.id)},
+        }
+        start.wait()
+        try:
+            for attempt in range(1000):
+                try:
+                    with transaction.atomic():
+                        handle_payment_intent_succeeded(intent)
+                    return
+                except OperationalError as exc:
+                    if "locked" not in str(exc):
+                        raise
+                    time.sleep(random.uniform(0, min(0.001 * 2 ** attempt, 0.05)))
+        finally:
+            connections.close_all()
+        raise AssertionError(f"order {order.id} never got the lock")
+
+    @mock.patch("notifications.emails.queue_order_status_update_email")
+    @mock.patch("payments.webhooks.queue_order_receipt_email_once")
+    def test_simultaneous_deliveries_lose_no_decrements(self, _receipt, _status_email):
+        start = threading.Event()
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            futures = [pool.submit(self._deliver, order, start) for order in self.orders]
+            start.set()
+            for future in futures:
+                future.result()
+
+        self.brisket.refresh_from_db()
+        self.ribs.refresh_from_db()
+        self.assertEqual(self.brisket.square_quantity, 1000 - 2 * DELIVERIES)
+        self.assertTrue(self.brisket.is_active)
+        # Ribs oversell: clamped at zero and deactivated, never negative.
+        self.assertEqual(self.ribs.square_quantity, 0)
+        self.assertFalse(self.ribs.is_active)
+        self.assertEqual(InventoryDecrement.objects.count(), DELIVERIES)
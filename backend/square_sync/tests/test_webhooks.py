@@ -0,0 +1,178 @@
+import base64
+import hashlib
+import hmac
+import json
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from products.models import Product
+from square_sync.models import SquareWebhookEvent
+from square_sync.webhooks import process_pending_square_events
+
+SIGNATURE_KEY = "test-signature-key"
+NOTIFICATION_URL = "https://shop.example.com/api/webhooks/square/"
+
+
+def _inventory_event(event_id, variation_id, quantity, *, location_id="LOC1"):
+    return {
+        "merchant_id": "M1",
+        "type": "inventory.count.updated",
+        "event_id": event_id,
+        "data": {
+            "type": "inventory_counts",
+            "object": {
+                "inventory_counts": [
+                    {
+                        "catalog_object_id": variation_id,
+                        "catalog_object_type": "ITEM_VARIATION",
+                        "state": "IN_STOCK",
+                        "location_id": location_id,
+                        "quantity": str(quantity),
+                    }
+                ]
+            },
+        },
+    }
+
+
+def _catalog_event(event_id):
+    return {
+        "merchant_id": "M1",
+        "type": "catalog.version.updated",
+        "event_id": event_id,
+        "data": {"type": "catalog", "object": {"catalog_version": {"updated_at": "2026-01-01T00:00:00Z"}}},
+    }
+
+
+@override_settings(
+    SQUARE_LOCATION_ID="LOC1",
+    SQUARE_WEBHOOK_SIGNATURE_KEY=SIGNATURE_KEY,
+    SQUARE_WEBHOOK_NOTIFICATION_URL=NOTIFICATION_URL,
+)
+class SquareWebhookViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("square-webhook")
+        self.product = Product.objects.create(
+            name="Ribeye",
+            slug="ribeye",
+            price_cents=3000,
+            square_variation_id="VAR1",
+            square_quantity=5,
+            is_active=True,
+        )
+
+    def _post(self, event, signature=None):
+        body = json.dumps(event).encode()
+        if signature is None:
+            digest = hmac.new(
+                SIGNATURE_KEY.encode(), NOTIFICATION_URL.encode() + body, hashlib.sha256
+            ).digest()
+            signature = base64.b64encode(digest).decode()
+        return self.client.post(
+            self.url,
+            data=body,
+            content_type="application/json",
+            HTTP_X_SQUARE_HMACSHA256_SIGNATURE=signature,
+        )
+
+    def test_rejects_bad_signature(self):
+        response = self._post(_inventory_event("evt-1", "VAR1", 0), signature="bogus")
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(SquareWebhookEvent.objects.exists())
+
+    def test_inventory_update_is_applied_once(self):
+        response = self._post(_inventory_event("evt-1", "VAR1", 0))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data["duplicate"])
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.square_quantity, 0)
+        self.assertFalse(self.product.is_active)
+        event = SquareWebhookEvent.objects.get(event_id="evt-1")
+        self.assertEqual(event.status, SquareWebhookEvent.Status.PROCESSED)
+
+        # A redelivery must not re-apply a stale count over newer local state.
+        Product.objects.filter(pk=self.product.pk).update(square_quantity=7, is_active=True)
+        response = self._post(_inventory_event("evt-1", "VAR1", 0))
+        self.assertTrue(response.data["duplicate"])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.square_quantity, 7)
+
+    def test_failed_inventory_update_is_not_recorded(self):
+        with mock.patch(
+            "square_sync.webhooks.apply_inventory_count_updates",
+            side_effect=RuntimeError("database hiccup"),
+        ):
+            with self.assertRaises(RuntimeError):
+                self._post(_inventory_event("evt-1", "VAR1", 0))
+        self.assertFalse(SquareWebhookEvent.objects.exists())
+
+        # Square redelivers the event, which is now applied rather than
+        # dropped as a duplicate.
+        response = self._post(_inventory_event("evt-1", "VAR1", 0))
+
+        self.assertFalse(response.data["duplicate"])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.square_quantity, 0)
+
+    def test_inventory_update_for_other_location_is_ignored(self):
+        self._post(_inventory_event("evt-2", "VAR1", 0, location_id="OTHER"))
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.square_quantity, 5)
+
+    @mock.patch("square_sync.webhooks.sync_catalog_changes_from_square")
+    def test_catalog_events_are_coalesced_into_one_sync(self, mock_sync):
+        for event_id in ("cat-1", "cat-2", "cat-3"):
+            self._post(_catalog_event(event_id))
+        mock_sync.assert_not_called()
+
+        handled = process_pending_square_events()
+
+        self.assertEqual(handled, 3)
+        mock_sync.assert_called_once_with()
+        self.assertEqual(
+            SquareWebhookEvent.objects.filter(status=SquareWebhookEvent.Status.PROCESSED).count(), 3
+        )
+        self.assertEqual(process_pending_square_events(), 0)
+
+    def test_catalog_events_are_claimed_before_the_sync_runs(self):
+        self._post(_catalog_event("cat-1"))
+
+        def sync():
+            # Committed before the sync starts, so another worker skips them.
+            self.assertFalse(
+                SquareWebhookEvent.objects.filter(next_attempt_at__lte=timezone.now()).exists()
+            )
+            self.assertEqual(process_pending_square_events(), 0)
+            return {"mode": "incremental", "changed_objects": 1, "items_refreshed": 1}
+
+        with mock.patch("square_sync.webhooks.sync_catalog_changes_from_square", side_effect=sync):
+            self.assertEqual(process_pending_square_events(), 1)
+
+        self.assertEqual(
+            SquareWebhookEvent.objects.get(event_id="cat-1").status,
+            SquareWebhookEvent.Status.PROCESSED,
+        )
+
+    @mock.patch(
+        "square_sync.webhooks.sync_catalog_changes_from_square",
+        side_effect=RuntimeError("Square down"),
+    )
+    def test_failed_catalog_sync_is_retried_later(self, mock_sync):
+        self._post(_catalog_event("cat-1"))
+
+        self.assertEqual(process_pending_square_events(), 1)
+
+        event = SquareWebhookEvent.objects.get(event_id="cat-1")
+        self.assertEqual(event.status, SquareWebhookEvent.Status.PENDING)
+        self.assertEqual(event.attempts, 1)
+        self.assertEqual(event.last_error, "Square down")
+        # Backed off, so an immediate second pass does nothing.
+        self.assertEqual(process_pending_square_events(), 0)
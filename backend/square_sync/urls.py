@@ -0,0 +1,13 @@
+from django.urls import path
+from rest_framework.routers import SimpleRouter
+
+from .views import SyncRunViewSet
+from .webhooks import SquareWebhookView
+
+router = SimpleRouter()
+router.register("square/sync-runs", SyncRunViewSet, basename="square-sync-run")
+
+urlpatterns = [
+    path("webhooks/square/", SquareWebhookView.as_view(), name="square-webhook"),
+]
+urlpatterns += router.urls
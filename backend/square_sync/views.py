@@ -0,0 +1,23 @@
+from rest_framework import permissions, viewsets
+
+from .models import SyncRun
+from .serializers import SyncRunSerializer
+
+SYNC_RUN_LIST_LIMIT = 100
+
+
+class SyncRunViewSet(viewsets.ReadOnlyModelViewSet):
+    """Staff-only JSON view of the sync journal, newest first; filter with ?kind=."""
+
+    queryset = SyncRun.objects.all()
+    serializer_class = SyncRunSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        kind = self.request.query_params.get("kind")
+        if kind:
+            queryset = queryset.filter(kind=kind)
+        if self.action == "list":
+            queryset = queryset[:SYNC_RUN_LIST_LIMIT]
+        return queryset
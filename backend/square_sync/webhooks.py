@@ -0,0 +1,157 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import SquareWebhookEvent
+from .services import apply_inventory_count_updates, sync_catalog_changes_from_square
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_COUNT_UPDATED = "inventory.count.updated"
+CATALOG_VERSION_UPDATED = "catalog.version.updated"
+SQUARE_EVENT_MAX_ATTEMPTS = 8
+SQUARE_EVENT_MAX_BACKOFF = timedelta(hours=1)
+SQUARE_EVENT_BUSY_DELAY = timedelta(seconds=30)
+# How long claimed events stay hidden from other workers while their sync runs.
+SQUARE_EVENT_LEASE = timedelta(minutes=30)
+
+
+def _signature_is_valid(request) -> bool:
+    notification_url = (
+        settings.SQUARE_WEBHOOK_NOTIFICATION_URL or request.build_absolute_uri()
+    )
+    digest = hmac.new(
+        settings.SQUARE_WEBHOOK_SIGNATURE_KEY.encode(),
+        notification_url.encode() + request.body,
+        hashlib.sha256,
+    ).digest()
+    expected = base64.b64encode(digest).decode()
+    received = request.META.get("HTTP_X_SQUARE_HMACSHA256_SIGNATURE", "")
+    return hmac.compare_digest(expected, received)
+
+
+class SquareWebhookView(APIView):
+    """
+    Receive Square inventory and catalog notifications.
+
+    Count updates are cheap and applied straight to Product; catalog changes are
+    left in the inbox for ``process_square_events``. Redeliveries are ignored by
+    event_id, so polling syncs only need to run as a safety net.
+    """
+
+    def post(self, request, *args, **kwargs):
+        if settings.SQUARE_WEBHOOK_SIGNATURE_KEY:
+            if not _signature_is_valid(request):
+                return Response(status=status.HTTP_403_FORBIDDEN)
+        elif not settings.DEBUG:
+            return Response(
+                {"detail": "Square webhook signature key is not configured."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+
+        try:
+            event = json.loads(request.body)
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        event_id = event.get("event_id") if isinstance(event, dict) else None
+        if not event_id:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        # The row and the counts it carries commit together: if applying them
+        # fails, the event is not recorded and Square's redelivery retries it.
+        with transaction.atomic():
+            record, created = SquareWebhookEvent.objects.get_or_create(
+                event_id=event_id,
+                defaults={"event_type": event.get("type") or "", "payload": event},
+            )
+            if not created:
+                return Response({"received": True, "duplicate": True})
+
+            if record.event_type == INVENTORY_COUNT_UPDATED:
+                counts = ((event.get("data") or {}).get("object") or {}).get("inventory_counts") or []
+                apply_inventory_count_updates(counts)
+                record.status = SquareWebhookEvent.Status.PROCESSED
+                record.processed_at = timezone.now()
+                record.attempts = 1
+                record.save(update_fields=["status", "processed_at", "attempts"])
+            elif record.event_type != CATALOG_VERSION_UPDATED:
+                record.status = SquareWebhookEvent.Status.PROCESSED
+                record.processed_at = timezone.now()
+                record.save(update_fields=["status", "processed_at"])
+
+        return Response({"received": True, "duplicate": False})
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return min(timedelta(seconds=30 * 2 ** max(attempts - 1, 0)), SQUARE_EVENT_MAX_BACKOFF)
+
+
+def process_pending_square_events() -> int:
+    """
+    Coalesce every due catalog.version.updated event into a single incremental
+    catalog sync. Returns the number of events handled.
+
+    The due events are claimed in a short transaction (SELECT ... FOR UPDATE
+    SKIP LOCKED) that pushes their next_attempt_at out by SQUARE_EVENT_LEASE,
+    so a second worker leaves them alone while the sync runs. The sync itself
+    runs outside that transaction and commits batch by batch, which keeps a
+    first-run full sync from becoming one long transaction. On failure the
+    events are rescheduled with exponential backoff, and parked as failed
+    after SQUARE_EVENT_MAX_ATTEMPTS.
+    """
+    with transaction.atomic():
+        events = list(
+            SquareWebhookEvent.objects.select_for_update(skip_locked=True).filter(
+                event_type=CATALOG_VERSION_UPDATED,
+                status=SquareWebhookEvent.Status.PENDING,
+                next_attempt_at__lte=timezone.now(),
+            )
+        )
+        if not events:
+            return 0
+        leased_until = timezone.now() + SQUARE_EVENT_LEASE
+        for event in events:
+            event.next_attempt_at = leased_until
+        SquareWebhookEvent.objects.bulk_update(events, ["next_attempt_at"])
+
+    try:
+        summary = sync_catalog_changes_from_square()
+    except Exception as exc:
+        logger.exception("Catalog sync for %s Square event(s) failed", len(events))
+        now = timezone.now()
+        for event in events:
+            event.attempts += 1
+            event.last_error = str(exc)
+            if event.attempts >= SQUARE_EVENT_MAX_ATTEMPTS:
+                event.status = SquareWebhookEvent.Status.FAILED
+            else:
+                event.next_attempt_at = now + _retry_delay(event.attempts)
+    else:
+        now = timezone.now()
+        if summary["mode"] == "skipped":
+            # Another sync is running and may have started before these
+            # changes; look again shortly without spending an attempt.
+            for event in events:
+                event.next_attempt_at = now + SQUARE_EVENT_BUSY_DELAY
+            SquareWebhookEvent.objects.bulk_update(events, ["next_attempt_at"])
+            return 0
+        for event in events:
+            event.attempts += 1
+            event.status = SquareWebhookEvent.Status.PROCESSED
+            event.processed_at = now
+            event.last_error = ""
+    SquareWebhookEvent.objects.bulk_update(
+        events,
+        ["attempts", "status", "processed_at", "next_attempt_at", "last_error"],
+    )
+    return len(events)